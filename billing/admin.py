@@ -1,5 +1,5 @@
 from django.contrib import admin, messages
-from .models import Invoice
+from .models import Invoice, InvoiceSequence, Payment, Settlement, SettlementTransfer
 from django.db.models import Sum, F, DecimalField
 from django.forms import BaseInlineFormSet
 from .models import Expense, Split
@@ -14,6 +14,36 @@ class InvoiceAdmin(admin.ModelAdmin):
     ordering = ('-created_at',)
 
 
+@admin.register(Payment)
+class PaymentAdmin(admin.ModelAdmin):
+    list_display = ('invoice', 'amount', 'payment_mode', 'reference', 'paid_on', 'created_at')
+    list_filter = ('payment_mode', 'paid_on')
+    search_fields = ('invoice__invoice_number', 'reference')
+    ordering = ('-paid_on', '-pk')
+    list_select_related = ('invoice__order',)
+
+
+@admin.register(InvoiceSequence)
+class InvoiceSequenceAdmin(admin.ModelAdmin):
+    list_display = ('period', 'last_number')
+    ordering = ('-period',)
+
+
+class SettlementTransferInline(admin.TabularInline):
+    model = SettlementTransfer
+    extra = 0
+    readonly_fields = ('from_user', 'to_user', 'amount')
+    can_delete = False
+
+
+@admin.register(Settlement)
+class SettlementAdmin(admin.ModelAdmin):
+    list_display = ('created_at', 'until', 'settled_by', 'split_count', 'total_settled')
+    ordering = ('-created_at',)
+    readonly_fields = ('until', 'settled_by', 'split_count', 'total_settled', 'created_at')
+    inlines = [SettlementTransferInline]
+
+
 
 
 # 1. Custom FormSet for Inline Validation
@@ -0,0 +1,80 @@
+import datetime
+import random
+import time
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from billing.models import Expense, Split
+from billing.services import SettlementService
+
+
+class _Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        "Measures planning and applying a netted settlement over many open splits, and compares "
+        "the transfer count with one payment per split. All benchmark data is rolled back."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--splits', type=int, default=10000, help="Open splits to settle (default: 10000).")
+        parser.add_argument('--users', type=int, default=12, help="Partners sharing the expenses (default: 12).")
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        results = []
+        try:
+            with transaction.atomic():
+                users = self._seed(rng, options['users'], options['splits'])
+                with CaptureQueriesContext(connection) as queries:
+                    started = time.perf_counter()
+                    plan = SettlementService.plan()
+                    results.append(('plan', len(queries), (time.perf_counter() - started) * 1000))
+                with CaptureQueriesContext(connection) as queries:
+                    started = time.perf_counter()
+                    SettlementService.apply(plan['until'], plan['token'], users[0])
+                    results.append(('apply', len(queries), (time.perf_counter() - started) * 1000))
+                raise _Rollback
+        except _Rollback:
+            pass
+
+        self.stdout.write(f"{'step':<8} {'queries':>8} {'ms':>10}")
+        for step, query_count, elapsed_ms in results:
+            self.stdout.write(f"{step:<8} {query_count:>8} {elapsed_ms:>10.1f}")
+        self.stdout.write(
+            f"{plan['split_count']} splits worth Rs {plan['total']} settled with "
+            f"{len(plan['transfers'])} transfers (at most {len(plan['positions']) - 1}) "
+            f"instead of one payment per split."
+        )
+
+    @staticmethod
+    def _seed(rng, user_count, split_count):
+        User.objects.bulk_create([User(username=f'__benchmark_partner_{i}__') for i in range(user_count)])
+        users = list(User.objects.filter(username__startswith='__benchmark_partner_').order_by('pk'))
+        today = timezone.localdate()
+        expenses, planned = [], []
+        while len(planned) < split_count:
+            members = rng.sample(users, rng.randint(2, min(5, user_count)))
+            share = Decimal(rng.randrange(1000, 100000)) / 100
+            expenses.append(Expense(
+                description='__benchmark__', amount=share * len(members),
+                date_incurred=today - datetime.timedelta(days=rng.randrange(365)), paid_by=rng.choice(users),
+            ))
+            planned.append(members)
+        Expense.objects.bulk_create(expenses, batch_size=1000)
+        expense_ids = list(Expense.objects.filter(description='__benchmark__').order_by('pk').values_list('pk', flat=True))
+        splits = [
+            Split(expense_id=expense_id, user=member, amount=expense.amount / len(members))
+            for expense_id, expense, members in zip(expense_ids, expenses, planned)
+            for member in members
+        ][:split_count]
+        Split.objects.bulk_create(splits, batch_size=1000)
+        return users
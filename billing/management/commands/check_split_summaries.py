@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+
+from billing.services import SplitSummaryService
+
+
+class Command(BaseCommand):
+    help = (
+        "Recomputes every user's monthly split share and paid totals from scratch and reports "
+        "summaries that disagree. Exits with status 1 on mismatches unless --fix."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--fix', action='store_true', help="Overwrite the summaries that disagree.")
+
+    def handle(self, *args, **options):
+        mismatches = SplitSummaryService.check(fix=options['fix'])
+        for (user_id, month), stored, expected in mismatches:
+            self.stderr.write(f"User {user_id} {month:%Y-%m}: stored {stored}, expected {expected}")
+
+        if not mismatches:
+            self.stdout.write(self.style.SUCCESS("All split summaries are consistent."))
+        elif options['fix']:
+            self.stdout.write(self.style.SUCCESS(f"Fixed {len(mismatches)} split summaries."))
+        else:
+            self.stdout.write(self.style.ERROR(f"{len(mismatches)} split summaries are out of date; rerun with --fix."))
+            raise SystemExit(1)
@@ -0,0 +1,46 @@
+import datetime
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from billing.services import BillingService, InvoicePDFService
+
+
+class Command(BaseCommand):
+    help = (
+        "Invoices every delivered order that has not been billed yet, in one transaction, "
+        "then renders the new invoice PDFs in parallel."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--until', help="Only bill orders created on or before this date (YYYY-MM-DD).")
+        parser.add_argument('--no-pdf', action='store_true', help="Skip rendering the PDFs.")
+
+    def handle(self, *args, **options):
+        until = None
+        if options['until']:
+            try:
+                until = datetime.date.fromisoformat(options['until'])
+            except ValueError:
+                raise CommandError("--until must look like YYYY-MM-DD.")
+
+        started = time.perf_counter()
+        count, invoices = BillingService.generate_pending_invoices(until=until)
+        seconds = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f"Created {count} invoices in {seconds:.2f}s ({count / seconds if seconds else 0:.0f}/s)."
+        ))
+        if not count or options['no_pdf']:
+            return
+
+        def progress(done, total):
+            self.stdout.write(f"\r  rendered {done}/{total}", ending='')
+            self.stdout.flush()
+
+        result = InvoicePDFService.warm(InvoicePDFService.preload(invoices).iterator(chunk_size=200), progress=progress)
+        self.stdout.write('')
+        if result['failed']:
+            self.stderr.write(f"{result['failed']} invoice(s) failed to render.")
+        self.stdout.write(self.style.SUCCESS(
+            f"Rendered {result['rendered']} PDFs in {result['seconds']:.2f}s ({result['per_second']:.1f}/s)."
+        ))
@@ -0,0 +1,41 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from billing.services import EXPENSE_IMPORT_CHUNK_SIZE, ExpenseService
+
+
+class Command(BaseCommand):
+    help = (
+        "Imports shared expenses from a CSV with the header "
+        "date,description,amount,paid_by,split_between[,shares], where split_between lists "
+        "usernames and shares their amounts, separated with ';'. Without shares the amount is "
+        "split equally. Use '-' to read from stdin."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="CSV file to import, or '-' for stdin.")
+        parser.add_argument(
+            '--chunk-size', type=int, default=EXPENSE_IMPORT_CHUNK_SIZE,
+            help=f"Rows written per transaction (default: {EXPENSE_IMPORT_CHUNK_SIZE}).",
+        )
+
+    def handle(self, *args, **options):
+        if options['chunk_size'] <= 0:
+            raise CommandError("--chunk-size must be positive.")
+
+        if options['path'] == '-':
+            result = ExpenseService.import_expenses_csv(sys.stdin, chunk_size=options['chunk_size'])
+        else:
+            try:
+                with open(options['path'], newline='', encoding='utf-8-sig') as csv_file:
+                    result = ExpenseService.import_expenses_csv(csv_file, chunk_size=options['chunk_size'])
+            except OSError as exc:
+                raise CommandError(str(exc))
+
+        for row_number, message in result['errors']:
+            self.stderr.write(f"Row {row_number}: {message}")
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {result['rows']} expenses in {result['seconds']:.2f}s "
+            f"({result['rows_per_second']:.0f} rows/s), {len(result['errors'])} skipped."
+        ))
@@ -0,0 +1,36 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from billing.services import PaymentService
+
+
+class Command(BaseCommand):
+    help = (
+        "Matches a bank statement CSV (header date,amount,reference,narration[,customer]) "
+        "to open invoices and records the payments. Use '-' to read from stdin."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="CSV file to reconcile, or '-' for stdin.")
+        parser.add_argument('--dry-run', action='store_true', help="Report the matches without recording them.")
+
+    def handle(self, *args, **options):
+        apply = not options['dry_run']
+        if options['path'] == '-':
+            result = PaymentService.reconcile_statement_csv(sys.stdin, apply=apply)
+        else:
+            try:
+                with open(options['path'], newline='', encoding='utf-8-sig') as csv_file:
+                    result = PaymentService.reconcile_statement_csv(csv_file, apply=apply)
+            except OSError as exc:
+                raise CommandError(str(exc))
+
+        for row_number, message in sorted(result['errors'] + result['unmatched']):
+            self.stderr.write(f"Row {row_number}: {message}")
+        verb = "Would record" if options['dry_run'] else "Recorded"
+        self.stdout.write(self.style.SUCCESS(
+            f"{verb} {result['matched']} payments totalling Rs {result['amount']} from {result['rows']} rows "
+            f"in {result['seconds']:.2f}s ({result['rows_per_second']:.0f} rows/s); "
+            f"{len(result['unmatched'])} unmatched, {len(result['errors'])} invalid."
+        ))
@@ -0,0 +1,42 @@
+import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from billing.models import Invoice
+from billing.services import InvoicePDFService
+from core.utils import day_bounds
+
+
+class Command(BaseCommand):
+    help = "Pre-renders the PDFs of every invoice raised in a month (default: the current month)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--month', help="Month to warm, as YYYY-MM.")
+
+    def handle(self, *args, **options):
+        if options['month']:
+            try:
+                first_day = datetime.datetime.strptime(options['month'], '%Y-%m').date()
+            except ValueError:
+                raise CommandError("--month must look like YYYY-MM.")
+        else:
+            first_day = timezone.localdate().replace(day=1)
+        last_day = (first_day.replace(day=28) + datetime.timedelta(days=4)).replace(day=1) - datetime.timedelta(days=1)
+
+        start, end = day_bounds(first_day, last_day)
+        invoices = InvoicePDFService.preload(Invoice.objects.filter(created_at__gte=start, created_at__lt=end))
+
+        def progress(done, total):
+            self.stdout.write(f"\r  rendered {done}/{total}", ending='')
+            self.stdout.flush()
+
+        result = InvoicePDFService.warm(invoices.iterator(chunk_size=200), progress=progress)
+        if result['rendered'] or result['failed']:
+            self.stdout.write('')
+        if result['failed']:
+            self.stderr.write(f"{result['failed']} invoice(s) failed to render.")
+        self.stdout.write(self.style.SUCCESS(
+            f"{first_day:%Y-%m}: rendered {result['rendered']} PDFs in {result['seconds']:.2f}s "
+            f"({result['per_second']:.1f}/s), {result['cached']} already cached."
+        ))
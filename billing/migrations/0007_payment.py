@@ -0,0 +1,29 @@
+# Generated by Django 5.2.5 on 2026-10-18 09:06
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('billing', '0006_invoicesequence'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Payment',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('amount', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('payment_mode', models.CharField(max_length=20)),
+                ('reference', models.CharField(blank=True, db_index=True, max_length=64)),
+                ('paid_on', models.DateField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('invoice', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='payments', to='billing.invoice')),
+            ],
+            options={
+                'ordering': ['paid_on', 'pk'],
+            },
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.2.5 on 2026-10-18 09:06
+
+from django.db import migrations
+from django.utils import timezone
+
+
+def backfill_payments(apps, schema_editor):
+    """Records the amount already paid on each invoice as one opening payment, so the ledger sums to amount_paid."""
+    Invoice = apps.get_model('billing', 'Invoice')
+    Payment = apps.get_model('billing', 'Payment')
+    payments = []
+    for invoice in Invoice.objects.filter(amount_paid__gt=0).iterator(chunk_size=1000):
+        created_at = invoice.created_at
+        payments.append(Payment(
+            invoice_id=invoice.pk,
+            amount=invoice.amount_paid,
+            payment_mode=invoice.payment_mode or 'Unknown',
+            reference='opening-balance',
+            paid_on=timezone.localdate(created_at) if timezone.is_aware(created_at) else created_at.date(),
+        ))
+        if len(payments) >= 1000:
+            Payment.objects.bulk_create(payments)
+            payments = []
+    Payment.objects.bulk_create(payments)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('billing', '0007_payment'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_payments, migrations.RunPython.noop),
+    ]
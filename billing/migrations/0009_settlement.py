@@ -0,0 +1,58 @@
+# Generated by Django 5.2.5 on 2026-10-18 09:28
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('billing', '0008_backfill_payments'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SettlementTransfer',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('amount', models.DecimalField(decimal_places=2, max_digits=14)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Settlement',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('until', models.DateField()),
+                ('split_count', models.PositiveIntegerField()),
+                ('total_settled', models.DecimalField(decimal_places=2, max_digits=14)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('settled_by', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='settlements', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='split',
+            name='settlement',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='splits', to='billing.settlement'),
+        ),
+        migrations.AddIndex(
+            model_name='split',
+            index=models.Index(fields=['is_paid', 'expense'], name='split_open_idx'),
+        ),
+        migrations.AddField(
+            model_name='settlementtransfer',
+            name='from_user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='settlement_payments', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='settlementtransfer',
+            name='settlement',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='transfers', to='billing.settlement'),
+        ),
+        migrations.AddField(
+            model_name='settlementtransfer',
+            name='to_user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='settlement_receipts', to=settings.AUTH_USER_MODEL),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.5 on 2026-10-18 09:32
+
+from django.db import migrations
+from django.db.models import Q, Sum
+from django.db.models.functions import TruncMonth
+
+
+def backfill_split_summaries(apps, schema_editor):
+    Split = apps.get_model('billing', 'Split')
+    SplitSummary = apps.get_model('billing', 'SplitSummary')
+    rows = Split.objects.values('user_id', month=TruncMonth('expense__date_incurred')).annotate(
+        share=Sum('amount'), paid=Sum('amount', filter=Q(is_paid=True))
+    ).order_by()
+    SplitSummary.objects.bulk_create([
+        SplitSummary(user_id=row['user_id'], month=row['month'], total_share=row['share'], total_paid=row['paid'] or 0)
+        for row in rows
+    ], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('billing', '0010_splitsummary'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_split_summaries, migrations.RunPython.noop),
+    ]
@@ -19,6 +19,13 @@ class Invoice(models.Model):
 
     payment_mode = models.CharField(max_length=20, blank=True) # We'll update this with the last payment mode
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)  # set explicitly by queryset.update() writers; keys the PDF cache
+
+    class Meta:
+        indexes = [
+            # Open-invoice filters: A/R aging, cash-in reports
+            models.Index(fields=['payment_status', 'created_at'], name='invoice_status_created_idx'),
+        ]
 
     @property
     def balance(self):
@@ -29,13 +36,49 @@ class Invoice(models.Model):
         return f"Invoice {self.invoice_number} for Order {self.order.pk}"
 
 
+class Payment(models.Model):
+    """
+    One payment received against an invoice. The ledger is append-only; the running
+    Invoice.amount_paid / payment_status are maintained by billing.services.PaymentService.
+    """
+    invoice = models.ForeignKey(Invoice, on_delete=models.CASCADE, related_name='payments')
+    amount = models.DecimalField(max_digits=10, decimal_places=2)
+    payment_mode = models.CharField(max_length=20)
+    reference = models.CharField(max_length=64, blank=True, db_index=True)  # bank / UPI transaction reference
+    paid_on = models.DateField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['paid_on', 'pk']
+
+    def __str__(self):
+        return f"{self.amount} on {self.paid_on} for {self.invoice.invoice_number}"
+
+
+class InvoiceSequence(models.Model):
+    """
+    Last invoice number handed out in a month (period YYYYMM).
+    Numbers are allocated in blocks by BillingService.allocate_invoice_numbers.
+    """
+    period = models.CharField(max_length=6, unique=True)
+    last_number = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.period}: {self.last_number}"
+
+
 
 class Expense(models.Model):
     description = models.CharField(max_length=255)
     amount = models.DecimalField(max_digits=10, decimal_places=2)
     date_incurred = models.DateField()
     paid_by = models.ForeignKey(User, on_delete=models.CASCADE, related_name='expenses_paid')
-    
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['date_incurred'], name='expense_date_idx'),
+        ]
+
     def total_split_amount(self):
         return sum(split.amount for split in self.splits.all())
     
@@ -52,6 +95,60 @@ class Split(models.Model):
     is_paid = models.BooleanField(default=False)
     paid_amount = models.DecimalField(max_digits=10, decimal_places=2, default=0)
     paid_date = models.DateField(null=True, blank=True)
+    settlement = models.ForeignKey(
+        'Settlement', on_delete=models.SET_NULL, null=True, blank=True, related_name='splits'
+    )  # set when closed by a settle-up rather than a single mark_paid
+
+    class Meta:
+        indexes = [
+            # Open-split scans: settlement net positions
+            models.Index(fields=['is_paid', 'expense'], name='split_open_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.user} owes {self.amount} for {self.expense.description}"
+
+
+class Settlement(models.Model):
+    """
+    A settle-up that closed every open split up to `until` at once, replaced by the
+    netted transfers below. Created by billing.services.SettlementService.apply.
+    """
+    until = models.DateField()
+    settled_by = models.ForeignKey(User, on_delete=models.PROTECT, related_name='settlements')
+    split_count = models.PositiveIntegerField()
+    total_settled = models.DecimalField(max_digits=14, decimal_places=2)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"Settlement of {self.split_count} splits up to {self.until}"
+
+
+class SettlementTransfer(models.Model):
+    settlement = models.ForeignKey(Settlement, on_delete=models.CASCADE, related_name='transfers')
+    from_user = models.ForeignKey(User, on_delete=models.PROTECT, related_name='settlement_payments')
+    to_user = models.ForeignKey(User, on_delete=models.PROTECT, related_name='settlement_receipts')
+    amount = models.DecimalField(max_digits=14, decimal_places=2)
+
+    def __str__(self):
+        return f"{self.from_user} pays {self.to_user} {self.amount}"
+
+class SplitSummary(models.Model):
+    """
+    Per-user, per-month split totals (by the month the expense was incurred), kept up to
+    date by billing.signals and verified with `manage.py check_split_summaries`.
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='split_summaries')
+    month = models.DateField()  # first day of the month
+    total_share = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    total_paid = models.DecimalField(max_digits=14, decimal_places=2, default=0)  # shares of splits marked paid
+
+    class Meta:
+        unique_together = ('user', 'month')
+
+    @property
+    def total_pending(self):
+        return self.total_share - self.total_paid
 
     def __str__(self):
-        return f"{self.user} owes {self.amount} for {self.expense.description}"
\ No newline at end of file
+        return f"{self.user_id} {self.month:%Y-%m}: {self.total_share}"
@@ -0,0 +1,103 @@
+"""
+Invoice PDF rendering outside the request cycle.
+
+PDFs are stored under the invoice's pk and updated_at, so a cached one is found
+without rendering anything, a payment or an edited line yields a new file, and an
+unchanged invoice is only ever rendered once. Nothing here touches the ORM, which
+keeps the pool workers light.
+"""
+import atexit
+import os
+import tempfile
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+from xhtml2pdf import pisa
+
+
+class PDFRenderError(Exception):
+    pass
+
+
+_executor = None
+_executor_lock = threading.Lock()
+_pending = {}
+
+
+def cache_path(directory, invoice_id, updated_at):
+    # Two-digit fan-out keeps directories small once a few years of invoices pile up
+    return os.path.join(directory, f'{invoice_id % 100:02d}', f'{invoice_id}-{updated_at:%Y%m%d%H%M%S%f}.pdf')
+
+
+def render_to_file(html, path):
+    """
+    Renders `html` to a PDF at `path`. The PDF is written to a temporary file and
+    moved into place, so a reader never sees a partially written file.
+    """
+    if os.path.exists(path):
+        return path
+
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.part')
+    try:
+        with os.fdopen(fd, 'wb') as dest:
+            status = pisa.CreatePDF(html, dest=dest)
+        if status.err:
+            raise PDFRenderError(f"xhtml2pdf reported {status.err} error(s)")
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+    return path
+
+
+def _get_executor(max_workers):
+    global _executor
+    if _executor is None:
+        _executor = ProcessPoolExecutor(max_workers=max_workers)
+    return _executor
+
+
+def shutdown():
+    """Stops the pool's worker processes, dropping renders that have not started."""
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=False, cancel_futures=True)
+            _executor = None
+
+
+def _reset_after_fork():
+    # A forked server worker must not share the parent's pool, queue or lock; it
+    # starts its own pool on its first render
+    global _executor, _executor_lock, _pending
+    _executor = None
+    _executor_lock = threading.Lock()
+    _pending = {}
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_after_fork)
+atexit.register(shutdown)
+
+
+def submit(html, path, max_workers):
+    """
+    Queues `html` for rendering to `path` on the process pool and returns the
+    Future. Concurrent requests for the same file share one render, and a failed
+    render stays pending, so asking again reports the error instead of retrying.
+    """
+    with _executor_lock:
+        future = _pending.get(path)
+        if future is None:
+            future = _get_executor(max_workers).submit(render_to_file, html, path)
+            _pending[path] = future
+            future.add_done_callback(partial(_forget, path))
+    return future
+
+
+def _forget(path, future):
+    if future.cancelled() or future.exception() is None:
+        _pending.pop(path, None)
@@ -1,20 +1,872 @@
-from .models import Invoice
-from orders.models import SalesOrder
-import uuid
+import csv
+import datetime
+import hashlib
+import heapq
+import os
+import re
+import time
+from collections import defaultdict
+from concurrent.futures import TimeoutError, as_completed
+from decimal import ROUND_HALF_UP, Decimal, InvalidOperation
+from itertools import islice
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import connection, transaction
+from django.db.models import Case, Count, DecimalField, F, Prefetch, Q, Sum, Value, When
+from django.db.models.functions import TruncMonth
+from django.template.loader import get_template
+from django.utils import timezone
+
+from .models import Expense, Invoice, InvoiceSequence, Payment, Settlement, SettlementTransfer, Split, SplitSummary
+from . import pdf
+from .signals import expenses_created, invoices_created, payments_recorded, splits_settled
+from orders.models import OrderItem, SalesOrder
+from orders.services import OrderService
+from orders.signals import orders_bulk_updated
+from core.utils import day_bounds
 
 class BillingService:
 
+    @staticmethod
+    def allocate_invoice_numbers(count, on_date=None):
+        """
+        Reserves `count` consecutive invoice numbers for the month of `on_date` with a
+        single locked UPDATE of its InvoiceSequence row.
+
+        :return: list of numbers like INV-202610-00042
+        """
+        period = (on_date or timezone.localdate()).strftime('%Y%m')
+        with transaction.atomic():
+            InvoiceSequence.objects.get_or_create(period=period)
+            sequence = InvoiceSequence.objects.select_for_update().get(period=period)
+            first = sequence.last_number + 1
+            sequence.last_number += count
+            sequence.save(update_fields=['last_number'])
+        return [f"INV-{period}-{number:05d}" for number in range(first, first + count)]
+
     @staticmethod
     def generate_invoice(order_id):
         order = SalesOrder.objects.get(pk=order_id)
         if hasattr(order, 'invoice'):
             return order.invoice
 
-        invoice_number = str(uuid.uuid4()).replace('-', '').upper()[:12]
         invoice = Invoice.objects.create(
             order=order,
-            invoice_number=invoice_number,
+            invoice_number=BillingService.allocate_invoice_numbers(1)[0],
             total=order.total_amount,
             payment_status='unpaid'
         )
         return invoice
+
+    @staticmethod
+    @transaction.atomic
+    def generate_pending_invoices(until=None):
+        """
+        Bills every delivered order that has no invoice yet, in one transaction:
+        a block of invoice numbers, one bulk INSERT and one UPDATE of the order statuses.
+
+        :param until: only bill orders created on or before this date
+        :return: number of invoices created, and a queryset of them
+        """
+        orders = SalesOrder.objects.select_for_update().filter(status='delivered').exclude(
+            pk__in=Invoice.objects.values('order_id')
+        ).order_by('created_at', 'pk')
+        if until:
+            orders = orders.filter(created_at__lt=day_bounds(until)[1])
+        orders = list(orders.only('pk', 'total_amount'))
+        if not orders:
+            return 0, Invoice.objects.none()
+
+        numbers = BillingService.allocate_invoice_numbers(len(orders))
+        Invoice.objects.bulk_create(
+            Invoice(order=order, invoice_number=number, total=order.total_amount, payment_status='unpaid')
+            for order, number in zip(orders, numbers)
+        )
+        order_ids = [order.pk for order in orders]
+        SalesOrder.objects.filter(pk__in=order_ids).update(status='billed')
+        orders_bulk_updated.send(sender=SalesOrder, order_ids=order_ids)
+        invoices_created.send(sender=Invoice, order_ids=order_ids)
+        # Re-read rather than trust bulk_create: MySQL does not return the new primary keys
+        return len(orders), Invoice.objects.filter(order_id__in=order_ids).order_by('pk')
+
+
+class InvoicePDFService:
+    """
+    Serves invoice PDFs from the cache in settings.INVOICE_PDF_DIR, rendering missing
+    ones on the billing.pdf process pool. Files are keyed by the invoice's pk and
+    updated_at, which billing.signals moves when the order's lines change; the customer
+    and product details stay as they were when the invoice last changed.
+    """
+    template_name = 'billing/invoice_pdf.html'
+
+    @staticmethod
+    def preload(queryset):
+        """Loads what the PDF template reads (customer, order lines and their products) up front."""
+        return queryset.select_related('order__customer').prefetch_related(
+            Prefetch('order__items', queryset=OrderItem.objects.select_related('product'))
+        )
+
+    @staticmethod
+    def render_html(invoice):
+        totals = OrderService.get_totals(invoice.order)
+        context = {
+            'invoice': invoice,
+            'total_quantity': totals['total_quantity'],
+            'total_weight': totals['total_weight'],
+        }
+        return get_template(InvoicePDFService.template_name).render(context)
+
+    @staticmethod
+    def pdf_path(invoice):
+        """Path of the PDF for the invoice's current version; nothing is rendered."""
+        return pdf.cache_path(settings.INVOICE_PDF_DIR, invoice.pk, invoice.updated_at)
+
+    @staticmethod
+    def get_pdf(invoice, wait=None):
+        """
+        Returns the path of the invoice's PDF, queueing a render if this version is not cached.
+        Only a render loads the order lines, so `invoice` needs no preloading.
+
+        :param wait: seconds to wait for a queued render (0 returns at once, None waits until it finishes)
+        :return: file path, or None if the render did not finish within `wait`
+        :raises pdf.PDFRenderError: if xhtml2pdf could not render the invoice
+        """
+        path = InvoicePDFService.pdf_path(invoice)
+        if os.path.exists(path):
+            return path
+        invoice = InvoicePDFService.preload(Invoice.objects.filter(pk=invoice.pk)).get()
+        path = InvoicePDFService.pdf_path(invoice)
+        html = InvoicePDFService.render_html(invoice)
+        try:
+            return pdf.submit(html, path, settings.INVOICE_PDF_WORKERS).result(timeout=wait)
+        except TimeoutError:
+            return None
+
+    @staticmethod
+    def warm(invoices, progress=None):
+        """
+        Renders every uncached PDF among `invoices` in parallel.
+
+        :param invoices: iterable of Invoice, ideally with order__customer and order items preloaded
+        :param progress: optional callable(done, total) invoked as each render finishes
+        :return: dict with rendered, cached, failed, seconds and per_second
+        """
+        started = time.perf_counter()
+        cached = 0
+        futures = {}
+        for invoice in invoices:
+            path = InvoicePDFService.pdf_path(invoice)
+            if os.path.exists(path):
+                cached += 1
+            elif path not in futures:
+                futures[path] = pdf.submit(InvoicePDFService.render_html(invoice), path, settings.INVOICE_PDF_WORKERS)
+
+        rendered = failed = 0
+        for done, future in enumerate(as_completed(futures.values()), start=1):
+            if future.exception() is None:
+                rendered += 1
+            else:
+                failed += 1
+            if progress:
+                progress(done, len(futures))
+
+        seconds = time.perf_counter() - started
+        return {
+            'rendered': rendered,
+            'cached': cached,
+            'failed': failed,
+            'seconds': seconds,
+            'per_second': rendered / seconds if seconds else 0,
+        }
+
+
+BANK_PAYMENT_MODE = 'Bank Transfer'
+RECONCILE_CHUNK_SIZE = 500
+DATE_FORMATS = ('%Y-%m-%d', '%d/%m/%Y', '%d-%m-%Y')
+_TOKEN = re.compile(r'[A-Z0-9][A-Z0-9-]+')
+_DIGITS = re.compile(r'\d{10,}')
+
+
+class PaymentExceedsBalance(ValueError):
+    pass
+
+
+def _payment_status():
+    """payment_status derived from the row's own amount_paid and total, for use in UPDATEs."""
+    return Case(
+        When(amount_paid__gte=F('total'), then=Value('paid')),
+        When(amount_paid__gt=0, then=Value('partial')),
+        default=Value('unpaid'),
+    )
+
+
+def _parse_statement_rows(rows):
+    """
+    Validates bank statement rows. Returns (valid, errors) where valid holds
+    (line_number, paid_on, amount, reference, narration, customer) tuples.
+    """
+    valid, errors = [], []
+    for line_number, row in enumerate(rows, start=2):
+        try:
+            amount = Decimal(str(row.get('amount', '')).replace(',', '').strip())
+        except InvalidOperation:
+            errors.append((line_number, 'Invalid amount'))
+            continue
+        if amount <= 0:
+            errors.append((line_number, 'Amount must be greater than zero'))
+            continue
+        paid_on = None
+        raw_date = str(row.get('date', '')).strip()
+        for date_format in DATE_FORMATS:
+            try:
+                paid_on = datetime.datetime.strptime(raw_date, date_format).date()
+                break
+            except ValueError:
+                continue
+        if paid_on is None:
+            errors.append((line_number, f"Invalid date {raw_date!r}"))
+            continue
+        valid.append((
+            line_number,
+            paid_on,
+            amount.quantize(Decimal('0.01')),
+            (row.get('reference') or '').strip()[:64],
+            (row.get('narration') or '').strip(),
+            (row.get('customer') or '').strip(),
+        ))
+    return valid, errors
+
+
+class _OpenInvoiceIndex:
+    """
+    In-memory index of open invoices by invoice number, by (customer, balance) and by
+    balance, so each statement row is matched with dictionary lookups. Balances are
+    tracked as rows are matched, so an invoice is never allocated more than it owes.
+    """
+
+    def __init__(self, invoices):
+        self.balance = {}
+        self.by_number = {}
+        self.by_customer_amount = defaultdict(list)
+        self.by_amount = defaultdict(list)
+        for pk, number, total, paid, name, phone in invoices:
+            balance = total - paid
+            self.balance[pk] = balance
+            self.by_number[number.upper()] = pk
+            self.by_amount[balance].append(pk)
+            for key in self._customer_keys(name, phone):
+                self.by_customer_amount[(key, balance)].append(pk)
+
+    @staticmethod
+    def _customer_keys(*values):
+        keys = set()
+        for value in values:
+            if value:
+                keys.add(value.casefold())
+                digits = re.sub(r'\D', '', value)
+                if len(digits) >= 10:
+                    keys.add(digits[-10:])
+        return keys
+
+    def _first_owing(self, candidates, amount):
+        for pk in candidates:
+            if self.balance[pk] == amount:
+                return pk
+        return None
+
+    def match(self, amount, reference, narration, customer):
+        """Returns the pk of the invoice the payment settles, or None."""
+        text = f"{reference} {narration}".upper()
+        for token in _TOKEN.findall(text):
+            pk = self.by_number.get(token)
+            if pk is not None and amount <= self.balance[pk]:
+                return pk
+
+        keys = self._customer_keys(customer)
+        keys.update(digits[-10:] for digits in _DIGITS.findall(narration))
+        for key in keys:
+            pk = self._first_owing(self.by_customer_amount.get((key, amount), ()), amount)
+            if pk is not None:
+                return pk
+
+        owing = [pk for pk in self.by_amount.get(amount, ()) if self.balance[pk] == amount]
+        return owing[0] if len(owing) == 1 else None
+
+
+class PaymentService:
+    """
+    Records payments in the Payment ledger and keeps Invoice.amount_paid and payment_status
+    in step with F() updates, so concurrent payments add up instead of overwriting each other.
+    """
+
+    @staticmethod
+    @transaction.atomic
+    def record_payment(invoice, amount, payment_mode, reference='', paid_on=None):
+        """
+        Records one payment against `invoice` and refreshes the instance's balance fields.
+
+        :raises PaymentExceedsBalance: if the payment is more than the balance due
+        """
+        updated = Invoice.objects.filter(pk=invoice.pk, amount_paid__lte=F('total') - amount).update(
+            amount_paid=F('amount_paid') + amount,
+            payment_mode=payment_mode,
+            updated_at=timezone.now(),
+        )
+        if not updated:
+            raise PaymentExceedsBalance(f"Payment exceeds the balance due on invoice {invoice.invoice_number}.")
+        Invoice.objects.filter(pk=invoice.pk).update(payment_status=_payment_status())
+
+        payment = Payment.objects.create(
+            invoice=invoice,
+            amount=amount,
+            payment_mode=payment_mode,
+            reference=reference,
+            paid_on=paid_on or timezone.localdate(),
+        )
+        payments_recorded.send(sender=Payment, invoice_ids=[invoice.pk], amounts={invoice.pk: amount})
+        invoice.refresh_from_db(fields=['amount_paid', 'payment_status', 'payment_mode', 'updated_at'])
+        return payment
+
+    @staticmethod
+    def settle(invoice, payment_mode):
+        """Records a payment for whatever is still due on `invoice`."""
+        invoice.refresh_from_db(fields=['amount_paid', 'total'])
+        if invoice.balance <= 0:
+            return None
+        return PaymentService.record_payment(invoice, invoice.balance, payment_mode)
+
+    @staticmethod
+    def _apply(amounts, payment_mode):
+        """Adds {invoice_pk: amount} to amount_paid with one UPDATE per chunk of invoices."""
+        pks = list(amounts)
+        for start in range(0, len(pks), RECONCILE_CHUNK_SIZE):
+            chunk = pks[start:start + RECONCILE_CHUNK_SIZE]
+            whens = [When(pk=pk, then=F('amount_paid') + amounts[pk]) for pk in chunk]
+            Invoice.objects.filter(pk__in=chunk).update(
+                amount_paid=Case(*whens, default=F('amount_paid'), output_field=DecimalField()),
+                payment_mode=payment_mode,
+                updated_at=timezone.now(),
+            )
+            Invoice.objects.filter(pk__in=chunk).update(payment_status=_payment_status())
+
+    @staticmethod
+    def reconcile_statement(rows, apply=True):
+        """
+        Matches bank statement rows to open invoices in one pass and records the matches.
+
+        A row matches, in order of preference: an invoice number quoted in its reference
+        or narration; a customer (name or phone) with an invoice owing exactly the amount;
+        or the only open invoice owing exactly the amount. Rows whose reference is already
+        in the ledger are skipped, so re-importing a statement is harmless.
+
+        :param rows: iterable of dicts with date, amount, reference, narration and optional customer
+        :param apply: record the payments; pass False for a dry run
+        :return: dict with rows, matched, amount, unmatched, errors, seconds and rows_per_second
+        """
+        started = time.perf_counter()
+        valid, errors = _parse_statement_rows(rows)
+        unmatched = []
+        payments = []
+
+        with transaction.atomic():
+            # Lock only the invoices: the join would otherwise also lock their orders and customers
+            # for the whole run (MariaDB has no FOR UPDATE OF, and locks them all there)
+            lock_of = ('self',) if connection.features.has_select_for_update_of else ()
+            open_invoices = Invoice.objects.select_for_update(of=lock_of).exclude(payment_status='paid').values_list(
+                'pk', 'invoice_number', 'total', 'amount_paid', 'order__customer__name', 'order__customer__phone'
+            ).order_by('created_at', 'pk')
+            index = _OpenInvoiceIndex(open_invoices)
+
+            references = {row[3] for row in valid if row[3]}
+            seen = set(Payment.objects.filter(reference__in=references).values_list('reference', flat=True))
+
+            for line_number, paid_on, amount, reference, narration, customer in valid:
+                if reference and reference in seen:
+                    unmatched.append((line_number, 'Already recorded'))
+                    continue
+                pk = index.match(amount, reference, narration, customer)
+                if pk is None:
+                    unmatched.append((line_number, 'No open invoice matches'))
+                    continue
+                index.balance[pk] -= amount
+                if reference:
+                    seen.add(reference)
+                payments.append(Payment(
+                    invoice_id=pk, amount=amount, payment_mode=BANK_PAYMENT_MODE,
+                    reference=reference, paid_on=paid_on,
+                ))
+
+            if apply and payments:
+                amounts = defaultdict(Decimal)
+                for payment in payments:
+                    amounts[payment.invoice_id] += payment.amount
+                Payment.objects.bulk_create(payments, batch_size=RECONCILE_CHUNK_SIZE)
+                PaymentService._apply(amounts, BANK_PAYMENT_MODE)
+                payments_recorded.send(sender=Payment, invoice_ids=list(amounts), amounts=dict(amounts))
+
+        seconds = time.perf_counter() - started
+        row_count = len(valid) + len(errors)
+        return {
+            'rows': row_count,
+            'matched': len(payments),
+            'amount': sum((payment.amount for payment in payments), Decimal('0')),
+            'unmatched': unmatched,
+            'errors': errors,
+            'seconds': seconds,
+            'rows_per_second': row_count / seconds if seconds else 0,
+        }
+
+    @staticmethod
+    def reconcile_statement_csv(file_obj, apply=True):
+        """Reads a CSV with the header date,amount,reference,narration[,customer] and reconciles it."""
+        return PaymentService.reconcile_statement(csv.DictReader(file_obj), apply=apply)
+
+
+class StaleSettlement(Exception):
+    """Raised when the open splits changed between showing a settlement and applying it."""
+
+
+class SettlementService:
+    """
+    Settles shared expenses by netting: every open Split is a debt from its user to the
+    expense's payer, the debts are summed into one net position per user, and a greedy
+    matching of the largest debtor with the largest creditor pays everything off in at
+    most (users - 1) transfers instead of one payment per split.
+    """
+
+    @staticmethod
+    def _open_splits(until):
+        return Split.objects.filter(is_paid=False, expense__date_incurred__lte=until)
+
+    @staticmethod
+    def _debts(until):
+        """
+        One grouped query: outstanding amount per (debtor, creditor) pair.
+        The split count and pk sum make the token change whenever the set of splits does.
+        """
+        return list(
+            SettlementService._open_splits(until)
+            .values_list('user_id', 'expense__paid_by_id')
+            .annotate(
+                outstanding=Sum(F('amount') - F('paid_amount'), output_field=DecimalField(max_digits=14, decimal_places=2)),
+                split_count=Count('pk'),
+                pk_sum=Sum('pk'),
+            )
+            .order_by('user_id', 'expense__paid_by_id')
+        )
+
+    @staticmethod
+    def _token(debts):
+        digest = hashlib.sha256()
+        for row in debts:
+            digest.update(repr(row).encode())
+        return digest.hexdigest()
+
+    @staticmethod
+    def net_positions(debts):
+        """:return: {user_id: net amount}; positive means the user is owed money"""
+        positions = defaultdict(Decimal)
+        for debtor, creditor, outstanding, _count, _pk_sum in debts:
+            if debtor != creditor:
+                positions[debtor] -= outstanding
+                positions[creditor] += outstanding
+        # SQLite sums decimals as floats; round back to paise before matching debtors and creditors
+        return {user_id: amount.quantize(Decimal('0.01')) for user_id, amount in positions.items() if amount}
+
+    @staticmethod
+    def minimal_transfers(positions):
+        """
+        Greedy netting: repeatedly pays the largest creditor from the largest debtor.
+
+        :param positions: {user_id: net amount}, summing to zero
+        :return: list of (from_user_id, to_user_id, amount)
+        """
+        # heapq is a min-heap, so amounts are negated to pop the largest first; ties go by user id
+        creditors = [(-amount, user_id) for user_id, amount in positions.items() if amount > 0]
+        debtors = [(amount, user_id) for user_id, amount in positions.items() if amount < 0]
+        heapq.heapify(creditors)
+        heapq.heapify(debtors)
+        transfers = []
+        while creditors and debtors:
+            credit, creditor = heapq.heappop(creditors)
+            debt, debtor = heapq.heappop(debtors)
+            amount = min(-credit, -debt)
+            transfers.append((debtor, creditor, amount))
+            if -credit > amount:
+                heapq.heappush(creditors, (credit + amount, creditor))
+            if -debt > amount:
+                heapq.heappush(debtors, (debt + amount, debtor))
+        return transfers
+
+    @staticmethod
+    def plan(until=None):
+        """
+        Proposes a settlement of every split open on expenses incurred up to `until`.
+
+        :return: dict with until, positions, transfers, split_count, total and the token
+                 apply() needs to check nothing changed in between
+        """
+        until = until or timezone.localdate()
+        debts = SettlementService._debts(until)
+        positions = SettlementService.net_positions(debts)
+        return {
+            'until': until,
+            'positions': positions,
+            'transfers': SettlementService.minimal_transfers(positions),
+            'split_count': sum(row[3] for row in debts),
+            'total': sum((row[2] for row in debts if row[0] != row[1]), Decimal('0')).quantize(Decimal('0.01')),
+            'token': SettlementService._token(debts),
+        }
+
+    @staticmethod
+    @transaction.atomic
+    def apply(until, token, settled_by):
+        """
+        Records the planned transfers and closes all the splits they replace with one
+        UPDATE, in one transaction.
+
+        :param token: the token of the plan that was shown
+        :return: the Settlement, or None if there was nothing to settle
+        :raises StaleSettlement: if the open splits no longer match the plan
+        """
+        # Lock the splits being settled so a concurrent mark_paid or new split waits for us
+        split_ids = list(SettlementService._open_splits(until).select_for_update().values_list('pk', flat=True))
+        plan = SettlementService.plan(until)
+        if plan['token'] != token:
+            raise StaleSettlement("Splits changed since this settlement was calculated; review it again")
+        if not split_ids:
+            return None
+
+        settlement = Settlement.objects.create(
+            until=until, settled_by=settled_by, split_count=len(split_ids), total_settled=plan['total']
+        )
+        SettlementTransfer.objects.bulk_create([
+            SettlementTransfer(settlement=settlement, from_user_id=debtor, to_user_id=creditor, amount=amount)
+            for debtor, creditor, amount in plan['transfers']
+        ])
+        SettlementService._open_splits(until).update(
+            is_paid=True, paid_amount=F('amount'), paid_date=timezone.localdate(), settlement=settlement
+        )
+        splits_settled.send(sender=Settlement, settlement=settlement)
+        return settlement
+
+
+SPLIT_SUMMARY_CHUNK_SIZE = 200
+ZERO = Decimal('0.00')
+
+
+class SplitSummaryService:
+    """
+    Keeps SplitSummary in step with splits. Changes are applied as F() deltas inside the
+    writer's transaction, so concurrent expenses and payments add up.
+    """
+
+    @staticmethod
+    def apply(deltas):
+        """
+        Adds {(user_id, month): (share_delta, paid_delta)} to the summaries, one UPDATE per chunk.
+        """
+        deltas = {key: delta for key, delta in deltas.items() if any(delta)}
+        if not deltas:
+            return
+        SplitSummary.objects.bulk_create(
+            [SplitSummary(user_id=user_id, month=month) for user_id, month in deltas], ignore_conflicts=True
+        )
+        keys = list(deltas)
+        for start in range(0, len(keys), SPLIT_SUMMARY_CHUNK_SIZE):
+            chunk = keys[start:start + SPLIT_SUMMARY_CHUNK_SIZE]
+
+            def column(field, index):
+                whens = [
+                    When(user_id=user_id, month=month, then=F(field) + deltas[user_id, month][index])
+                    for user_id, month in chunk
+                ]
+                return Case(*whens, default=F(field), output_field=DecimalField())
+
+            matches = Q()
+            for user_id, month in chunk:
+                matches |= Q(user_id=user_id, month=month)
+            SplitSummary.objects.filter(matches).update(
+                total_share=column('total_share', 0),
+                total_paid=column('total_paid', 1),
+            )
+
+    @staticmethod
+    def compute(splits=None):
+        """
+        Totals of `splits` (default: all) with one grouped query.
+
+        :return: {(user_id, month): (total_share, total_paid)}
+        """
+        splits = Split.objects.all() if splits is None else splits
+        rows = splits.values_list('user_id', TruncMonth('expense__date_incurred')).annotate(
+            share=Sum('amount'), paid=Sum('amount', filter=Q(is_paid=True))
+        ).order_by()
+        return {(user_id, month): (share, paid or ZERO) for user_id, month, share, paid in rows}
+
+    @staticmethod
+    def apply_expenses(expense_ids):
+        """Adds the splits of newly created expenses."""
+        SplitSummaryService.apply(SplitSummaryService.compute(Split.objects.filter(expense_id__in=expense_ids)))
+
+    @staticmethod
+    def apply_settlement(settlement):
+        """Moves the shares of the splits a settlement closed from pending to paid."""
+        closed = SplitSummaryService.compute(Split.objects.filter(settlement=settlement))
+        SplitSummaryService.apply({key: (ZERO, share) for key, (share, _paid) in closed.items()})
+
+    @staticmethod
+    def move_expense(expense_id, old_month, new_month):
+        """Moves an expense's splits to another month after its date changed."""
+        shares = SplitSummaryService.compute(Split.objects.filter(expense_id=expense_id))
+        deltas = defaultdict(lambda: (ZERO, ZERO))
+        for (user_id, _month), (share, paid) in shares.items():
+            deltas[user_id, old_month] = (-share, -paid)
+            deltas[user_id, new_month] = (share, paid)
+        SplitSummaryService.apply(deltas)
+
+    @staticmethod
+    @transaction.atomic
+    def check(fix=False):
+        """
+        Compares every stored summary with a fresh computation.
+
+        :param fix: overwrite the summaries that disagree (and create missing ones)
+        :return: list of ((user_id, month), stored, expected) tuples for the mismatches
+        """
+        stored = {
+            (summary.user_id, summary.month): summary
+            for summary in SplitSummary.objects.select_for_update()
+        }
+        expected_totals = SplitSummaryService.compute()
+        mismatches, to_create, to_update = [], [], []
+        for key in stored.keys() | expected_totals.keys():
+            expected = expected_totals.get(key, (ZERO, ZERO))
+            summary = stored.get(key)
+            current = None if summary is None else (summary.total_share, summary.total_paid)
+            if current == expected or (summary is None and not any(expected)):
+                continue
+            mismatches.append((key, current, expected))
+            if summary is None:
+                summary = SplitSummary(user_id=key[0], month=key[1])
+                to_create.append(summary)
+            else:
+                to_update.append(summary)
+            summary.total_share, summary.total_paid = expected
+
+        if fix:
+            SplitSummary.objects.bulk_create(to_create, batch_size=SPLIT_SUMMARY_CHUNK_SIZE)
+            SplitSummary.objects.bulk_update(
+                to_update, ['total_share', 'total_paid'], batch_size=SPLIT_SUMMARY_CHUNK_SIZE
+            )
+        return sorted(mismatches)
+
+
+EXPENSE_IMPORT_CHUNK_SIZE = 500
+CENT = Decimal('0.01')
+
+
+class InvalidExpense(ValueError):
+    """Raised with the {field: message} errors of an expense that cannot be saved."""
+
+    def __init__(self, errors):
+        super().__init__(' '.join(errors.values()))
+        self.errors = errors
+
+
+def _parse_money(value):
+    """Rupees rounded half-up to the paisa, or None if `value` is not a number."""
+    try:
+        return Decimal(str(value).replace(',', '').strip()).quantize(CENT, rounding=ROUND_HALF_UP)
+    except InvalidOperation:
+        return None
+
+
+def _parse_day(value):
+    if isinstance(value, datetime.date):
+        return value
+    raw = str(value or '').strip()
+    for date_format in DATE_FORMATS:
+        try:
+            return datetime.datetime.strptime(raw, date_format).date()
+        except ValueError:
+            continue
+    return None
+
+
+def _listed(value):
+    """'asha; bala' -> ['asha', 'bala']"""
+    return [item.strip() for item in (value or '').split(';') if item.strip()]
+
+
+class ExpenseService:
+    """
+    Validates expenses and writes each with its splits in a fixed number of queries,
+    whether they come from the add expense form or a CSV import.
+    """
+
+    @staticmethod
+    def split_equally(amount, user_ids):
+        """
+        Shares that add up to exactly `amount`: the paise that do not divide evenly go
+        one each to the first users, so 100 between three is 33.34, 33.33 and 33.33.
+
+        :return: {user_id: Decimal share}
+        """
+        share, remainder = divmod(int(amount * 100), len(user_ids))
+        return {
+            user_id: Decimal(share + 1 if position < remainder else share) / 100
+            for position, user_id in enumerate(user_ids)
+        }
+
+    @staticmethod
+    def validate(description, amount, date_incurred, user_keys, shares, users):
+        """
+        Checks one expense without touching the database.
+
+        :param user_keys: ids (form) or usernames (CSV) of the users sharing it, in order
+        :param shares: amounts typed per user, aligned with user_keys, or None; when they
+                       are all blank the amount is split equally
+        :param users: {key: User} of the users allowed to share expenses
+        :return: (fields, splits, errors) where fields holds description, amount and
+                 date_incurred, splits is {user_id: Decimal share}, errors is {field: message}
+        """
+        errors = {}
+        description = (description or '').strip()
+        if not description:
+            errors['description'] = "Description is required."
+        amount = _parse_money(amount)
+        if amount is None:
+            errors['amount'] = "Invalid amount."
+        elif amount <= 0:
+            errors['amount'] = "Amount must be positive."
+        day = _parse_day(date_incurred)
+        if day is None:
+            errors['date_incurred'] = "Date is required." if not date_incurred else "Invalid date."
+
+        user_keys = list(dict.fromkeys(user_keys))
+        unknown = [str(key) for key in user_keys if key not in users]
+        if not user_keys:
+            errors['users'] = "Select at least one user."
+        elif unknown:
+            errors['users'] = f"Unknown users: {', '.join(unknown)}."
+
+        splits = {}
+        typed = [str(share).strip() for share in shares or []]
+        if not errors and any(typed):
+            amounts = [_parse_money(share) if share else None for share in typed]
+            if len(amounts) != len(user_keys) or any(share is None or share < 0 for share in amounts):
+                errors['splits'] = "Enter a split amount for every selected user."
+            elif sum(amounts) != amount:
+                errors['splits'] = f"Splits add up to Rs {sum(amounts)}, not Rs {amount}."
+            else:
+                splits = {users[key].pk: share for key, share in zip(user_keys, amounts)}
+        elif not errors:
+            splits = ExpenseService.split_equally(amount, [users[key].pk for key in user_keys])
+
+        fields = {'description': description, 'amount': amount, 'date_incurred': day}
+        return fields, splits, errors
+
+    @staticmethod
+    def add_expense(description, amount, date_incurred, paid_by, user_ids, shares=None):
+        """
+        Records an expense paid by `paid_by` and split between `user_ids`.
+
+        :param shares: amounts typed per user, aligned with user_ids; see validate()
+        :return: the Expense
+        :raises InvalidExpense: with the errors of every field that is wrong
+        """
+        ids = []
+        for user_id in user_ids:
+            try:
+                ids.append(int(user_id))
+            except (TypeError, ValueError):
+                raise InvalidExpense({'users': f"Unknown users: {user_id}."})
+        users = User.objects.filter(is_active=True).in_bulk(ids)
+        fields, splits, errors = ExpenseService.validate(description, amount, date_incurred, ids, shares, users)
+        if errors:
+            raise InvalidExpense(errors)
+        expense = Expense(paid_by=paid_by, **fields)
+        ExpenseService._save([(expense, splits)])
+        return expense
+
+    @staticmethod
+    @transaction.atomic
+    def _save(entries):
+        """Inserts [(unsaved Expense, {user_id: share})] and their splits."""
+        expenses = [expense for expense, _splits in entries]
+        if connection.features.can_return_rows_from_bulk_insert:
+            Expense.objects.bulk_create(expenses, batch_size=EXPENSE_IMPORT_CHUNK_SIZE)
+        else:
+            # MySQL does not return the new primary keys, which the splits need
+            for expense in expenses:
+                expense.save()
+        Split.objects.bulk_create([
+            Split(expense=expense, user_id=user_id, amount=share)
+            for expense, splits in entries
+            for user_id, share in splits.items()
+        ], batch_size=EXPENSE_IMPORT_CHUNK_SIZE)
+        expenses_created.send(sender=Expense, expense_ids=[expense.pk for expense in expenses])
+
+    @staticmethod
+    def import_expenses(rows, chunk_size=EXPENSE_IMPORT_CHUNK_SIZE):
+        """
+        Bulk-imports shared expenses with the same validation as the add expense form.
+
+        Rows are read lazily and written in chunks of `chunk_size`, each in its own
+        transaction and with one query to look up the chunk's users.
+
+        :param rows: iterable of dicts with date, description, amount, paid_by and
+                     split_between (usernames), and optional shares; several users or
+                     shares are separated with ';'
+        :return: dict with rows, errors (list of (row number, message)), seconds and rows_per_second
+        """
+        started = time.perf_counter()
+        rows = iter(rows)
+        imported = 0
+        errors = []
+        line_offset = 2
+        while True:
+            chunk = list(islice(rows, chunk_size))
+            if not chunk:
+                break
+            parsed = [
+                ((row.get('paid_by') or '').strip(), _listed(row.get('split_between')), _listed(row.get('shares')))
+                for row in chunk
+            ]
+            usernames = {name for paid_by, names, _shares in parsed for name in [paid_by, *names]}
+            users = User.objects.filter(is_active=True).in_bulk(usernames, field_name='username')
+
+            entries = []
+            for line_number, (row, (paid_by, names, shares)) in enumerate(zip(chunk, parsed), start=line_offset):
+                fields, splits, row_errors = ExpenseService.validate(
+                    row.get('description'), row.get('amount'), row.get('date'), names, shares, users
+                )
+                if paid_by not in users:
+                    row_errors['paid_by'] = f"Unknown payer {paid_by!r}."
+                if row_errors:
+                    errors.append((line_number, ' '.join(row_errors.values())))
+                    continue
+                entries.append((Expense(paid_by=users[paid_by], **fields), splits))
+            line_offset += len(chunk)
+
+            if entries:
+                ExpenseService._save(entries)
+            imported += len(entries)
+
+        seconds = time.perf_counter() - started
+        return {
+            'rows': imported,
+            'errors': errors,
+            'seconds': seconds,
+            'rows_per_second': imported / seconds if seconds else 0,
+        }
+
+    @staticmethod
+    def import_expenses_csv(file_obj, chunk_size=EXPENSE_IMPORT_CHUNK_SIZE):
+        """
+        Streams a CSV with the header date,description,amount,paid_by,split_between[,shares]
+        into import_expenses().
+        """
+        return ExpenseService.import_expenses(csv.DictReader(file_obj), chunk_size=chunk_size)
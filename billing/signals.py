@@ -0,0 +1,121 @@
+from decimal import Decimal
+
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import Signal, receiver
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from orders.models import OrderItem
+from orders.signals import orders_bulk_updated
+from .models import Expense, Invoice, Split
+
+# Sent by billing.services.PaymentService after it moves Invoice.amount_paid with
+# queryset.update(), which skips the model signals. Receivers get `invoice_ids` and
+# `amounts`, a dict of invoice id to the amount just paid.
+payments_recorded = Signal()
+
+# Sent by BillingService.generate_pending_invoices after its bulk_create, which skips
+# the model signals. Receivers get the `order_ids` that were invoiced.
+invoices_created = Signal()
+
+# Sent by SettlementService.apply after it closes splits with queryset.update(). Receivers
+# get the `settlement`; its splits are the ones just marked paid.
+splits_settled = Signal()
+
+# Sent by ExpenseService after it bulk-creates expenses and their splits, which skips the
+# model signals. Receivers get the `expense_ids`.
+expenses_created = Signal()
+
+ZERO = Decimal('0.00')
+
+
+def _month(day):
+    # Expense.date_incurred may still hold the raw form string right after create()
+    if isinstance(day, str):
+        day = parse_date(day)
+    return day.replace(day=1)
+
+
+def _expense_month(expense_id):
+    day = Expense.objects.filter(pk=expense_id).values_list('date_incurred', flat=True).first()
+    return _month(day) if day else None
+
+
+def _contribution(amount, is_paid, sign=1):
+    """(share, paid) a split adds to its user's month, or takes away with sign=-1."""
+    amount = Decimal(str(amount)) * sign
+    return (amount, amount if is_paid else ZERO)
+
+
+def _summaries():
+    # billing.services imports this module for the signals above, so it is imported late
+    from .services import SplitSummaryService
+    return SplitSummaryService
+
+
+@receiver(pre_save, sender=Split)
+def remember_split(sender, instance, **kwargs):
+    previous = None
+    if instance.pk:
+        previous = Split.objects.filter(pk=instance.pk).values_list(
+            'user_id', 'expense__date_incurred', 'amount', 'is_paid'
+        ).first()
+    instance._previous_split = previous
+
+
+@receiver(post_save, sender=Split)
+def apply_split_change(sender, instance, **kwargs):
+    key = (instance.user_id, _expense_month(instance.expense_id))
+    share, paid = _contribution(instance.amount, instance.is_paid)
+    deltas = {key: (share, paid)}
+    previous = getattr(instance, '_previous_split', None)
+    if previous:
+        user_id, day, amount, is_paid = previous
+        old_key = (user_id, _month(day))
+        old_share, old_paid = deltas.get(old_key, (ZERO, ZERO))
+        removed_share, removed_paid = _contribution(amount, is_paid, sign=-1)
+        deltas[old_key] = (old_share + removed_share, old_paid + removed_paid)
+    _summaries().apply(deltas)
+
+
+@receiver(post_delete, sender=Split)
+def apply_split_removal(sender, instance, **kwargs):
+    # Runs before the expense row goes when the whole expense is deleted
+    month = _expense_month(instance.expense_id)
+    if month is not None:
+        _summaries().apply({(instance.user_id, month): _contribution(instance.amount, instance.is_paid, sign=-1)})
+
+
+@receiver(pre_save, sender=Expense)
+def remember_expense_month(sender, instance, **kwargs):
+    instance._previous_month = _expense_month(instance.pk) if instance.pk else None
+
+
+@receiver(post_save, sender=Expense)
+def move_expense_splits(sender, instance, **kwargs):
+    previous = getattr(instance, '_previous_month', None)
+    month = _month(instance.date_incurred)
+    if previous and previous != month:
+        _summaries().move_expense(instance.pk, previous, month)
+
+
+@receiver(splits_settled)
+def apply_settled_splits(sender, settlement, **kwargs):
+    _summaries().apply_settlement(settlement)
+
+
+@receiver(expenses_created)
+def apply_created_splits(sender, expense_ids, **kwargs):
+    _summaries().apply_expenses(expense_ids)
+
+
+@receiver(post_save, sender=OrderItem)
+@receiver(post_delete, sender=OrderItem)
+def touch_invoice(sender, instance, **kwargs):
+    # updated_at keys the invoice's cached PDF (see InvoicePDFService)
+    Invoice.objects.filter(order_id=instance.order_id).update(updated_at=timezone.now())
+
+
+@receiver(orders_bulk_updated)
+def touch_bulk_invoices(sender, order_ids, **kwargs):
+    Invoice.objects.filter(order_id__in=order_ids).update(updated_at=timezone.now())
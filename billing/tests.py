@@ -1,3 +1,475 @@
-from django.test import TestCase
+import datetime
+import io
+import os
+import tempfile
+from decimal import Decimal
 
-# Create your tests here.
+from django.contrib.auth.models import User
+
+from django.core.cache import cache
+from django.db import connection
+from django.test import RequestFactory, TestCase, override_settings, skipUnlessDBFeature
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from brands.models import Brand
+from core.testing import QueryBudgetMixin
+from customers.models import Customer, CustomerType
+from orders.models import OrderItem, SalesOrder
+from products.models import Product
+from .models import Expense, Invoice, Payment, Settlement, Split, SplitSummary
+from reports.models import DailyCashFlow, DailySales
+from .services import (
+    BillingService, ExpenseService, InvalidExpense, InvoicePDFService, PaymentExceedsBalance, PaymentService,
+    SettlementService, SplitSummaryService, StaleSettlement,
+)
+from .views import InvoiceListView
+
+
+class InvoiceListQueryBudgetTests(QueryBudgetMixin, TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.customer_type = CustomerType.objects.create(name='Retail')
+
+    def seed(self, count):
+        start = Invoice.objects.count()
+        for i in range(start, start + count):
+            customer = Customer.objects.create(name=f'Customer {i}', phone='1', customer_type=self.customer_type)
+            order = SalesOrder.objects.create(customer=customer, total_amount=10)
+            Invoice.objects.create(order=order, invoice_number=f'INV-{i}', total=10)
+
+    def test_invoice_list(self):
+        self.assertConstantQueries(self.seed, lambda: self.client.get(reverse('billing:invoice_list')))
+
+    def test_invoice_list_view(self):
+        request = RequestFactory().get('/')
+        self.assertConstantQueries(self.seed, lambda: InvoiceListView.as_view()(request))
+
+
+class InvoicePDFCacheTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        customer_type = CustomerType.objects.create(name='Retail')
+        customer = Customer.objects.create(name='Customer', phone='1', customer_type=customer_type)
+        order = SalesOrder.objects.create(customer=customer, total_amount=100, status='billed')
+        cls.invoice = Invoice.objects.create(order=order, invoice_number='INV-PDF-1', total=100)
+
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        pdf_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(pdf_dir.cleanup)
+        settings_override = override_settings(INVOICE_PDF_DIR=pdf_dir.name)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def test_pdf_is_rendered_once_per_invoice_version(self):
+        first = InvoicePDFService.get_pdf(self.invoice)
+        self.assertTrue(os.path.exists(first))
+        with self.assertNumQueries(0):  # a cached version is found without rendering the HTML
+            self.assertEqual(InvoicePDFService.get_pdf(self.invoice), first)
+
+        self.invoice.amount_paid = 40
+        self.invoice.payment_status = 'partial'
+        self.invoice.save()
+        second = InvoicePDFService.get_pdf(self.invoice)
+        self.assertNotEqual(second, first)
+
+        PaymentService.record_payment(self.invoice, 10, 'Cash')
+        third = InvoicePDFService.get_pdf(self.invoice)
+        self.assertNotEqual(third, second)
+
+    def test_order_line_changes_make_a_new_version(self):
+        first = InvoicePDFService.get_pdf(self.invoice)
+        brand = Brand.objects.create(name='Brand')
+        product = Product.objects.create(brand=brand, name='Chakli', mrp=40, ptr=32, margin=8, weight_gms=200)
+        OrderItem.objects.create(order=self.invoice.order, product=product, quantity=2, price=32)
+        self.invoice.refresh_from_db()
+        self.assertNotEqual(InvoicePDFService.get_pdf(self.invoice), first)
+
+    def test_download_asks_to_retry_until_rendered(self):
+        response = self.client.get(reverse('billing:invoice_pdf', args=[self.invoice.pk]))
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(response['Retry-After'], '2')
+        InvoicePDFService.get_pdf(self.invoice)  # waits for the queued render
+        self.assertEqual(self.client.get(reverse('billing:invoice_pdf', args=[self.invoice.pk])).status_code, 200)
+
+    def test_download_streams_cached_file(self):
+        path = InvoicePDFService.get_pdf(self.invoice)
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse('billing:invoice_pdf', args=[self.invoice.pk]))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'application/pdf')
+        with open(path, 'rb') as cached_pdf:
+            self.assertEqual(b''.join(response.streaming_content), cached_pdf.read())
+
+
+class BulkInvoicingTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        customer_type = CustomerType.objects.create(name='Retail')
+        cls.customer = Customer.objects.create(name='Customer', phone='1', customer_type=customer_type)
+
+    def _delivered_orders(self, count):
+        return [SalesOrder.objects.create(customer=self.customer, total_amount=50, status='delivered') for _ in range(count)]
+
+    def _generate(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            with CaptureQueriesContext(connection) as queries:
+                count, invoices = BillingService.generate_pending_invoices()
+        return count, list(invoices), len(queries)
+
+    def test_bills_only_delivered_unbilled_orders_with_consecutive_numbers(self):
+        billed = SalesOrder.objects.create(customer=self.customer, total_amount=50, status='delivered')
+        BillingService.generate_invoice(billed.pk)
+        pending = SalesOrder.objects.create(customer=self.customer, total_amount=50, status='pending')
+        delivered = self._delivered_orders(3)
+
+        count, invoices, _queries = self._generate()
+
+        self.assertEqual(count, 3)
+        self.assertEqual(sorted(invoice.order_id for invoice in invoices), [order.pk for order in delivered])
+        numbers = [int(invoice.invoice_number.rsplit('-', 1)[1]) for invoice in invoices]
+        self.assertEqual(numbers, [2, 3, 4])
+        self.assertEqual(SalesOrder.objects.filter(status='billed').count(), 3)
+        pending.refresh_from_db()
+        self.assertEqual(pending.status, 'pending')
+        self.assertEqual(DailySales.objects.get(status='billed').order_count, 3)
+        self.assertEqual(self._generate()[0], 0)
+
+    def test_query_count_does_not_grow_with_batch_size(self):
+        # The first run of the month also creates the sequence row
+        self._delivered_orders(1)
+        self._generate()
+        self._delivered_orders(2)
+        small = self._generate()[2]
+        self._delivered_orders(10)
+        self.assertEqual(self._generate()[2], small)
+
+
+class PaymentLedgerTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        customer_type = CustomerType.objects.create(name='Retail')
+        cls.customers = [
+            Customer.objects.create(name=name, phone=phone, customer_type=customer_type)
+            for name, phone in [('Anand Stores', '9822000001'), ('Bhat Traders', '9822000002')]
+        ]
+
+    def _invoice(self, number, total, customer=None):
+        order = SalesOrder.objects.create(customer=customer or self.customers[0], total_amount=total, status='billed')
+        return Invoice.objects.create(order=order, invoice_number=number, total=total)
+
+    def test_payments_accumulate_from_stale_instances(self):
+        invoice = self._invoice('INV-P-1', 100)
+        stale = Invoice.objects.get(pk=invoice.pk)
+
+        PaymentService.record_payment(invoice, 30, 'Cash')
+        PaymentService.record_payment(stale, 50, 'UPI')
+        with self.assertRaises(PaymentExceedsBalance):
+            PaymentService.record_payment(stale, 21, 'UPI')
+
+        invoice.refresh_from_db()
+        self.assertEqual((invoice.amount_paid, invoice.payment_status), (80, 'partial'))
+        self.assertEqual(sum(payment.amount for payment in invoice.payments.all()), 80)
+
+        PaymentService.settle(invoice, 'Cash')
+        invoice.refresh_from_db()
+        self.assertEqual((invoice.amount_paid, invoice.payment_status), (100, 'paid'))
+
+    def test_statement_reconciliation(self):
+        quoted = self._invoice('INV-202610-00001', 500)
+        by_customer = self._invoice('INV-202610-00002', 250, customer=self.customers[1])
+        unique_amount = self._invoice('INV-202610-00003', 730)
+        self._invoice('INV-202610-00004', 120)
+        self._invoice('INV-202610-00005', 120)
+        rows = [
+            {'date': '2026-10-01', 'amount': '200.00', 'reference': 'UTR1', 'narration': 'NEFT inv-202610-00001'},
+            {'date': '01/10/2026', 'amount': '250', 'reference': 'UTR2', 'narration': 'UPI/9822000002/BHAT'},
+            {'date': '2026-10-02', 'amount': '730', 'reference': 'UTR3', 'narration': 'CASH DEPOSIT'},
+            {'date': '2026-10-02', 'amount': '120', 'reference': 'UTR4', 'narration': 'CASH DEPOSIT'},
+            {'date': 'yesterday', 'amount': '10', 'reference': 'UTR5', 'narration': ''},
+        ]
+
+        with self.captureOnCommitCallbacks(execute=True):
+            result = PaymentService.reconcile_statement(rows)
+
+        self.assertEqual(result['matched'], 3)
+        self.assertEqual(result['amount'], 1180)
+        self.assertEqual(result['unmatched'], [(5, 'No open invoice matches')])
+        self.assertEqual([line for line, _message in result['errors']], [6])
+        for invoice, paid, status in [(quoted, 200, 'partial'), (by_customer, 250, 'paid'), (unique_amount, 730, 'paid')]:
+            invoice.refresh_from_db()
+            self.assertEqual((invoice.amount_paid, invoice.payment_status), (paid, status))
+
+        again = PaymentService.reconcile_statement(rows[:3])
+        self.assertEqual(again['matched'], 0)
+        self.assertEqual(Payment.objects.count(), 3)
+
+
+    @skipUnlessDBFeature('has_select_for_update_of')
+    def test_reconciliation_locks_only_invoices(self):
+        self._invoice('INV-202610-00001', 500)
+        with CaptureQueriesContext(connection) as queries:
+            PaymentService.reconcile_statement([
+                {'date': '2026-10-01', 'amount': '500', 'reference': 'UTR1', 'narration': ''},
+            ])
+        locking = [query['sql'] for query in queries if 'FOR UPDATE' in query['sql']]
+        self.assertTrue(locking)
+        for sql in locking:
+            self.assertNotIn(connection.ops.quote_name(SalesOrder._meta.db_table), sql.split('FOR UPDATE', 1)[1])
+
+
+class SettlementTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.users = [User.objects.create_user(name, password='pw') for name in ('asha', 'bala', 'chetan', 'dev')]
+
+    def _expense(self, paid_by, shares, days_ago=0):
+        expense = Expense.objects.create(
+            description='Stall rent', amount=sum(shares.values()), paid_by=paid_by,
+            date_incurred=datetime.date.today() - datetime.timedelta(days=days_ago),
+        )
+        Split.objects.bulk_create([Split(expense=expense, user=user, amount=amount) for user, amount in shares.items()])
+        return expense
+
+    def test_minimal_transfers_pay_off_every_position(self):
+        positions = {1: Decimal('-50'), 2: Decimal('-30'), 3: Decimal('45'), 4: Decimal('35')}
+        transfers = SettlementService.minimal_transfers(positions)
+
+        self.assertLessEqual(len(transfers), len(positions) - 1)
+        balance = dict(positions)
+        for debtor, creditor, amount in transfers:
+            balance[debtor] += amount
+            balance[creditor] -= amount
+        self.assertTrue(all(amount == 0 for amount in balance.values()))
+
+    def test_plan_nets_splits_in_one_query(self):
+        asha, bala, chetan, dev = self.users
+        self._expense(asha, {asha: 100, bala: 100, chetan: 100})
+        self._expense(bala, {asha: 60, bala: 60})
+        self._expense(chetan, {dev: 40})
+        self._expense(dev, {asha: 500}, days_ago=10)
+        Split.objects.filter(user=asha, amount=500).update(paid_amount=200)
+
+        with self.assertNumQueries(1):
+            plan = SettlementService.plan()
+
+        self.assertEqual(plan['positions'], {asha.pk: Decimal('-160'), bala.pk: Decimal('-40'), chetan.pk: Decimal('-60'), dev.pk: Decimal('260')})
+        self.assertEqual(plan['split_count'], 7)
+        self.assertEqual(plan['total'], Decimal('600'))
+        self.assertLessEqual(len(plan['transfers']), 3)
+
+        earlier = SettlementService.plan(datetime.date.today() - datetime.timedelta(days=1))
+        self.assertEqual(earlier['transfers'], [(asha.pk, dev.pk, Decimal('300'))])
+
+    def test_apply_closes_splits_and_records_transfers(self):
+        asha, bala, chetan, _dev = self.users
+        self._expense(asha, {asha: 100, bala: 100, chetan: 100})
+        self._expense(bala, {chetan: 30})
+        plan = SettlementService.plan()
+
+        settlement = SettlementService.apply(plan['until'], plan['token'], asha)
+
+        self.assertEqual((settlement.split_count, settlement.total_settled), (4, Decimal('230')))
+        self.assertEqual(
+            sorted(settlement.transfers.values_list('from_user_id', 'to_user_id', 'amount')),
+            sorted(plan['transfers']),
+        )
+        self.assertFalse(Split.objects.filter(is_paid=False).exists())
+        self.assertTrue(all(split.paid_amount == split.amount for split in Split.objects.filter(settlement=settlement)))
+        self.assertEqual(SettlementService.plan()['transfers'], [])
+
+    def test_apply_rejects_a_stale_plan(self):
+        asha, bala, _chetan, _dev = self.users
+        self._expense(asha, {bala: 100})
+        plan = SettlementService.plan()
+        self._expense(bala, {asha: 20})
+
+        with self.assertRaises(StaleSettlement):
+            SettlementService.apply(plan['until'], plan['token'], asha)
+        self.assertFalse(Settlement.objects.exists())
+        self.assertEqual(Split.objects.filter(is_paid=True).count(), 0)
+
+    def test_settle_up_view(self):
+        asha, bala, _chetan, _dev = self.users
+        self._expense(asha, {bala: 100})
+        self.client.force_login(asha)
+
+        response = self.client.get(reverse('billing:settle_up'))
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'bala')
+
+        plan = response.context['plan']
+        response = self.client.post(reverse('billing:settle_up'), {'until': plan['until'].isoformat(), 'token': plan['token']})
+        self.assertRedirects(response, reverse('billing:expense_list'), fetch_redirect_response=False)
+        self.assertEqual(Settlement.objects.get().transfers.get().amount, Decimal('100'))
+
+
+class SplitSummaryTests(QueryBudgetMixin, TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.users = [User.objects.create_user(name, password='pw') for name in ('asha', 'bala', 'chetan')]
+
+    def _expense(self, day, shares, paid_by=None):
+        expense = Expense.objects.create(
+            description='Gas cylinder', amount=sum(shares.values()), date_incurred=day, paid_by=paid_by or self.users[0]
+        )
+        return expense, [Split.objects.create(expense=expense, user=user, amount=amount) for user, amount in shares.items()]
+
+    def test_summaries_follow_split_and_expense_writes(self):
+        asha, bala, chetan = self.users
+        expense, (split_a, split_b) = self._expense(datetime.date(2026, 9, 5), {asha: 40, bala: 60})
+        self._expense(datetime.date(2026, 10, 1), {bala: 15, chetan: 15}, paid_by=bala)
+
+        split_b.is_paid = True
+        split_b.save()
+        split_a.user, split_a.amount = chetan, Decimal('45')
+        split_a.save()
+        self.assertEqual(SplitSummaryService.check(), [])
+        self.assertEqual(
+            SplitSummary.objects.values_list('total_share', 'total_paid').get(user=bala, month=datetime.date(2026, 9, 1)),
+            (Decimal('60'), Decimal('60')),
+        )
+
+        expense.date_incurred = datetime.date(2026, 10, 20)
+        expense.save()
+        self.assertEqual(SplitSummaryService.check(), [])
+        self.assertEqual(
+            SplitSummary.objects.get(user=bala, month=datetime.date(2026, 10, 1)).total_share, Decimal('75')
+        )
+
+        plan = SettlementService.plan(datetime.date(2026, 10, 31))
+        SettlementService.apply(plan['until'], plan['token'], asha)
+        self.assertEqual(SplitSummaryService.check(), [])
+
+        expense.delete()
+        self.assertEqual(SplitSummaryService.check(), [])
+        self.assertEqual(
+            SplitSummary.objects.get(user=chetan, month=datetime.date(2026, 10, 1)).total_share, Decimal('15')
+        )
+
+    def test_check_repairs_summaries(self):
+        self._expense(datetime.date(2026, 9, 5), {self.users[1]: 60})
+        SplitSummary.objects.update(total_share=0)
+
+        self.assertEqual(len(SplitSummaryService.check(fix=True)), 1)
+        self.assertEqual(SplitSummaryService.check(), [])
+
+    def test_expense_list_is_windowed_by_month(self):
+        self._expense(datetime.date(2026, 9, 5), {self.users[1]: 60})
+        self._expense(datetime.date(2026, 8, 5), {self.users[1]: 70})
+        self.client.force_login(self.users[0])
+
+        response = self.client.get(reverse('billing:expense_list'), {'month': '2026-09'})
+        self.assertEqual([expense.amount for expense in response.context['expenses']], [Decimal('60')])
+        summary = response.context['expense_summary'].get()
+        self.assertEqual((summary['pending'], summary['overall_pending']), (Decimal('60'), Decimal('130')))
+
+    def test_expense_list_query_budget(self):
+        asha, bala, chetan = self.users
+        self.client.force_login(asha)
+
+        def seed(count):
+            for i in range(count):
+                self._expense(datetime.date(2026, 9, 1 + i % 28), {asha: 10, bala: 10, chetan: 10})
+                self._expense(datetime.date(2025, 1 + i % 12, 1), {bala: 10, chetan: 10})
+
+        self.assertConstantQueries(
+            seed, lambda: self.client.get(reverse('billing:expense_list'), {'month': '2026-09'}), n=10
+        )
+
+
+class ExpenseServiceTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.users = [User.objects.create_user(name, password='pw') for name in ('asha', 'bala', 'chetan')]
+
+    def test_equal_splits_add_up_to_the_paisa(self):
+        shares = ExpenseService.split_equally(Decimal('100.00'), [3, 1, 2])
+
+        self.assertEqual(shares, {3: Decimal('33.34'), 1: Decimal('33.33'), 2: Decimal('33.33')})
+        self.assertEqual(sum(ExpenseService.split_equally(Decimal('0.05'), list(range(7))).values()), Decimal('0.05'))
+
+    def test_add_expense_validates_and_bulk_creates_splits(self):
+        asha, bala, chetan = self.users
+        ids = [str(user.pk) for user in self.users]
+
+        with self.captureOnCommitCallbacks(execute=True):
+            expense = ExpenseService.add_expense('Chai', '10', '2026-10-05', asha, ids)
+            ExpenseService.add_expense('Samosa', '90', '2026-10-05', asha, ids[:2], ['50', '40.00'])
+
+        self.assertEqual(
+            sorted(expense.splits.values_list('user__username', 'amount')),
+            [('asha', Decimal('3.34')), ('bala', Decimal('3.33')), ('chetan', Decimal('3.33'))],
+        )
+        self.assertEqual(SplitSummaryService.check(), [])
+        self.assertEqual(DailyCashFlow.objects.get(day=datetime.date(2026, 10, 5)).cash_out, Decimal('100'))
+
+        with self.assertRaises(InvalidExpense) as raised:
+            ExpenseService.add_expense('', '-5', '', asha, [])
+        self.assertEqual(set(raised.exception.errors), {'description', 'amount', 'date_incurred', 'users'})
+        with self.assertRaises(InvalidExpense) as raised:
+            ExpenseService.add_expense('Vada', '90', '2026-10-05', asha, ids[:2], ['50', '30'])
+        self.assertEqual(raised.exception.errors, {'splits': "Splits add up to Rs 80.00, not Rs 90.00."})
+        with self.assertRaises(InvalidExpense):
+            ExpenseService.add_expense('Vada', '90', '2026-10-05', asha, ids + ['999999'])
+        self.assertEqual(Expense.objects.count(), 2)
+
+    def test_add_expense_view_query_count_does_not_grow_with_users(self):
+        more = [User.objects.create_user(f'partner{i}') for i in range(10)]
+        self.client.force_login(self.users[0])
+
+        def post(users):
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.post(reverse('billing:add_expense'), {
+                    'description': 'Tea', 'amount': '100', 'date_incurred': '2026-10-05',
+                    'users': [user.pk for user in users],
+                })
+            self.assertRedirects(response, reverse('billing:expense_list'), fetch_redirect_response=False)
+            return len(queries)
+
+        self.assertEqual(post(self.users[:2]), post(self.users + more))
+
+    def test_add_expense_view_keeps_manual_splits_on_error(self):
+        asha, bala, _chetan = self.users
+        self.client.force_login(asha)
+
+        response = self.client.post(reverse('billing:add_expense'), {
+            'description': 'Tea', 'amount': '100', 'date_incurred': '2026-10-05',
+            'users': [asha.pk, bala.pk], f'split_{asha.pk}': '70', f'split_{bala.pk}': '20',
+        })
+
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('splits', response.context['errors'])
+        self.assertContains(response, 'value="70"')
+
+    def test_csv_import(self):
+        rows = io.StringIO(
+            "date,description,amount,paid_by,split_between,shares\n"
+            "2026-10-01,Rent,300,asha,asha;bala;chetan,\n"
+            "02/10/2026,Gas,100,bala,asha;bala,60;40\n"
+            "2026-10-03,Milk,50,dev,asha,\n"
+            "2026-10-03,Milk,50,asha,asha;zoe,\n"
+            "2026-10-04,Bread,40,chetan,bala;chetan,30;20\n"
+            "2026-10-05,Eggs,10,chetan,asha;bala;chetan,\n"
+        )
+
+        with self.assertNumQueries(18):
+            result = ExpenseService.import_expenses_csv(rows, chunk_size=3)
+
+        self.assertEqual(result['rows'], 3)
+        self.assertEqual([line for line, _message in result['errors']], [4, 5, 6])
+        self.assertIn("Unknown payer 'dev'", result['errors'][0][1])
+        self.assertEqual(Split.objects.count(), 8)
+        self.assertEqual(
+            Split.objects.get(expense__description='Eggs', user__username='asha').amount, Decimal('3.34')
+        )
+        self.assertEqual(SplitSummaryService.check(), [])
@@ -1,21 +1,35 @@
+import datetime
 from django.views.generic import ListView, DetailView, View
 from django.shortcuts import redirect, get_object_or_404
 from django.contrib import messages
 from orders.models import SalesOrder
-from .models import Invoice, Expense, Split
-from .services import BillingService
-from django.db import transaction
+from orders.services import OrderService
+from .models import Invoice, Expense, Split, SplitSummary
+from .services import (
+    BillingService, ExpenseService, InvalidExpense, InvoicePDFService, PaymentExceedsBalance, PaymentService,
+    SettlementService, StaleSettlement,
+)
 from django.shortcuts import render
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.models import User
 from django.utils import timezone
 from decimal import Decimal
-from django.db.models import Sum, Q
+from django.db.models import F, Prefetch, Sum, Q
+from django.utils.dateparse import parse_date
+from core.pagination import keyset_paginate
+from core.utils import EXPORT_CHUNK_SIZE, day_bounds, stream_export
+
+EXPENSE_PAGE_SIZE = 25
+
+
 class InvoiceListView(ListView):
     model = Invoice
     template_name = 'billing/invoice_list.html'
     context_object_name = 'invoices'
 
+    def get_queryset(self):
+        return super().get_queryset().select_related('order__customer').order_by('-created_at')
+
 class InvoiceDetailView(DetailView):
     model = Invoice
     template_name = 'billing/invoice_detail.html'
@@ -31,23 +45,39 @@ class GenerateInvoiceView(View):
 
 @login_required
 def expense_list(request):
-    # Get all expenses where the current user is the one who paid
-    expenses = Expense.objects.all().order_by('-date_incurred')
-
-    # --- Calculate the expense summary ---
-    # We want to get the total amount each user owes from the splits
-    expense_summary = Split.objects.filter(
-        expense__in=expenses
-    ).values(
-        'user__username' # Group by the user in the split
-    ).annotate(
-        total_share=Sum('amount'),
-        total_paid=Sum('amount', filter=Q(is_paid=True)),
-        total_pending=Sum('amount', filter=Q(is_paid=False))
-    ).order_by('user__username')
+    """
+    One month of expenses at a time (?month=YYYY-MM, default: this month), newest first
+    in keyset pages of EXPENSE_PAGE_SIZE, with each user's split totals for the month and
+    overall read from SplitSummary. The page costs the same few queries however much
+    history there is.
+    """
+    try:
+        month = datetime.datetime.strptime(request.GET.get('month', ''), '%Y-%m').date()
+    except ValueError:
+        month = timezone.localdate().replace(day=1)
+    next_month = (month + datetime.timedelta(days=32)).replace(day=1)
+
+    expenses = Expense.objects.filter(
+        date_incurred__gte=month, date_incurred__lt=next_month
+    ).prefetch_related(Prefetch('splits', queryset=Split.objects.select_related('user').order_by('pk')))
+    page = keyset_paginate(
+        expenses, 'date_incurred', EXPENSE_PAGE_SIZE,
+        after=request.GET.get('after'), before=request.GET.get('before'),
+    )
+
+    # One grouped query over the summary table: a row per user and month, not per split
+    expense_summary = SplitSummary.objects.values('user__username').annotate(
+        share=Sum('total_share', filter=Q(month=month)),
+        paid=Sum('total_paid', filter=Q(month=month)),
+        pending=Sum(F('total_share') - F('total_paid'), filter=Q(month=month)),
+        overall_pending=Sum(F('total_share') - F('total_paid')),
+    ).filter(Q(share__isnull=False) | ~Q(overall_pending=0)).order_by('user__username')
 
     context = {
-        'expenses': expenses,
+        'expenses': page,
+        'month': month,
+        'previous_month': (month - datetime.timedelta(days=1)).replace(day=1),
+        'next_month': next_month,
         'expense_summary': expense_summary,
     }
     return render(request, 'billing/expense_list.html', context)
@@ -55,84 +85,39 @@ def expense_list(request):
 
 @login_required
 def add_expense(request):
-    users = User.objects.all()
+    users = User.objects.filter(is_active=True).only('id', 'username', 'first_name', 'last_name').order_by('username')
     errors = {}
     selected_user_ids = []
     posted_data = {}
     manual_splits = {}
 
     if request.method == 'POST':
-        description = request.POST.get('description', '').strip()
-        amount = request.POST.get('amount', '').strip()
-        date_incurred = request.POST.get('date_incurred', '').strip()
-        paid_by = request.user
-        involved_users = request.POST.getlist('users')
-        splits_input = request.POST.getlist('splits')
-
+        selected_user_ids = request.POST.getlist('users')
         posted_data = request.POST.copy()
-        selected_user_ids = involved_users
-
-        # Basic validations
-        if not description:
-            errors['description'] = "Description is required."
-        try:
-            amount_val = float(amount)
-            if amount_val <= 0:
-                errors['amount'] = "Amount must be positive."
-        except:
-            errors['amount'] = "Invalid amount."
-        if not date_incurred:
-            errors['date_incurred'] = "Date is required."
-        if not involved_users:
-            errors['users'] = "Select at least one user."
-
-        # Build splits dict and fallback to equal split if missing or invalid
-        split_amounts = {}
+        manual_splits = {user_id: request.POST.get(f'split_{user_id}', '') for user_id in selected_user_ids}
         try:
-            for user_id, split_str in zip(involved_users, splits_input):
-                split_amounts[user_id] = float(split_str) if split_str.strip() else 0
-        except:
-            errors['splits'] = "Invalid split amount."
-
-        # If sum differs from total amount, override splits to equal fallback silently
-        if not errors:
-            total_splits = round(sum(split_amounts.values()), 2)
-            if abs(total_splits - amount_val) > 0.01:
-                # Override splits to equal share
-                equal_share = round(amount_val / len(involved_users), 2)
-                for user_id in involved_users:
-                    split_amounts[user_id] = equal_share
-
-        if errors:
-            return render(request, 'billing/add_expense.html', {
-                'errors': errors,
-                'users': users,
-                'selected_user_ids': selected_user_ids,
-                'posted': posted_data,
-                'manual_splits': split_amounts,
-            })
-
-        # Save data
-        with transaction.atomic():
-            expense = Expense.objects.create(description=description, amount=amount_val, date_incurred=date_incurred, paid_by=paid_by)
-            for user_id, sa in split_amounts.items():
-                try:
-                    user_obj = User.objects.get(id=user_id)
-                    Split.objects.create(expense=expense, user=user_obj, amount=sa)
-                except User.DoesNotExist:
-                    continue
-        return redirect('billing:expense_list')
+            ExpenseService.add_expense(
+                request.POST.get('description', ''),
+                request.POST.get('amount', ''),
+                request.POST.get('date_incurred', ''),
+                request.user,
+                selected_user_ids,
+                list(manual_splits.values()),
+            )
+        except InvalidExpense as exc:
+            errors = exc.errors
+        else:
+            return redirect('billing:expense_list')
 
-    # GET request
     return render(request, 'billing/add_expense.html', {
         'users': users,
         'errors': errors,
-        'selected_user_ids': [],
-        'posted': {},
-        'manual_splits': {},
+        'selected_user_ids': selected_user_ids,
+        'posted': posted_data,
+        'manual_splits': manual_splits,
     })
-    
-    
+
+
 @login_required
 def mark_paid(request, split_id):
     split = get_object_or_404(Split, id=split_id, user=request.user)
@@ -145,6 +130,41 @@ def mark_paid(request, split_id):
     return render(request, 'billing/mark_paid_confirm.html', {'split': split})
 
 
+@login_required
+def settle_up(request):
+    """
+    Shows the netted transfers that settle every split open on expenses up to ?until=
+    and, on POST, records them and closes those splits in one go.
+    """
+    until = parse_date(request.POST.get('until') or request.GET.get('until') or '') or timezone.localdate()
+
+    if request.method == 'POST':
+        try:
+            settlement = SettlementService.apply(until, request.POST.get('token', ''), request.user)
+        except StaleSettlement as exc:
+            messages.error(request, str(exc))
+            return redirect(f"{request.path}?until={until.isoformat()}")
+        if settlement:
+            messages.success(
+                request,
+                f"Settled {settlement.split_count} splits with {settlement.transfers.count()} transfers."
+            )
+        return redirect('billing:expense_list')
+
+    plan = SettlementService.plan(until)
+    users = User.objects.in_bulk(plan['positions'].keys())
+    context = {
+        'plan': plan,
+        # (user, amount, owes) with the biggest debtors first
+        'positions': [
+            (users[user_id], abs(amount), amount < 0)
+            for user_id, amount in sorted(plan['positions'].items(), key=lambda row: row[1])
+        ],
+        'transfers': [(users[debtor], users[creditor], amount) for debtor, creditor, amount in plan['transfers']],
+    }
+    return render(request, 'billing/settle_up.html', context)
+
+
 def generate_invoice(request, order_id):
     """
     Generates an invoice for a delivered order.
@@ -164,7 +184,7 @@ def generate_invoice(request, order_id):
     # 3. Generate the invoice
     invoice = Invoice.objects.create(
         order=order,
-        invoice_number=f"INV-{order.id}-{timezone.now().strftime('%Y%m%d')}",
+        invoice_number=BillingService.allocate_invoice_numbers(1)[0],
         total=order.total_amount
     )
 
@@ -176,24 +196,38 @@ def generate_invoice(request, order_id):
     return redirect('billing:invoice_detail', invoice_id=invoice.id)
 
 
+def generate_pending_invoices(request):
+    """
+    Bills every delivered order that has no invoice yet in one go.
+    PDFs are rendered on first download (or ahead of time with `manage.py warm_invoice_pdfs`).
+    """
+    if request.method == 'POST':
+        count, _invoices = BillingService.generate_pending_invoices()
+        if count:
+            messages.success(request, f"Generated {count} invoice(s) for delivered orders.")
+        else:
+            messages.info(request, "There are no delivered orders waiting for an invoice.")
+    return redirect('billing:invoice_list')
+
+
+def _invoice_with_items():
+    """Invoice queryset that loads the customer and the order lines with their products up front."""
+    return InvoicePDFService.preload(Invoice.objects.all())
+
+
 def invoice_detail(request, invoice_id):
     """
     Displays the details of a single invoice and calculates item totals.
     """
-    invoice = get_object_or_404(Invoice, id=invoice_id)
-    
-    # Calculate total quantity and weight for the table footer
-    total_quantity = 0
-    total_weight = 0
-    for item in invoice.order.items.all():
-        total_quantity += item.quantity
-        # Calculate total weight by multiplying item weight by its quantity
-        total_weight += (item.product.weight_gms * item.quantity)
-        
+    invoice = get_object_or_404(_invoice_with_items(), id=invoice_id)
+
+    # Total quantity and weight for the table footer
+    totals = OrderService.get_totals(invoice.order)
+
     context = {
         'invoice': invoice,
-        'total_quantity': total_quantity,
-        'total_weight': total_weight,
+        'total_quantity': totals['total_quantity'],
+        'total_weight': totals['total_weight'],
     }
     
     return render(request, 'billing/invoice_detail.html', context)
@@ -212,11 +246,9 @@ def mark_invoice_as_paid(request, invoice_id):
             messages.error(request, "Please select a payment mode.")
             return redirect('billing:invoice_detail', invoice_id=invoice.id)
 
-        # Update the invoice status
-        invoice.payment_status = 'paid'
-        invoice.payment_mode = payment_mode
-        invoice.save()
-        
+        # Record a payment for whatever is still due
+        PaymentService.settle(invoice, payment_mode)
+
         messages.success(request, f"Invoice {invoice.invoice_number} has been marked as paid.")
         return redirect('billing:invoice_detail', invoice_id=invoice.id)
 
@@ -248,21 +280,14 @@ def record_payment(request, invoice_id):
             messages.error(request, "Payment amount must be a positive number.")
             return redirect('billing:invoice_detail', invoice_id=invoice.id)
             
-        if payment_amount > invoice.balance:
+        # --- Record the payment; the balance check happens atomically in the UPDATE ---
+        try:
+            PaymentService.record_payment(invoice, payment_amount, payment_mode)
+        except PaymentExceedsBalance:
+            invoice.refresh_from_db(fields=['amount_paid'])
             messages.error(request, f"Payment cannot exceed the remaining balance of ₹{invoice.balance}.")
             return redirect('billing:invoice_detail', invoice_id=invoice.id)
 
-        # --- Update Invoice ---
-        invoice.amount_paid += payment_amount
-        invoice.payment_mode = payment_mode
-
-        if invoice.amount_paid >= invoice.total:
-            invoice.payment_status = 'paid'
-        else:
-            invoice.payment_status = 'partial'
-        
-        invoice.save()
-
         messages.success(request, f"Payment of ₹{payment_amount} recorded successfully.")
         return redirect('billing:invoice_detail', invoice_id=invoice.id)
 
@@ -270,53 +295,64 @@ def record_payment(request, invoice_id):
     return redirect('billing:invoice_detail', invoice_id=invoice.id)
 
 
+def export_invoices(request):
+    """
+    Streams invoices as CSV or XLSX (?format=xlsx), optionally filtered by
+    ?payment_status= and a ?start_date= / ?end_date= range (YYYY-MM-DD).
+    """
+    invoices = Invoice.objects.order_by('-created_at', '-pk')
+    payment_status = request.GET.get('payment_status')
+    if payment_status:
+        invoices = invoices.filter(payment_status=payment_status)
+    start_date = parse_date(request.GET.get('start_date') or '')
+    end_date = parse_date(request.GET.get('end_date') or '')
+    if start_date:
+        invoices = invoices.filter(created_at__gte=day_bounds(start_date)[0])
+    if end_date:
+        invoices = invoices.filter(created_at__lt=day_bounds(end_date)[1])
+
+    rows = invoices.annotate(balance_due=F('total') - F('amount_paid')).values_list(
+        'invoice_number', 'created_at', 'order_id', 'order__customer__name',
+        'total', 'amount_paid', 'balance_due', 'payment_status', 'payment_mode'
+    ).iterator(chunk_size=EXPORT_CHUNK_SIZE)
+    header = ['Invoice #', 'Created At', 'Order ID', 'Customer', 'Total', 'Amount Paid', 'Balance', 'Status', 'Last Payment Mode']
+    return stream_export(request.GET.get('format'), 'invoices', header, rows)
+
+
 def invoice_list(request):
     """
     Displays a list of all invoices.
     """
-    invoices = Invoice.objects.all().order_by('-created_at')
+    invoices = Invoice.objects.select_related('order__customer').order_by('-created_at')
     return render(request, 'billing/invoice_list.html', {'invoices': invoices})
 
 
 
-from django.http import HttpResponse
-from django.template.loader import get_template
-from xhtml2pdf import pisa
-from .models import Invoice
+from django.http import FileResponse, HttpResponse
+from .pdf import PDFRenderError
 
 def render_pdf_view(request, invoice_id):
     """
-    Renders an invoice as a PDF, including calculated totals.
+    Serves an invoice as a PDF from the rendered-PDF cache.
+    A version that is not cached yet is queued for rendering in the background and
+    the browser is asked to retry shortly.
     """
     invoice = get_object_or_404(Invoice, id=invoice_id)
-    
-    # Calculate total quantity and weight for the PDF context
-    total_quantity = 0
-    total_weight = 0
-    for item in invoice.order.items.all():
-        total_quantity += item.quantity
-        total_weight += (item.product.weight_gms * item.quantity)
-
-    # Prepare the context for the template
-    template_path = 'billing/invoice_pdf.html'
-    context = {
-        'invoice': invoice,
-        'total_quantity': total_quantity,
-        'total_weight': total_weight,
-    }
-
-    # Create a Django response object, and specify content_type as pdf
-    response = HttpResponse(content_type='application/pdf')
-    response['Content-Disposition'] = f'attachment; filename="invoice_{invoice.invoice_number}.pdf"'
 
-    # Find the template and render it.
-    template = get_template(template_path)
-    html = template.render(context)
-
-    # Create a PDF
-    pisa_status = pisa.CreatePDF(html, dest=response)
-
-    # If error, show an error message
-    if pisa_status.err:
-       return HttpResponse('We had some errors <pre>' + html + '</pre>')
-    return response
+    try:
+        path = InvoicePDFService.get_pdf(invoice, wait=0)
+    except PDFRenderError:
+        return HttpResponse('We had some errors rendering this invoice.', status=500)
+
+    if path is None:
+        response = render(request, 'billing/invoice_pdf_pending.html', {'invoice': invoice}, status=202)
+        response['Retry-After'] = '2'
+        return response
+
+    # FileResponse hands the open file to the server's wsgi.file_wrapper (sendfile where available)
+    return FileResponse(
+        open(path, 'rb'),
+        as_attachment=True,
+        filename=f'invoice_{invoice.invoice_number}.pdf',
+        content_type='application/pdf',
+    )
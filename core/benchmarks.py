@@ -0,0 +1,273 @@
+"""
+Benchmarks of the ordering pipeline's hot paths.
+
+Each benchmark is a setup function registered with @benchmark. It receives a
+BenchmarkContext holding fixtures (a customer, stocked products, an invoice, ...)
+and returns the zero-argument callable to time. run_benchmarks() calls it once to
+warm template and query caches, `repeat` times under CaptureQueriesContext for the
+query count and wall time, and once more under tracemalloc for peak Python memory
+(tracing slows Python down too much to time that pass).
+
+Views are called directly through RequestFactory, so middleware is not measured.
+"""
+import platform
+import shutil
+import statistics
+import tempfile
+import time
+import tracemalloc
+
+import django
+from django.contrib.auth.models import User
+from django.contrib.sessions.backends.base import SessionBase
+from django.db import connection
+from django.test import RequestFactory, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from billing.models import Invoice
+from billing.views import render_pdf_view
+from brands.models import Brand
+from customers.models import Customer, CustomerType
+from inventory.models import Inventory, StockLocation
+from inventory.services import InventoryService
+from orders.models import SalesOrder
+from orders.services import DraftOrderService, OrderService
+from orders.views import DRAFT_SESSION_KEY, OrderListView, confirm_order, update_draft_line
+from products.models import Product
+from reports.views import ar_aging_report, customer_report, sales_report
+
+BENCHMARKS = {}
+
+ORDER_LINES = 20
+INGEST_ROWS = 1000
+
+
+def benchmark(name):
+    def register(setup):
+        BENCHMARKS[name] = setup
+        return setup
+    return register
+
+
+class _Session(SessionBase):
+    """In-memory session: the benchmarks must not write session rows."""
+
+    def exists(self, session_key):
+        return False
+
+    def create(self):
+        self._session_key = self._get_new_session_key()
+
+    def save(self, must_create=False):
+        pass
+
+    def delete(self, session_key=None):
+        pass
+
+    def load(self):
+        return {}
+
+
+class BenchmarkContext:
+    """Fixtures shared by the benchmarks. Create it inside a transaction that is rolled back."""
+
+    def __init__(self):
+        self.factory = RequestFactory()
+        self.user = User.objects.create_user('__benchmark_user__')
+        customer_type = CustomerType.objects.create(name='__benchmark_type__')
+        self.customer = Customer.objects.create(name='Benchmark Customer', phone='0', customer_type=customer_type)
+        brand = Brand.objects.create(name='__benchmark_brand__')
+        Product.objects.bulk_create([
+            Product(brand=brand, name=f'Benchmark SKU {i}', mrp=100, ptr=80, margin=20, weight_gms=250)
+            for i in range(ORDER_LINES)
+        ])
+        self.products = list(Product.objects.filter(brand=brand).order_by('pk'))
+        self.location = StockLocation.objects.create(name='__benchmark_location__')
+        Inventory.objects.bulk_create([
+            Inventory(product=product, location=self.location, quantity=10 ** 6) for product in self.products
+        ])
+        self.order = OrderService.create_order(
+            {'customer': self.customer, 'status': 'delivered'},
+            [{'product_id': product.pk, 'quantity': 2} for product in self.products],
+        )
+        self.invoice = Invoice.objects.create(
+            order=self.order, invoice_number=f'BENCH-{self.order.pk}', total=self.order.total_amount
+        )
+        self.pdf_dir = tempfile.mkdtemp(prefix='benchmark-pdfs-')
+
+    def close(self):
+        shutil.rmtree(self.pdf_dir, ignore_errors=True)
+
+    def request(self, method='get', path='/', data=None, session=None):
+        request = getattr(self.factory, method)(path, data or {})
+        request.user = self.user
+        request.session = _Session()
+        request.session.update(session or {})
+        return request
+
+
+def _consume(response):
+    if hasattr(response, 'render') and not getattr(response, 'is_rendered', True):
+        response.render()
+    if getattr(response, 'streaming', False):
+        for _chunk in response.streaming_content:
+            pass
+    return response
+
+
+def _close_file(response):
+    # Not response.close(): that sends request_finished, whose connection cleanup would
+    # close the database connection in the middle of the benchmark's transaction.
+    if getattr(response, 'file_to_stream', None) is not None:
+        response.file_to_stream.close()
+
+
+def _view(context, view, data=None):
+    return lambda: _consume(view(context.request(data=data)))
+
+
+@benchmark('confirm_order')
+def bench_confirm_order(context):
+    quantities = {product.pk: 3 for product in context.products}
+
+    def run():
+        # Confirming deletes the cart, so each call fills a fresh one (a fixed handful of queries)
+        draft = DraftOrderService.start(context.customer, context.user)
+        DraftOrderService.set_lines(draft, quantities)
+        confirm_order(context.request('post', session={DRAFT_SESSION_KEY: draft.pk}))
+    return run
+
+
+@benchmark('draft_line_update')
+def bench_draft_line_update(context):
+    draft = DraftOrderService.start(context.customer, context.user)
+    DraftOrderService.set_lines(draft, {product.pk: 3 for product in context.products})
+    session = {DRAFT_SESSION_KEY: draft.pk}
+    product = context.products[0]
+    quantities = iter(range(1, 10 ** 9))
+    return lambda: update_draft_line(
+        context.request('post', data={'product': product.pk, 'quantity': next(quantities)}, session=session)
+    )
+
+
+@benchmark('order_list')
+def bench_order_list(context):
+    return _view(context, OrderListView.as_view())
+
+
+@benchmark('sales_report')
+def bench_sales_report(context):
+    return _view(context, sales_report, {'month': timezone.localdate().strftime('%Y-%m')})
+
+
+@benchmark('customer_report')
+def bench_customer_report(context):
+    return _view(context, customer_report)
+
+
+@benchmark('ar_aging_report')
+def bench_ar_aging_report(context):
+    return _view(context, ar_aging_report)
+
+
+@benchmark('invoice_pdf_cold')
+def bench_invoice_pdf_cold(context):
+    def run():
+        # A fresh cache directory each time, so every call renders the PDF
+        with tempfile.TemporaryDirectory() as directory, override_settings(INVOICE_PDF_DIR=directory):
+            _close_file(render_pdf_view(context.request(), context.invoice.pk))
+    return run
+
+
+@benchmark('invoice_pdf_cached')
+def bench_invoice_pdf_cached(context):
+    def run():
+        with override_settings(INVOICE_PDF_DIR=context.pdf_dir):
+            _close_file(render_pdf_view(context.request(), context.invoice.pk))
+    return run
+
+
+@benchmark('inventory_add_remove')
+def bench_inventory_add_remove(context):
+    product = context.products[0]
+
+    def run():
+        InventoryService.add_stock(product, context.location, 10, reference='benchmark')
+        InventoryService.remove_stock(product, context.location, 10, reference='benchmark')
+    return run
+
+
+@benchmark('inventory_reserve_release')
+def bench_inventory_reserve_release(context):
+    lines = [(product.pk, 2) for product in context.products]
+
+    def run():
+        order = SalesOrder.objects.create(customer=context.customer)
+        InventoryService.reserve_stock(order, context.location, lines)
+        InventoryService.release_reservations(order)
+    return run
+
+
+@benchmark('inventory_ingest')
+def bench_inventory_ingest(context):
+    rows = [
+        {'product': context.products[i % len(context.products)].pk, 'location': context.location.name,
+         'quantity': 5, 'reference': f'GRN-{i}'}
+        for i in range(INGEST_ROWS)
+    ]
+    return lambda: InventoryService.ingest_stock(rows)
+
+
+def measure(fn, repeat):
+    """Returns the metrics of one benchmark as a dict."""
+    fn()
+    timings, query_counts = [], []
+    for _ in range(repeat):
+        with CaptureQueriesContext(connection) as queries:
+            started = time.perf_counter()
+            fn()
+            timings.append((time.perf_counter() - started) * 1000)
+        query_counts.append(len(queries))
+
+    tracemalloc.start()
+    try:
+        fn()
+        _current, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {
+        'repeat': repeat,
+        'queries': max(query_counts),
+        'ms_median': round(statistics.median(timings), 3),
+        'ms_min': round(min(timings), 3),
+        'ms_max': round(max(timings), 3),
+        'peak_kb': round(peak / 1024, 1),
+    }
+
+
+def run_benchmarks(names=None, repeat=5):
+    """
+    :param names: benchmark names to run (default: all, in registration order)
+    :param repeat: timed calls per benchmark
+    :return: list of result dicts, one per benchmark
+    """
+    context = BenchmarkContext()
+    try:
+        return [{'name': name, **measure(BENCHMARKS[name](context), repeat)} for name in names or BENCHMARKS]
+    finally:
+        context.close()
+
+
+def environment():
+    """Describes what the numbers were measured against, for comparing runs."""
+    return {
+        'database': connection.vendor,
+        'orders': SalesOrder.objects.count(),
+        'customers': Customer.objects.count(),
+        'products': Product.objects.count(),
+        'invoices': Invoice.objects.count(),
+        'python': platform.python_version(),
+        'django': django.get_version(),
+    }
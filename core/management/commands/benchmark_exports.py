@@ -0,0 +1,101 @@
+import time
+import tracemalloc
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.test import RequestFactory
+
+from billing.models import Invoice
+from billing.views import export_invoices
+from brands.models import Brand
+from customers.models import Customer, CustomerType
+from inventory.models import StockLocation, StockMovement
+from inventory.views import export_stock_movements
+from orders.models import SalesOrder
+from orders.views import export_orders
+from products.models import Product
+
+EXPORTS = [
+    ('orders', export_orders, SalesOrder),
+    ('invoices', export_invoices, Invoice),
+    ('stock movements', export_stock_movements, StockMovement),
+]
+
+
+class _Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        "Measures rows per second and peak Python memory of the streaming CSV/XLSX exports. "
+        "With --rows, synthetic data is created inside a transaction that is rolled back."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=0, help="Synthetic rows to add per export (default: use existing data).")
+        parser.add_argument('--formats', default='csv,xlsx', help="Comma separated formats (default: csv,xlsx).")
+
+    def handle(self, *args, **options):
+        formats = [value.strip() for value in options['formats'].split(',') if value.strip()]
+        results = []
+
+        try:
+            with transaction.atomic():
+                if options['rows']:
+                    self._seed(options['rows'])
+                for name, view, model in EXPORTS:
+                    row_count = model.objects.count()
+                    for export_format in formats:
+                        results.append((name, export_format, row_count) + self._measure(view, export_format))
+                raise _Rollback
+        except _Rollback:
+            pass
+
+        self.stdout.write(f"{'export':<16} {'format':<6} {'rows':>10} {'seconds':>9} {'rows/s':>10} {'MB out':>8} {'peak KB':>9}")
+        for name, export_format, row_count, seconds, size, peak in results:
+            self.stdout.write(
+                f"{name:<16} {export_format:<6} {row_count:>10} {seconds:>9.2f} "
+                f"{row_count / seconds if seconds else 0:>10.0f} {size / 1e6:>8.1f} {peak / 1024:>9.0f}"
+            )
+
+    def _measure(self, view, export_format):
+        """
+        Consumes the streamed response twice: once for wall time, once under tracemalloc
+        (which slows Python down too much to time). Returns (seconds, bytes, peak traced memory).
+        """
+        request = RequestFactory().get('/', {'format': export_format})
+        started = time.perf_counter()
+        size = sum(len(chunk) for chunk in view(request).streaming_content)
+        seconds = time.perf_counter() - started
+
+        tracemalloc.start()
+        for _chunk in view(request).streaming_content:
+            pass
+        _current, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        return seconds, size, peak
+
+    def _seed(self, count):
+        customer_type = CustomerType.objects.create(name='__benchmark_type__')
+        customer = Customer.objects.create(name='Benchmark Customer', phone='0', customer_type=customer_type)
+        brand = Brand.objects.create(name='__benchmark_brand__')
+        product = Product.objects.create(brand=brand, name='Benchmark SKU', mrp=100, ptr=80, margin=20, weight_gms=250)
+        location = StockLocation.objects.create(name='__benchmark_location__')
+        for start in range(0, count, 5000):
+            size = min(5000, count - start)
+            SalesOrder.objects.bulk_create(
+                SalesOrder(customer=customer, status='delivered', total_amount=100) for _ in range(size)
+            )
+            StockMovement.objects.bulk_create(
+                StockMovement(product=product, location=location, movement_type='in', quantity=1, reference=f'BENCH-{start}')
+                for _ in range(size)
+            )
+        orders = SalesOrder.objects.filter(customer=customer).values_list('pk', flat=True).iterator(chunk_size=5000)
+        batch = []
+        for order_id in orders:
+            batch.append(Invoice(order_id=order_id, invoice_number=f'BENCH-{order_id}', total=100))
+            if len(batch) == 5000:
+                Invoice.objects.bulk_create(batch)
+                batch = []
+        Invoice.objects.bulk_create(batch)
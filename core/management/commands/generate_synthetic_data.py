@@ -0,0 +1,39 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.synthetic import BASE_COUNTS, SyntheticDataGenerator, scaled_counts
+
+
+class Command(BaseCommand):
+    help = (
+        "Generates synthetic brands, products, customers, orders with items, invoices and payments, "
+        "expenses with splits and stock movements for benchmarking. Data is added to the current database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scale', type=float, default=1.0,
+                            help=f"Multiplier for the default row counts {BASE_COUNTS} (default: 1.0).")
+        for name in BASE_COUNTS:
+            parser.add_argument(f'--{name}', type=int, help=f"Exact number of {name}, overriding --scale.")
+        parser.add_argument('--days', type=int, default=365, help="Spread history over this many days (default: 365).")
+        parser.add_argument('--max-items', type=int, default=8, help="Maximum lines per order (default: 8).")
+        parser.add_argument('--seed', type=int, default=42, help="Random seed, for repeatable data sets (default: 42).")
+
+    def handle(self, *args, **options):
+        if options['scale'] <= 0 or options['days'] < 1 or options['max_items'] < 1:
+            raise CommandError("--scale, --days and --max-items must be positive.")
+
+        counts = scaled_counts(options['scale'], **{name: options[name] for name in BASE_COUNTS})
+        generator = SyntheticDataGenerator(
+            counts,
+            days=options['days'],
+            max_items=options['max_items'],
+            seed=options['seed'],
+            log=self.stdout.write,
+        )
+        started = time.perf_counter()
+        created = generator.generate()
+        seconds = time.perf_counter() - started
+        summary = ', '.join(f"{count} {name}" for name, count in created.items())
+        self.stdout.write(self.style.SUCCESS(f"Created {summary} in {seconds:.1f}s."))
@@ -0,0 +1,71 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.test import override_settings
+from django.utils import timezone
+
+from core.benchmarks import BENCHMARKS, environment, run_benchmarks
+from core.synthetic import SyntheticDataGenerator, scaled_counts
+
+
+# The run is rolled back, so the on_commit invalidations of what it caches never fire;
+# a private cache keeps its entries (e.g. synthetic order list totals) off the live site
+BENCHMARK_CACHES = {
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'run-benchmarks'},
+}
+
+
+class _Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        "Times the order entry, listing, reporting, invoice PDF and inventory flows and reports "
+        "query counts, wall time and peak Python memory. Everything the run creates is rolled back "
+        "and its cache entries go to a private in-memory cache."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--only', help=f"Comma separated benchmarks to run (default: all of {', '.join(BENCHMARKS)}).")
+        parser.add_argument('--repeat', type=int, default=5, help="Timed calls per benchmark (default: 5).")
+        parser.add_argument('--scale', type=float, default=0,
+                            help="Generate synthetic data at this scale first (default: use the existing data).")
+        parser.add_argument('--seed', type=int, default=42, help="Random seed for --scale (default: 42).")
+        parser.add_argument('--json', dest='json_path', help="Also write the results as JSON to this file ('-' for stdout).")
+
+    def handle(self, *args, **options):
+        names = [name.strip() for name in (options['only'] or '').split(',') if name.strip()] or list(BENCHMARKS)
+        unknown = sorted(set(names) - set(BENCHMARKS))
+        if unknown:
+            raise CommandError(f"Unknown benchmark(s): {', '.join(unknown)}")
+        if options['repeat'] < 1:
+            raise CommandError("--repeat must be at least 1.")
+
+        try:
+            with override_settings(CACHES=BENCHMARK_CACHES), transaction.atomic():
+                if options['scale']:
+                    SyntheticDataGenerator(scaled_counts(options['scale']), seed=options['seed']).generate()
+                report = {
+                    'measured_at': timezone.now().isoformat(),
+                    'environment': environment(),
+                    'results': run_benchmarks(names, repeat=options['repeat']),
+                }
+                raise _Rollback
+        except _Rollback:
+            pass
+
+        if options['json_path'] == '-':
+            self.stdout.write(json.dumps(report, indent=2))
+            return
+        if options['json_path']:
+            with open(options['json_path'], 'w') as output:
+                json.dump(report, output, indent=2)
+
+        self.stdout.write(f"{'benchmark':<26} {'queries':>8} {'median ms':>10} {'min ms':>9} {'max ms':>9} {'peak KB':>9}")
+        for row in report['results']:
+            self.stdout.write(
+                f"{row['name']:<26} {row['queries']:>8} {row['ms_median']:>10.1f} "
+                f"{row['ms_min']:>9.1f} {row['ms_max']:>9.1f} {row['peak_kb']:>9.0f}"
+            )
@@ -0,0 +1,113 @@
+import base64
+import json
+
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+
+
+def encode_cursor(value, pk):
+    payload = json.dumps([value.isoformat(), pk])
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Returns (datetime, pk) for a cursor, or None if it is malformed."""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        value, pk = json.loads(base64.urlsafe_b64decode(padded.encode()).decode())
+        value = parse_datetime(value)
+        return (value, int(pk)) if value else None
+    except (ValueError, TypeError):
+        return None
+
+
+class KeysetPage:
+    """
+    One page of a keyset-paginated list. Mirrors the parts of Django's Page the
+    templates use, with cursors instead of page numbers.
+    """
+
+    def __init__(self, object_list, next_cursor=None, previous_cursor=None):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+
+def keyset_paginate(queryset, field, page_size, after=None, before=None):
+    """
+    Paginates `queryset` newest first on (field, pk) without OFFSET or COUNT.
+
+    :param field: date or datetime field to order by, e.g. 'created_at'
+    :param after: cursor of the last row on the previous page (older rows follow)
+    :param before: cursor of the first row on the next page (newer rows precede)
+    :return: KeysetPage
+    """
+    after = decode_cursor(after) if after else None
+    before = decode_cursor(before) if before else None
+
+    if before:
+        value, pk = before
+        rows = list(
+            queryset.filter(Q(**{f'{field}__gt': value}) | Q(**{field: value, 'pk__gt': pk}))
+            .order_by(field, 'pk')[:page_size + 1]
+        )
+        has_newer = len(rows) > page_size
+        rows = rows[:page_size][::-1]
+        has_older = True
+    else:
+        if after:
+            value, pk = after
+            queryset = queryset.filter(Q(**{f'{field}__lt': value}) | Q(**{field: value, 'pk__lt': pk}))
+        rows = list(queryset.order_by(f'-{field}', '-pk')[:page_size + 1])
+        has_older = len(rows) > page_size
+        rows = rows[:page_size]
+        has_newer = after is not None
+
+    next_cursor = previous_cursor = None
+    if rows and has_older:
+        next_cursor = encode_cursor(getattr(rows[-1], field), rows[-1].pk)
+    if rows and has_newer:
+        previous_cursor = encode_cursor(getattr(rows[0], field), rows[0].pk)
+    return KeysetPage(rows, next_cursor=next_cursor, previous_cursor=previous_cursor)
+
+
+class KeysetPaginationMixin:
+    """
+    ListView mixin that replaces OFFSET pagination with (keyset_field, pk) cursors
+    passed as ?after= / ?before=. Adds `cursor_query` to the context: the current
+    query string without the cursor, for building the Newer/Older links.
+    """
+    keyset_field = None
+
+    def paginate_queryset(self, queryset, page_size):
+        page = keyset_paginate(
+            queryset,
+            self.keyset_field,
+            page_size,
+            after=self.request.GET.get('after'),
+            before=self.request.GET.get('before'),
+        )
+        return (None, page, page.object_list, page.has_other_pages())
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        query = self.request.GET.copy()
+        for key in ('after', 'before', 'page'):
+            query.pop(key, None)
+        context['cursor_query'] = query.urlencode()
+        return context
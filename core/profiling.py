@@ -0,0 +1,187 @@
+"""
+Per-request timing without DEBUG.
+
+RequestProfilingMiddleware records, for every request:
+
+* wall time of the whole request (up to the response; streamed bodies are not included),
+* number and total time of database queries, via connection.execute_wrapper,
+* duplicate queries: statements with the same fingerprint (SQL with the IN lists
+  collapsed) run PROFILING_DUPLICATE_THRESHOLD times or more, usually an N+1 loop,
+* template render time (top-level renders only; queries run by lazy querysets while
+  rendering count towards both db and tpl).
+
+The numbers go out as a Server-Timing header, which browser dev tools show under
+Network > Timing, and as one JSON line on the "core.profiling" logger (WARNING when
+slower than PROFILING_SLOW_MS, INFO otherwise).
+
+With PROFILING_SAMPLE_RATE > 0 that fraction of requests also runs under cProfile;
+the profiles of sampled requests slower than PROFILING_SLOW_MS are written to
+PROFILING_DIR as .prof files (open with `python -m pstats` or snakeviz).
+"""
+import contextvars
+import cProfile
+import json
+import logging
+import os
+import random
+import re
+import time
+from collections import Counter
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+from django.template.backends.django import Template as DjangoTemplate
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+_current = contextvars.ContextVar('request_profile', default=None)
+
+_IN_LIST = re.compile(r'\bIN \((?:%s, )*%s\)')
+_WHITESPACE = re.compile(r'\s+')
+_UNSAFE_NAME = re.compile(r'[^\w.-]+')
+
+
+def fingerprint(sql):
+    """Query shape: parameters are already placeholders, IN lists of any length look alike."""
+    return _WHITESPACE.sub(' ', _IN_LIST.sub('IN (...)', sql)).strip()
+
+
+class RequestProfile:
+
+    def __init__(self):
+        self.query_count = 0
+        self.db_seconds = 0.0
+        self.template_seconds = 0.0
+        self.template_depth = 0
+        self.fingerprints = Counter()
+
+    def record_query(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_seconds += time.perf_counter() - started
+            self.query_count += 1
+            self.fingerprints[fingerprint(sql)] += 1
+
+    def duplicates(self, threshold):
+        return [
+            {'sql': sql[:300], 'count': count}
+            for sql, count in self.fingerprints.most_common()
+            if count >= threshold
+        ]
+
+
+# Django has no render hook outside the test runner, so the backend's Template.render
+# (what render(), render_to_string() and TemplateResponse call) is wrapped once here.
+_original_render = DjangoTemplate.render
+
+
+def _timed_render(self, context=None, request=None):
+    profile = _current.get()
+    if profile is None:
+        return _original_render(self, context, request)
+    # Templates rendered from inside another template are already being timed
+    profile.template_depth += 1
+    started = time.perf_counter()
+    try:
+        return _original_render(self, context, request)
+    finally:
+        profile.template_depth -= 1
+        if profile.template_depth == 0:
+            profile.template_seconds += time.perf_counter() - started
+
+
+DjangoTemplate.render = _timed_render
+
+
+class RequestProfilingMiddleware:
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not settings.PROFILING_ENABLED or request.path.startswith(tuple(settings.PROFILING_SKIP_PATHS)):
+            return self.get_response(request)
+
+        profile = RequestProfile()
+        token = _current.set(profile)
+        profiler = self._sampled_profiler()
+        started = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(profile.record_query))
+                if profiler:
+                    profiler.enable()
+                try:
+                    response = self.get_response(request)
+                finally:
+                    if profiler:
+                        profiler.disable()
+        finally:
+            _current.reset(token)
+        total_ms = (time.perf_counter() - started) * 1000
+
+        slow = total_ms >= settings.PROFILING_SLOW_MS
+        profile_path = self._save_profile(profiler, request, total_ms) if profiler and slow else None
+        self._add_server_timing(response, profile, total_ms)
+        self._log(request, response, profile, total_ms, slow, profile_path)
+        return response
+
+    @staticmethod
+    def _sampled_profiler():
+        rate = settings.PROFILING_SAMPLE_RATE
+        if rate <= 0 or random.random() >= rate:
+            return None
+        profiler = cProfile.Profile()
+        try:
+            # Fails if another thread is already being profiled; skip this sample then
+            profiler.enable()
+            profiler.disable()
+        except ValueError:
+            return None
+        return profiler
+
+    @staticmethod
+    def _view_name(request):
+        match = getattr(request, 'resolver_match', None)
+        return match.view_name if match else None
+
+    def _save_profile(self, profiler, request, total_ms):
+        name = _UNSAFE_NAME.sub('_', self._view_name(request) or request.path.strip('/') or 'root')
+        os.makedirs(settings.PROFILING_DIR, exist_ok=True)
+        path = os.path.join(
+            settings.PROFILING_DIR,
+            f"{timezone.now():%Y%m%d-%H%M%S}-{name}-{total_ms:.0f}ms-{os.getpid()}.prof"
+        )
+        profiler.dump_stats(path)
+        return path
+
+    @staticmethod
+    def _add_server_timing(response, profile, total_ms):
+        metrics = [
+            f'db;dur={profile.db_seconds * 1000:.1f};desc="{profile.query_count} queries"',
+            f'tpl;dur={profile.template_seconds * 1000:.1f}',
+            f'total;dur={total_ms:.1f}',
+        ]
+        existing = response.get('Server-Timing')
+        response['Server-Timing'] = ', '.join(([existing] if existing else []) + metrics)
+
+    def _log(self, request, response, profile, total_ms, slow, profile_path):
+        record = {
+            'method': request.method,
+            'path': request.path,
+            'view': self._view_name(request),
+            'status': response.status_code,
+            'total_ms': round(total_ms, 1),
+            'db_ms': round(profile.db_seconds * 1000, 1),
+            'queries': profile.query_count,
+            'template_ms': round(profile.template_seconds * 1000, 1),
+            'duplicates': profile.duplicates(settings.PROFILING_DUPLICATE_THRESHOLD),
+        }
+        if profile_path:
+            record['profile'] = profile_path
+        logger.log(logging.WARNING if slow else logging.INFO, json.dumps(record))
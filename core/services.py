@@ -0,0 +1,101 @@
+import uuid
+
+from django.core.cache import cache
+from django.utils import timezone
+
+from orders.models import SalesOrder
+from .utils import day_bounds
+
+DASHBOARD_VERSION_KEY = 'dashboard:version'
+DASHBOARD_HITS_KEY = 'dashboard:stats:hits'
+DASHBOARD_MISSES_KEY = 'dashboard:stats:misses'
+# Today's payload is invalidated by core.signals; the timeout only bounds the damage
+# of writes that bypass the model signals. Past days never expire.
+DASHBOARD_TODAY_TIMEOUT = 5 * 60
+
+
+def _count(key):
+    cache.add(key, 0, None)
+    try:
+        cache.incr(key)
+    except ValueError:
+        pass
+
+
+class DashboardService:
+    """
+    Per-day dashboard payloads cached under `dashboard:<version>:<date>`. Order writes
+    drop their day's payload (see core.signals); customer writes bump the version,
+    because every cached payload carries customer names.
+    """
+
+    @staticmethod
+    def get_version():
+        version = cache.get(DASHBOARD_VERSION_KEY)
+        if version is None:
+            cache.add(DASHBOARD_VERSION_KEY, uuid.uuid4().hex, None)
+            version = cache.get(DASHBOARD_VERSION_KEY)
+        return version
+
+    @staticmethod
+    def invalidate_all():
+        cache.set(DASHBOARD_VERSION_KEY, uuid.uuid4().hex, None)
+
+    @staticmethod
+    def _key(day):
+        return f"dashboard:{DashboardService.get_version()}:{day.isoformat()}"
+
+    @staticmethod
+    def invalidate_day(day):
+        cache.delete(DashboardService._key(day))
+
+    @staticmethod
+    def get_payload(day):
+        """
+        Returns {'orders': [{'pk', 'customer', 'status_display', 'total_amount', 'created_at'}],
+        'total_amount_sum'} for the orders created on `day`.
+        """
+        key = DashboardService._key(day)
+        payload = cache.get(key)
+        if payload is not None:
+            _count(DASHBOARD_HITS_KEY)
+            return payload
+
+        _count(DASHBOARD_MISSES_KEY)
+        payload = DashboardService.build_payload(day)
+        timeout = None if day < timezone.localdate() else DASHBOARD_TODAY_TIMEOUT
+        cache.set(key, payload, timeout)
+        return payload
+
+    @staticmethod
+    def build_payload(day):
+        day_start, day_end = day_bounds(day)
+        orders = SalesOrder.objects.filter(
+            created_at__gte=day_start, created_at__lt=day_end
+        ).select_related('customer__customer_type').order_by('-created_at')
+
+        rows = [
+            {
+                'pk': order.pk,
+                'customer': str(order.customer),
+                'status_display': order.get_status_display(),
+                'total_amount': order.total_amount,
+                'created_at': order.created_at,
+            }
+            for order in orders
+        ]
+        return {
+            'orders': rows,
+            'total_amount_sum': sum((row['total_amount'] for row in rows), 0),
+        }
+
+    @staticmethod
+    def get_stats():
+        hits = cache.get(DASHBOARD_HITS_KEY, 0)
+        misses = cache.get(DASHBOARD_MISSES_KEY, 0)
+        lookups = hits + misses
+        return {
+            'hits': hits,
+            'misses': misses,
+            'hit_rate': round(hits / lookups, 4) if lookups else None,
+        }
@@ -1,4 +1,5 @@
 import os
+import sys
 import dj_database_url
 from pathlib import Path
 
@@ -33,11 +34,14 @@ INSTALLED_APPS = [
     'reports',
     'core',
     'inventory',
+    'search',
+    'pricing',
     
     'django_filters',
 ]
 
 MIDDLEWARE = [
+    "core.profiling.RequestProfilingMiddleware",  # first, so its timings cover the other middleware
     "django.middleware.security.SecurityMiddleware",
     "whitenoise.middleware.WhiteNoiseMiddleware",  # 👈 for static files in prod
     "django.contrib.sessions.middleware.SessionMiddleware",
@@ -93,6 +97,73 @@ else:
     }
 }
 
+# ------------------------------
+# CACHE
+# ------------------------------
+# File-based by default so every gunicorn worker sees the same cached data and
+# invalidations; set CACHE_BACKEND to LocMemCache for a single-process dev server.
+CACHES = {
+    "default": {
+        "BACKEND": os.getenv("CACHE_BACKEND", "django.core.cache.backends.filebased.FileBasedCache"),
+        "LOCATION": os.getenv("CACHE_LOCATION", os.path.join(BASE_DIR, ".cache")),
+    }
+}
+
+# ------------------------------
+# INVOICE PDFS
+# ------------------------------
+# Rendered PDFs are stored per invoice version under INVOICE_PDF_DIR and rendered in a
+# process pool; a download that is not cached yet asks the browser to retry.
+INVOICE_PDF_DIR = os.getenv("INVOICE_PDF_DIR", os.path.join(BASE_DIR, ".cache", "invoices"))
+INVOICE_PDF_WORKERS = int(os.getenv("INVOICE_PDF_WORKERS", 2))
+
+# ------------------------------
+# STOCK
+# ------------------------------
+# Name of the StockLocation that orders confirmed through the order wizard reserve
+# stock from (InventoryService.reserve_stock). Unset, orders are confirmed without
+# reserving stock.
+ORDER_STOCK_LOCATION = os.getenv("ORDER_STOCK_LOCATION")
+
+# ------------------------------
+# SEARCH
+# ------------------------------
+# "postgres" (pg_trgm indexes), "ngram" (in-process index, for SQLite/MySQL) or a
+# dotted path to a backend class. Unset picks by database vendor.
+SEARCH_BACKEND = os.getenv("SEARCH_BACKEND")
+
+# ------------------------------
+# REQUEST PROFILING
+# ------------------------------
+# core.profiling.RequestProfilingMiddleware adds a Server-Timing header and logs one
+# JSON line per request. PROFILING_SAMPLE_RATE (0-1) of requests also run under
+# cProfile; profiles of those slower than PROFILING_SLOW_MS are saved to PROFILING_DIR.
+PROFILING_ENABLED = os.getenv("PROFILING_ENABLED", "True") == "True"
+PROFILING_SLOW_MS = float(os.getenv("PROFILING_SLOW_MS", 500))
+PROFILING_SAMPLE_RATE = float(os.getenv("PROFILING_SAMPLE_RATE", 0))
+PROFILING_DIR = os.getenv("PROFILING_DIR", os.path.join(BASE_DIR, ".cache", "profiles"))
+PROFILING_DUPLICATE_THRESHOLD = int(os.getenv("PROFILING_DUPLICATE_THRESHOLD", 3))
+PROFILING_SKIP_PATHS = ["/static/", "/favicon.ico"]
+
+LOGGING = {
+    "version": 1,
+    "disable_existing_loggers": False,
+    "formatters": {
+        "message": {"format": "%(message)s"},
+    },
+    "handlers": {
+        "profiling": {"class": "logging.StreamHandler", "formatter": "message"},
+    },
+    "loggers": {
+        "core.profiling": {
+            "handlers": ["profiling"],
+            # Only slow requests while the test suite runs, so its output stays readable
+            "level": os.getenv("PROFILING_LOG_LEVEL", "WARNING" if "test" in sys.argv[1:2] else "INFO"),
+            "propagate": False,
+        },
+    },
+}
+
 # ------------------------------
 # PASSWORD VALIDATION
 # ------------------------------
@@ -0,0 +1,42 @@
+from functools import partial
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from customers.models import Customer
+from orders.models import OrderItem, SalesOrder
+from orders.signals import orders_bulk_updated
+from .services import DashboardService
+from .utils import local_day
+
+
+def _schedule_invalidation(created_at):
+    transaction.on_commit(partial(DashboardService.invalidate_day, local_day(created_at)))
+
+
+@receiver(post_save, sender=SalesOrder)
+@receiver(post_delete, sender=SalesOrder)
+def invalidate_order_dashboard(sender, instance, **kwargs):
+    _schedule_invalidation(instance.created_at)
+
+
+@receiver(post_save, sender=OrderItem)
+@receiver(post_delete, sender=OrderItem)
+def invalidate_order_item_dashboard(sender, instance, **kwargs):
+    created_at = SalesOrder.objects.filter(pk=instance.order_id).values_list('created_at', flat=True).first()
+    if created_at is not None:
+        _schedule_invalidation(created_at)
+
+
+@receiver(orders_bulk_updated)
+def invalidate_bulk_order_dashboards(sender, order_ids, **kwargs):
+    created = SalesOrder.objects.filter(pk__in=order_ids).values_list('created_at', flat=True)
+    for day in {local_day(created_at) for created_at in created}:
+        transaction.on_commit(partial(DashboardService.invalidate_day, day))
+
+
+@receiver(post_save, sender=Customer)
+@receiver(post_delete, sender=Customer)
+def invalidate_customer_dashboards(sender, **kwargs):
+    transaction.on_commit(DashboardService.invalidate_all)
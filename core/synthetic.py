@@ -0,0 +1,366 @@
+"""
+Synthetic data for benchmarks and local load testing.
+
+Generates a plausible distributor's history: brands and products, retail and
+wholesale customers, orders spread over the last `days` days with a few lines each,
+invoices and payments for the delivered/billed orders, shared expenses with splits,
+and stock movements with matching inventory levels. Everything is bulk inserted, so
+the derived tables (customer summaries, sales rollups) and caches are refreshed once
+at the end instead of through the per-row signals.
+"""
+import datetime
+import random
+from decimal import Decimal
+from functools import partial
+from itertools import accumulate
+
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from billing.models import Expense, Invoice, Payment, Split
+from billing.services import SplitSummaryService
+from brands.models import Brand
+from customers.models import Customer, CustomerType
+from customers.services import CustomerSummaryService
+from inventory.models import Inventory, StockLocation, StockMovement
+from orders.models import OrderItem, SalesOrder
+from orders.services import OrderService
+from pricing.services import PriceService
+from products.models import Product
+from products.services import CatalogueService
+from reports.services import SalesRollupService
+from search.backends import invalidate as invalidate_search
+from .services import DashboardService
+
+BATCH_SIZE = 1000
+
+# Row counts at scale 1.0; every count is multiplied by the scale
+BASE_COUNTS = {
+    'brands': 12,
+    'products': 240,
+    'customers': 2000,
+    'orders': 10000,
+    'expenses': 600,
+    'movements': 10000,
+}
+
+MARKER = 'SYN'
+BRAND_WORDS = ['Susegad', 'Konkan', 'Mandovi', 'Sahyadri', 'Zuari', 'Coco', 'Feni', 'Bebinca', 'Mapusa', 'Chapora']
+PRODUCT_KINDS = ['Chakli', 'Banana Chips', 'Cashew Masala', 'Shankarpali', 'Kaju Katli', 'Mixture',
+                 'Chivda', 'Bhakarwadi', 'Khaja', 'Jackfruit Chips', 'Peanut Chikki', 'Rava Ladoo']
+PRODUCT_STYLES = ['Classic', 'Spicy', 'Butter', 'Garlic', 'Jaggery', 'Salted', 'Pepper', 'Family Pack']
+SHOP_PREFIXES = ['Shree', 'New', 'Sai', 'Om', 'Jai', 'Royal', 'Goa', 'Mahalaxmi', 'Ganesh', 'Annapurna']
+SHOP_NAMES = ['Kirana', 'Stores', 'Traders', 'Mart', 'General Store', 'Bakery', 'Supermarket', 'Provisions']
+PLACES = ['Panaji', 'Margao', 'Mapusa', 'Vasco', 'Ponda', 'Calangute', 'Bicholim', 'Canacona', 'Quepem']
+EXPENSE_KINDS = ['Fuel', 'Packaging', 'Tempo hire', 'Electricity', 'Shop rent', 'Repairs', 'Printing', 'Tea and snacks']
+PAYMENT_MODES = ['Cash', 'UPI', 'Bank Transfer', 'Cheque']
+
+
+def scaled_counts(scale=1.0, **overrides):
+    """
+    :param scale: multiplier applied to BASE_COUNTS
+    :param overrides: exact counts for individual entities (None is ignored)
+    :return: dict of entity -> row count
+    """
+    counts = {name: max(1, int(count * scale)) for name, count in BASE_COUNTS.items()}
+    counts.update({name: value for name, value in overrides.items() if value is not None})
+    return counts
+
+
+def _chunks(rows, size=BATCH_SIZE):
+    for start in range(0, len(rows), size):
+        yield rows[start:start + size]
+
+
+def _bulk_create(model, rows):
+    """
+    Inserts `rows` in batches and returns their primary keys in insertion order.
+    MySQL does not return ids from bulk INSERTs, so new ids are read back by range.
+    """
+    last_pk = model.objects.aggregate(last=Max('pk'))['last'] or 0
+    for batch in _chunks(rows):
+        model.objects.bulk_create(batch)
+    return list(model.objects.filter(pk__gt=last_pk).order_by('pk').values_list('pk', flat=True))
+
+
+def _backdate(model, field, pks, values):
+    """auto_now_add overwrites values passed to INSERT, so timestamps are set afterwards."""
+    rows = [model(pk=pk, **{field: value}) for pk, value in zip(pks, values)]
+    model.objects.bulk_update(rows, [field], batch_size=BATCH_SIZE)
+
+
+class SyntheticDataGenerator:
+
+    def __init__(self, counts, days=365, max_items=8, seed=42, log=None):
+        """
+        :param counts: entity -> row count, see scaled_counts()
+        :param days: orders, expenses and movements are spread over this many past days
+        :param max_items: upper bound of lines per order
+        :param log: optional callable receiving progress messages
+        """
+        self.counts = counts
+        self.days = days
+        self.max_items = max_items
+        self.rng = random.Random(seed)
+        self.log = log or (lambda message: None)
+        self.now = timezone.now()
+        self.created = {}
+
+    def _moment(self):
+        """A random time in the last `days` days, biased towards recent ones like a growing business."""
+        age = self.days * (1 - self.rng.random() ** 0.7)
+        return self.now - datetime.timedelta(days=age)
+
+    def _money(self, low, high):
+        return Decimal(self.rng.randrange(low * 100, high * 100)) / 100
+
+    @transaction.atomic
+    def generate(self):
+        """Creates every entity and returns {entity: rows created}."""
+        self._catalogue()
+        self._customers()
+        self._orders()
+        self._invoices()
+        self._expenses()
+        self._stock()
+        self._refresh_derived()
+        return self.created
+
+    def _catalogue(self):
+        # Brand names are unique; numbering past the highest pk keeps repeat runs apart
+        offset = Brand.objects.aggregate(last=Max('pk'))['last'] or 0
+        brands = [
+            Brand(name=f"{self.rng.choice(BRAND_WORDS)} Foods {MARKER}-{offset + i + 1}")
+            for i in range(self.counts['brands'])
+        ]
+        self.brand_ids = _bulk_create(Brand, brands)
+        products = []
+        for i in range(self.counts['products']):
+            mrp = self._money(20, 400)
+            ptr = (mrp * Decimal('0.8')).quantize(Decimal('0.01'))
+            weight = self.rng.choice([100, 200, 250, 500])
+            products.append(Product(
+                brand_id=self.rng.choice(self.brand_ids),
+                name=f"{self.rng.choice(PRODUCT_STYLES)} {self.rng.choice(PRODUCT_KINDS)} {weight}g",
+                mrp=mrp,
+                ptr=ptr if self.rng.random() < 0.9 else None,
+                margin=mrp - ptr,
+                weight_gms=weight,
+                is_active=self.rng.random() < 0.95,
+            ))
+        self.product_ids = _bulk_create(Product, products)
+        self.prices = {
+            pk: PriceService.base_price(product)
+            for pk, product in Product.objects.in_bulk(self.product_ids).items()
+        }
+        # A few best sellers account for most lines
+        self.product_cum_weights = list(accumulate(1 / (rank + 1) for rank in range(len(self.product_ids))))
+        self.created.update(brands=len(self.brand_ids), products=len(self.product_ids))
+        self.log(f"Catalogue: {len(self.brand_ids)} brands, {len(self.product_ids)} products")
+
+    def _customers(self):
+        types = [CustomerType.objects.get_or_create(name=name)[0].pk for name in ('Retail', 'Wholesale', 'Distributor')]
+        customers = [
+            Customer(
+                name=f"{self.rng.choice(SHOP_PREFIXES)} {self.rng.choice(SHOP_NAMES)} {self.rng.choice(PLACES)} {i}",
+                phone=f"9{self.rng.randrange(10 ** 8, 10 ** 9)}",
+                customer_type_id=self.rng.choices(types, weights=[80, 15, 5])[0],
+            )
+            for i in range(self.counts['customers'])
+        ]
+        self.customer_ids = _bulk_create(Customer, customers)
+        # Regular customers order far more often than occasional ones
+        self.customer_cum_weights = list(accumulate(self.rng.paretovariate(1.5) for _ in self.customer_ids))
+        self.created['customers'] = len(self.customer_ids)
+        self.log(f"Customers: {len(self.customer_ids)}")
+
+    def _orders(self):
+        statuses = [status for status, _label in SalesOrder.STATUS_CHOICES]
+        total = self.counts['orders']
+        self.orders = []  # (pk, created_at, status, total_amount)
+        item_count = 0
+        for start in range(0, total, BATCH_SIZE):
+            size = min(BATCH_SIZE, total - start)
+            planned = []
+            for _ in range(size):
+                line_count = self.rng.randint(1, self.max_items)
+                product_ids = set(self.rng.choices(self.product_ids, cum_weights=self.product_cum_weights, k=line_count))
+                lines = [(pk, self.rng.choice([1, 2, 5, 10, 12, 24, 48])) for pk in product_ids]
+                planned.append((
+                    self.rng.choices(self.customer_ids, cum_weights=self.customer_cum_weights)[0],
+                    self.rng.choices(statuses, weights=[5, 10, 45, 5, 35])[0],
+                    self._moment(),
+                    lines,
+                ))
+            pks = _bulk_create(SalesOrder, [
+                SalesOrder(
+                    customer_id=customer_id,
+                    status=status,
+                    total_amount=sum(self.prices[pk] * quantity for pk, quantity in lines),
+                )
+                for customer_id, status, _created_at, lines in planned
+            ])
+            _backdate(SalesOrder, 'created_at', pks, [created_at for _c, _s, created_at, _l in planned])
+            items = [
+                OrderItem(order_id=order_id, product_id=product_id, quantity=quantity, price=self.prices[product_id])
+                for order_id, (_c, _s, _t, lines) in zip(pks, planned)
+                for product_id, quantity in lines
+            ]
+            OrderItem.objects.bulk_create(items, batch_size=BATCH_SIZE)
+            item_count += len(items)
+            self.orders.extend(
+                (order_id, created_at, status, sum(self.prices[pk] * quantity for pk, quantity in lines))
+                for order_id, (_c, status, created_at, lines) in zip(pks, planned)
+            )
+        self.created.update(orders=len(self.orders), order_items=item_count)
+        self.log(f"Orders: {len(self.orders)} with {item_count} lines")
+
+    def _invoices(self):
+        billable = [order for order in self.orders if order[2] in ('delivered', 'billed')]
+        invoices, invoice_dates, settlements = [], [], []
+        for order_id, created_at, _status, total in billable:
+            invoiced_at = created_at + datetime.timedelta(hours=self.rng.randint(1, 72))
+            age_days = (self.now - invoiced_at).days
+            # Older invoices are more likely to be settled
+            roll = self.rng.random()
+            if roll < min(0.95, 0.3 + age_days / 60):
+                paid = total
+            elif roll < 0.97:
+                paid = Decimal(0)
+            else:
+                paid = (total * Decimal(self.rng.choice(['0.25', '0.5', '0.75']))).quantize(Decimal('0.01'))
+            status = 'paid' if paid >= total else ('partial' if paid else 'unpaid')
+            mode = self.rng.choice(PAYMENT_MODES) if paid else ''
+            invoices.append(Invoice(
+                order_id=order_id,
+                invoice_number=f"{MARKER}-{order_id}",
+                total=total,
+                amount_paid=paid,
+                payment_status=status,
+                payment_mode=mode,
+            ))
+            invoice_dates.append(invoiced_at)
+            settlements.append((paid, mode, invoiced_at))
+
+        pks = _bulk_create(Invoice, invoices)
+        _backdate(Invoice, 'created_at', pks, invoice_dates)
+        payments = [
+            Payment(
+                invoice_id=invoice_id,
+                amount=paid,
+                payment_mode=mode,
+                reference=f"{MARKER}-PAY-{invoice_id}",
+                paid_on=min(timezone.localdate(invoiced_at) + datetime.timedelta(days=self.rng.randint(0, 30)),
+                            timezone.localdate(self.now)),
+            )
+            for invoice_id, (paid, mode, invoiced_at) in zip(pks, settlements)
+            if paid
+        ]
+        Payment.objects.bulk_create(payments, batch_size=BATCH_SIZE)
+        self.created.update(invoices=len(pks), payments=len(payments))
+        self.log(f"Invoices: {len(pks)} with {len(payments)} payments")
+
+    def _expenses(self):
+        existing = list(User.objects.filter(username__startswith='synthetic_staff_').values_list('pk', flat=True))
+        if len(existing) < 4:
+            User.objects.bulk_create([
+                User(username=f"synthetic_staff_{i}", password='!') for i in range(len(existing), 4)
+            ])
+            existing = list(User.objects.filter(username__startswith='synthetic_staff_').values_list('pk', flat=True))
+        today = timezone.localdate(self.now)
+        planned = [
+            (
+                self.rng.choice(EXPENSE_KINDS),
+                self._money(100, 5000),
+                today - datetime.timedelta(days=self.rng.randrange(self.days)),
+                self.rng.choice(existing),
+            )
+            for _ in range(self.counts['expenses'])
+        ]
+        pks = _bulk_create(Expense, [
+            Expense(description=f"{kind} ({MARKER})", amount=amount, date_incurred=date_incurred, paid_by_id=paid_by)
+            for kind, amount, date_incurred, paid_by in planned
+        ])
+        splits = []
+        for expense_id, (_kind, amount, date_incurred, paid_by) in zip(pks, planned):
+            members = self.rng.sample(existing, self.rng.randint(2, len(existing)))
+            share = (amount / len(members)).quantize(Decimal('0.01'))
+            for index, user_id in enumerate(members):
+                # The last member absorbs the rounding remainder
+                part = amount - share * (len(members) - 1) if index == len(members) - 1 else share
+                is_paid = user_id == paid_by or self.rng.random() < 0.6
+                splits.append(Split(
+                    expense_id=expense_id, user_id=user_id, amount=part,
+                    is_paid=is_paid, paid_amount=part if is_paid else 0,
+                    paid_date=date_incurred if is_paid else None,
+                ))
+        Split.objects.bulk_create(splits, batch_size=BATCH_SIZE)
+        self.created.update(expenses=len(pks), splits=len(splits))
+        self.log(f"Expenses: {len(pks)} with {len(splits)} splits")
+
+    def _stock(self):
+        locations = [
+            StockLocation.objects.get_or_create(name=name)[0].pk
+            for name in (f'Main Warehouse ({MARKER})', f'Margao Depot ({MARKER})')
+        ]
+        levels = {}
+        planned = []
+        for _ in range(self.counts['movements']):
+            product_id = self.rng.choices(self.product_ids, cum_weights=self.product_cum_weights)[0]
+            location_id = self.rng.choice(locations)
+            level = levels.get((product_id, location_id), 0)
+            # Stock only goes out once some has come in
+            movement_type = 'out' if level and self.rng.random() < 0.45 else 'in'
+            quantity = self.rng.randint(1, level) if movement_type == 'out' else self.rng.choice([24, 48, 96, 144])
+            levels[(product_id, location_id)] = level + (quantity if movement_type == 'in' else -quantity)
+            planned.append((product_id, location_id, movement_type, quantity, self._moment()))
+        planned.sort(key=lambda row: row[4])
+
+        pks = _bulk_create(StockMovement, [
+            StockMovement(
+                product_id=product_id, location_id=location_id, movement_type=movement_type,
+                quantity=quantity, reference=f"{MARKER}-{'GRN' if movement_type == 'in' else 'DISPATCH'}",
+            )
+            for product_id, location_id, movement_type, quantity, _timestamp in planned
+        ])
+        _backdate(StockMovement, 'timestamp', pks, [row[4] for row in planned])
+
+        # Add the generated levels on top of whatever stock is already recorded
+        current = {
+            (row.product_id, row.location_id): row
+            for row in Inventory.objects.filter(product_id__in=self.product_ids, location_id__in=locations)
+        }
+        to_create, to_update = [], []
+        for key, level in levels.items():
+            if key in current:
+                current[key].quantity += level
+                to_update.append(current[key])
+            else:
+                to_create.append(Inventory(product_id=key[0], location_id=key[1], quantity=level))
+        Inventory.objects.bulk_create(to_create, batch_size=BATCH_SIZE)
+        Inventory.objects.bulk_update(to_update, ['quantity'], batch_size=BATCH_SIZE)
+        self.created.update(movements=len(pks), inventory=len(levels))
+        self.log(f"Stock: {len(pks)} movements over {len(levels)} inventory rows")
+
+    def _refresh_derived(self):
+        """Bulk inserts skip the signals, so summaries, rollups and caches are rebuilt here."""
+        CustomerSummaryService.check(fix=True)
+        SplitSummaryService.check(fix=True)
+        start_date = timezone.localdate(self.now) - datetime.timedelta(days=self.days + 1)
+        end_date = timezone.localdate(self.now)
+        chunk_start = start_date
+        while chunk_start <= end_date:
+            chunk_end = min(chunk_start + datetime.timedelta(days=30), end_date)
+            SalesRollupService.rebuild(chunk_start, chunk_end)
+            chunk_start = chunk_end + datetime.timedelta(days=1)
+        self.log("Customer and split summaries and sales rollups rebuilt")
+
+        transaction.on_commit(CatalogueService.invalidate)
+        transaction.on_commit(DashboardService.invalidate_all)
+        transaction.on_commit(OrderService.invalidate_filtered_totals)
+        transaction.on_commit(PriceService.invalidate)
+        transaction.on_commit(partial(invalidate_search, 'customers'))
+        transaction.on_commit(partial(invalidate_search, 'products'))
+
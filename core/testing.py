@@ -0,0 +1,34 @@
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+
+class QueryBudgetMixin:
+    """
+    TestCase mixin asserting that a page costs the same number of queries
+    whether it lists N rows or 10N rows (i.e. no per-row N+1 lookups).
+    """
+
+    def count_queries(self, fetch):
+        with CaptureQueriesContext(connection) as queries:
+            response = fetch()
+            if hasattr(response, 'render') and not getattr(response, 'is_rendered', True):
+                response.render()
+        self.assertEqual(response.status_code, 200)
+        return len(queries)
+
+    def assertConstantQueries(self, seed, fetch, n=5):
+        """
+        :param seed: callable creating `count` rows of whatever the page lists
+        :param fetch: callable requesting the page and returning the response
+        """
+        # Run on_commit hooks (cache invalidation, rollups) as a real commit would
+        with self.captureOnCommitCallbacks(execute=True):
+            seed(n)
+        small = self.count_queries(fetch)
+        with self.captureOnCommitCallbacks(execute=True):
+            seed(9 * n)
+        large = self.count_queries(fetch)
+        self.assertEqual(
+            small, large,
+            f"Query count grew from {small} to {large} when rows went from {n} to {10 * n}"
+        )
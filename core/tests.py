@@ -0,0 +1,238 @@
+import csv
+import datetime
+import io
+import json
+import os
+import pstats
+import tempfile
+import zipfile
+from xml.etree import ElementTree
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db.models import F, Sum
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from billing.models import Invoice, Payment
+from inventory.models import StockLocation, StockMovement
+from brands.models import Brand
+from customers.models import Customer, CustomerType
+from customers.services import CustomerSummaryService
+from orders.models import OrderItem, SalesOrder
+from products.models import Product
+from core.testing import QueryBudgetMixin
+from .pagination import keyset_paginate
+from .profiling import RequestProfilingMiddleware, fingerprint
+from .synthetic import SyntheticDataGenerator, scaled_counts
+from .services import DashboardService
+
+
+class KeysetPaginationTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        brand = Brand.objects.create(name='Brand')
+        product = Product.objects.create(brand=brand, name='SKU', mrp=10, ptr=8, margin=2, weight_gms=100)
+        location = StockLocation.objects.create(name='Warehouse')
+        StockMovement.objects.bulk_create([
+            StockMovement(product=product, location=location, movement_type='in', quantity=i + 1)
+            for i in range(7)
+        ])
+        # Two pairs of rows share a timestamp so the pk tie-breaker matters
+        base = timezone.now()
+        for index, movement in enumerate(StockMovement.objects.order_by('pk')):
+            movement.timestamp = base - datetime.timedelta(minutes=index // 2)
+            movement.save(update_fields=['timestamp'])
+        cls.expected = list(StockMovement.objects.order_by('-timestamp', '-pk').values_list('pk', flat=True))
+
+    def test_walks_forwards_and_backwards_without_gaps(self):
+        queryset = StockMovement.objects.all()
+        seen, pages, cursor = [], [], None
+        while True:
+            page = keyset_paginate(queryset, 'timestamp', 3, after=cursor)
+            pages.append(page)
+            seen.extend(m.pk for m in page)
+            if not page.has_next():
+                break
+            cursor = page.next_cursor
+        self.assertEqual(seen, self.expected)
+        self.assertFalse(pages[0].has_previous())
+
+        previous = keyset_paginate(queryset, 'timestamp', 3, before=pages[-1].previous_cursor)
+        self.assertEqual([m.pk for m in previous], [m.pk for m in pages[-2]])
+        self.assertTrue(previous.has_next())
+
+    def test_malformed_cursor_starts_from_the_top(self):
+        page = keyset_paginate(StockMovement.objects.all(), 'timestamp', 3, after='not-a-cursor')
+        self.assertEqual([m.pk for m in page], self.expected[:3])
+
+
+class StreamingExportTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        customer_type = CustomerType.objects.create(name='Retail')
+        customer = Customer.objects.create(name='Kamat & Sons', phone='1', customer_type=customer_type)
+        for status in ['pending', 'delivered', 'delivered']:
+            SalesOrder.objects.create(customer=customer, status=status, total_amount=25)
+
+    def _export(self, **params):
+        response = self.client.get(reverse('orders:export'), params)
+        self.assertTrue(response.streaming)
+        return b''.join(response.streaming_content)
+
+    def test_csv_export_honours_order_filter(self):
+        rows = list(csv.reader(io.StringIO(self._export(status='delivered').decode())))
+        self.assertEqual(rows[0][0], 'Order ID')
+        self.assertEqual([row[4] for row in rows[1:]], ['delivered', 'delivered'])
+
+    def test_xlsx_export_is_a_readable_workbook(self):
+        with zipfile.ZipFile(io.BytesIO(self._export(format='xlsx'))) as archive:
+            self.assertIsNone(archive.testzip())
+            sheet = ElementTree.fromstring(archive.read('xl/worksheets/sheet1.xml'))
+        namespace = {'s': 'http://schemas.openxmlformats.org/spreadsheetml/2006/main'}
+        rows = sheet.findall('.//s:row', namespace)
+        self.assertEqual(len(rows), 4)
+        self.assertEqual(rows[1].find('s:c[3]/s:is/s:t', namespace).text, 'Kamat & Sons')
+        self.assertEqual(rows[1].find('s:c[6]/s:v', namespace).text, '25.00')
+
+
+class DashboardCacheTests(QueryBudgetMixin, TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        customer_type = CustomerType.objects.create(name='Retail')
+        cls.customer = Customer.objects.create(name='Customer', phone='1', customer_type=customer_type)
+
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+
+    def _dashboard(self, day=None):
+        params = {'date': day.isoformat()} if day else {}
+        return self.client.get(reverse('dashboard'), params)
+
+    def test_repeat_views_are_served_from_cache(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            SalesOrder.objects.create(customer=self.customer, total_amount=40)
+        self._dashboard()
+        with self.assertNumQueries(0):
+            response = self._dashboard()
+        self.assertEqual(response.context['total_amount_sum'], 40)
+        self.assertEqual(DashboardService.get_stats()['hits'], 1)
+
+    def test_order_writes_invalidate_today(self):
+        self.assertEqual(self._dashboard().context['total_amount_sum'], 0)
+        with self.captureOnCommitCallbacks(execute=True):
+            order = SalesOrder.objects.create(customer=self.customer, total_amount=40)
+        self.assertEqual(self._dashboard().context['total_amount_sum'], 40)
+        with self.captureOnCommitCallbacks(execute=True):
+            order.total_amount = 55
+            order.save()
+        self.assertEqual(self._dashboard().context['total_amount_sum'], 55)
+        self.assertEqual(DashboardService.get_stats(), {'hits': 0, 'misses': 3, 'hit_rate': 0.0})
+
+    def test_dashboard_queries_do_not_grow_with_orders(self):
+        def seed(count):
+            for _ in range(count):
+                SalesOrder.objects.create(customer=self.customer, total_amount=10)
+        self.assertConstantQueries(seed, lambda: self._dashboard())
+
+
+class SyntheticDataTests(TestCase):
+
+    def test_generated_data_is_consistent(self):
+        counts = scaled_counts(0.01, orders=150)
+        with self.captureOnCommitCallbacks(execute=True):
+            created = SyntheticDataGenerator(counts, days=90, seed=7).generate()
+
+        self.assertEqual(created['orders'], 150)
+        self.assertEqual(SalesOrder.objects.count(), 150)
+        self.assertFalse(SalesOrder.objects.filter(created_at__gt=timezone.now()).exists())
+        self.assertGreater(SalesOrder.objects.dates('created_at', 'day').count(), 10)
+        line_totals = OrderItem.objects.values('order_id').annotate(total=Sum(F('price') * F('quantity')))
+        self.assertTrue(all(
+            SalesOrder.objects.get(pk=row['order_id']).total_amount == row['total'] for row in line_totals
+        ))
+        self.assertFalse(Invoice.objects.exclude(order__status__in=['delivered', 'billed']).exists())
+        self.assertEqual(
+            Payment.objects.aggregate(total=Sum('amount'))['total'],
+            Invoice.objects.aggregate(total=Sum('amount_paid'))['total'],
+        )
+        self.assertEqual(CustomerSummaryService.check(), [])
+
+
+class BenchmarkCommandTests(TestCase):
+
+    def test_json_report_and_rollback(self):
+        output = io.StringIO()
+        call_command(
+            'run_benchmarks', only='confirm_order,order_list,inventory_add_remove',
+            repeat=1, json_path='-', stdout=output,
+        )
+        report = json.loads(output.getvalue())
+        self.assertEqual(
+            [row['name'] for row in report['results']], ['confirm_order', 'order_list', 'inventory_add_remove']
+        )
+        for row in report['results']:
+            self.assertGreater(row['queries'], 0)
+            self.assertGreater(row['ms_median'], 0)
+            self.assertGreater(row['peak_kb'], 0)
+        # Fixtures and the orders the benchmarks placed are rolled back
+        self.assertFalse(SalesOrder.objects.exists())
+
+
+class RequestProfilingTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        customer_type = CustomerType.objects.create(name='Retail')
+        cls.customers = [
+            Customer.objects.create(name=f'Customer {i}', phone=str(i), customer_type=customer_type)
+            for i in range(4)
+        ]
+
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+
+    def _log_record(self, logs):
+        self.assertEqual(len(logs.records), 1)
+        return json.loads(logs.records[0].getMessage())
+
+    def test_server_timing_and_json_log(self):
+        with self.assertLogs('core.profiling', level='INFO') as logs:
+            response = self.client.get(reverse('dashboard'))
+        record = self._log_record(logs)
+        self.assertEqual(record['view'], 'dashboard')
+        self.assertEqual(record['status'], 200)
+        self.assertGreater(record['queries'], 0)
+        self.assertGreater(record['template_ms'], 0)
+        self.assertIn(f'desc="{record["queries"]} queries"', response['Server-Timing'])
+        self.assertIn('tpl;dur=', response['Server-Timing'])
+
+    def test_repeated_query_shapes_are_reported(self):
+        def view(request):
+            for customer in self.customers:
+                Customer.objects.filter(pk__in=[customer.pk] * (customer.pk % 3 + 1)).exists()
+            return HttpResponse()
+
+        with self.assertLogs('core.profiling', level='INFO') as logs:
+            RequestProfilingMiddleware(view)(RequestFactory().get('/n-plus-one/'))
+        duplicates = self._log_record(logs)['duplicates']
+        self.assertEqual(len(duplicates), 1)
+        self.assertEqual(duplicates[0]['count'], 4)
+        self.assertIn('IN (...)', duplicates[0]['sql'])
+        self.assertEqual(fingerprint('SELECT 1  FROM t\nWHERE id IN (%s, %s)'), 'SELECT 1 FROM t WHERE id IN (...)')
+
+    def test_sampled_slow_requests_save_a_profile(self):
+        with tempfile.TemporaryDirectory() as directory:
+            with override_settings(PROFILING_SAMPLE_RATE=1, PROFILING_SLOW_MS=0, PROFILING_DIR=directory):
+                with self.assertLogs('core.profiling', level='WARNING') as logs:
+                    self.client.get(reverse('dashboard'))
+            path = self._log_record(logs)['profile']
+            self.assertEqual(os.path.dirname(path), directory)
+            self.assertGreater(pstats.Stats(path).total_calls, 0)
@@ -18,11 +18,12 @@ from django.contrib import admin
 from django.shortcuts import redirect
 from django.urls import path, include
 
-from core.views import dashboard
+from core.views import dashboard, dashboard_cache_stats
 
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('', dashboard, name='dashboard'),
+    path('dashboard/cache-stats/', dashboard_cache_stats, name='dashboard_cache_stats'),
     path('accounts/', include('accounts.urls')),
     path('brands/', include('brands.urls', namespace='brands')),
     path('products/', include('products.urls', namespace='products')),
@@ -31,4 +32,5 @@ urlpatterns = [
     path('billing/', include('billing.urls', namespace='billing')),
     path('reports/', include('reports.urls', namespace='reports')),
     path('inventory/', include('inventory.urls', namespace='inventory')),
+    path('search/', include('search.urls', namespace='search')),
 ]
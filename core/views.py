@@ -1,7 +1,7 @@
+from django.http import JsonResponse
 from django.shortcuts import render
 from django.utils import timezone
-from django.db.models import Sum
-from orders.models import SalesOrder
+from .services import DashboardService
 
 def dashboard(request):
     date_str = request.GET.get('date')
@@ -13,16 +13,18 @@ def dashboard(request):
     else:
         filter_date = timezone.localdate()
 
-    # Filter orders by the selected date
-    orders = SalesOrder.objects.filter(created_at__date=filter_date).order_by('-created_at')
-
-    # Calculate the sum of total_amount for the filtered orders
-    total_amount_sum = orders.aggregate(total=Sum('total_amount'))['total'] or 0
+    # Orders and their total for the selected date, served from the per-day cache
+    payload = DashboardService.get_payload(filter_date)
 
     context = {
-        'orders': orders,
+        'orders': payload['orders'],
         'filter_date': filter_date.strftime('%Y-%m-%d'),
-        'total_amount_sum': total_amount_sum,
+        'total_amount_sum': payload['total_amount_sum'],
     }
     
-    return render(request, 'includes/dashboard.html', context)
\ No newline at end of file
+    return render(request, 'includes/dashboard.html', context)
+
+
+def dashboard_cache_stats(request):
+    """Hit/miss counters of the dashboard payload cache."""
+    return JsonResponse(DashboardService.get_stats())
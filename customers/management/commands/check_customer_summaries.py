@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+
+from customers.services import CustomerSummaryService
+
+
+class Command(BaseCommand):
+    help = (
+        "Recomputes every customer's lifetime sales, payments, outstanding balance and last order "
+        "from scratch and reports summaries that disagree. Exits with status 1 on mismatches unless --fix."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--fix', action='store_true', help="Overwrite the summaries that disagree.")
+
+    def handle(self, *args, **options):
+        mismatches = CustomerSummaryService.check(fix=options['fix'])
+        for customer_id, stored, expected in mismatches:
+            self.stderr.write(f"Customer {customer_id}: stored {stored}, expected {expected}")
+
+        if not mismatches:
+            self.stdout.write(self.style.SUCCESS("All customer summaries are consistent."))
+        elif options['fix']:
+            self.stdout.write(self.style.SUCCESS(f"Fixed {len(mismatches)} customer summaries."))
+        else:
+            self.stdout.write(self.style.ERROR(f"{len(mismatches)} customer summaries are out of date; rerun with --fix."))
+            raise SystemExit(1)
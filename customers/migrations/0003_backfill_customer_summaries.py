@@ -0,0 +1,34 @@
+# Generated by Django 5.2.5 on 2026-10-18 09:14
+
+from django.db import migrations
+from django.db.models import Max, Sum
+
+
+def backfill_summaries(apps, schema_editor):
+    Customer = apps.get_model('customers', 'Customer')
+    CustomerSummary = apps.get_model('customers', 'CustomerSummary')
+    Invoice = apps.get_model('billing', 'Invoice')
+    SalesOrder = apps.get_model('orders', 'SalesOrder')
+
+    summaries = {pk: CustomerSummary(customer_id=pk) for pk in Customer.objects.values_list('pk', flat=True)}
+    for row in Invoice.objects.values('order__customer_id').annotate(sales=Sum('total'), paid=Sum('amount_paid')).order_by():
+        summary = summaries[row['order__customer_id']]
+        summary.lifetime_sales = row['sales']
+        summary.lifetime_paid = row['paid']
+        summary.outstanding = row['sales'] - row['paid']
+    for row in SalesOrder.objects.values('customer_id').annotate(last=Max('created_at')).order_by():
+        summaries[row['customer_id']].last_order_at = row['last']
+    CustomerSummary.objects.bulk_create(summaries.values(), batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('customers', '0002_customersummary'),
+        ('billing', '0008_backfill_payments'),
+        ('orders', '0004_salesorder_order_status_created_idx'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_summaries, migrations.RunPython.noop),
+    ]
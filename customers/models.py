@@ -25,6 +25,21 @@ class Customer(models.Model):
         return f"{self.name} ({self.customer_type.name})"
 
 
+class CustomerSummary(models.Model):
+    """
+    Lifetime invoiced / paid totals and last order time per customer, kept up to date
+    by customers.signals and verified with `manage.py check_customer_summaries`.
+    """
+    customer = models.OneToOneField(Customer, on_delete=models.CASCADE, primary_key=True, related_name='summary')
+    lifetime_sales = models.DecimalField(max_digits=14, decimal_places=2, default=0)  # sum of invoice totals
+    lifetime_paid = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    outstanding = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    last_order_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.customer_id}: outstanding {self.outstanding}"
+
+
 class CustomerAddress(models.Model):
     """
     Support multiple addresses per customer if needed.
@@ -1,4 +1,11 @@
-from .models import Customer, CustomerType
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Case, DecimalField, F, Max, Q, Sum, When
+
+from billing.models import Invoice
+from orders.models import SalesOrder
+from .models import Customer, CustomerSummary, CustomerType
 
 class CustomerService:
 
@@ -22,3 +29,125 @@ class CustomerService:
     @staticmethod
     def get_customer(customer_id):
         return Customer.objects.get(pk=customer_id)
+
+
+SUMMARY_CHUNK_SIZE = 500
+
+
+class CustomerSummaryService:
+    """
+    Keeps CustomerSummary in step with invoices and payments. Changes are applied as F()
+    deltas inside the writer's transaction, so concurrent invoices and payments add up.
+    """
+
+    @staticmethod
+    def apply(deltas):
+        """
+        Adds {customer_id: (sales_delta, paid_delta)} to the summaries, one UPDATE per chunk.
+        """
+        deltas = {pk: delta for pk, delta in deltas.items() if any(delta)}
+        if not deltas:
+            return
+        CustomerSummary.objects.bulk_create(
+            [CustomerSummary(customer_id=pk) for pk in deltas], ignore_conflicts=True
+        )
+        pks = list(deltas)
+        for start in range(0, len(pks), SUMMARY_CHUNK_SIZE):
+            chunk = pks[start:start + SUMMARY_CHUNK_SIZE]
+
+            def column(field, amount):
+                whens = [When(pk=pk, then=F(field) + amount(*deltas[pk])) for pk in chunk]
+                return Case(*whens, default=F(field), output_field=DecimalField())
+
+            CustomerSummary.objects.filter(pk__in=chunk).update(
+                lifetime_sales=column('lifetime_sales', lambda sales, paid: sales),
+                lifetime_paid=column('lifetime_paid', lambda sales, paid: paid),
+                outstanding=column('outstanding', lambda sales, paid: sales - paid),
+            )
+
+    @staticmethod
+    def touch_last_order(customer_id, ordered_at):
+        CustomerSummary.objects.bulk_create([CustomerSummary(customer_id=customer_id)], ignore_conflicts=True)
+        CustomerSummary.objects.filter(
+            Q(last_order_at__isnull=True) | Q(last_order_at__lt=ordered_at), pk=customer_id
+        ).update(last_order_at=ordered_at)
+
+    @staticmethod
+    def refresh_last_order(customer_id):
+        """Recomputes last_order_at, for when the customer's latest order may have gone."""
+        last = SalesOrder.objects.filter(customer_id=customer_id).aggregate(last=Max('created_at'))['last']
+        CustomerSummary.objects.filter(pk=customer_id).update(last_order_at=last)
+
+    @staticmethod
+    def move_order(order_id, previous_customer, new_customer, created_at):
+        """Moves an order's invoice amounts and last-order date between customer summaries."""
+        invoiced = Invoice.objects.filter(order_id=order_id).values_list('total', 'amount_paid').first()
+        if invoiced:
+            total, paid = invoiced
+            CustomerSummaryService.apply({previous_customer: (-total, -paid), new_customer: (total, paid)})
+        CustomerSummaryService.touch_last_order(new_customer, created_at)
+        CustomerSummaryService.refresh_last_order(previous_customer)
+
+    @staticmethod
+    def compute(customer_ids=None):
+        """
+        Recomputes summaries from scratch with two grouped queries.
+
+        :return: {customer_id: (lifetime_sales, lifetime_paid, last_order_at)} for every customer
+        """
+        customers = Customer.objects.all()
+        invoices = Invoice.objects.values('order__customer_id').annotate(
+            sales=Sum('total'), paid=Sum('amount_paid')
+        ).order_by()
+        orders = SalesOrder.objects.values('customer_id').annotate(last=Max('created_at')).order_by()
+        if customer_ids is not None:
+            customers = customers.filter(pk__in=customer_ids)
+            invoices = invoices.filter(order__customer_id__in=customer_ids)
+            orders = orders.filter(customer_id__in=customer_ids)
+
+        result = {pk: (Decimal('0.00'), Decimal('0.00'), None) for pk in customers.values_list('pk', flat=True)}
+        for row in invoices:
+            _sales, _paid, last = result[row['order__customer_id']]
+            result[row['order__customer_id']] = (row['sales'], row['paid'], last)
+        for row in orders:
+            sales, paid, _last = result[row['customer_id']]
+            result[row['customer_id']] = (sales, paid, row['last'])
+        return result
+
+    @staticmethod
+    @transaction.atomic
+    def check(fix=False):
+        """
+        Compares every stored summary with a fresh computation.
+
+        :param fix: overwrite the summaries that disagree (and create missing ones)
+        :return: list of (customer_id, stored, expected) tuples for the mismatches
+        """
+        stored = {
+            summary.pk: summary
+            for summary in CustomerSummary.objects.select_for_update()
+        }
+        mismatches, to_create, to_update = [], [], []
+        for pk, (sales, paid, last) in CustomerSummaryService.compute().items():
+            expected = (sales, paid, sales - paid, last)
+            summary = stored.get(pk)
+            current = None if summary is None else (
+                summary.lifetime_sales, summary.lifetime_paid, summary.outstanding, summary.last_order_at
+            )
+            if current == expected:
+                continue
+            mismatches.append((pk, current, expected))
+            if summary is None:
+                summary = CustomerSummary(customer_id=pk)
+                to_create.append(summary)
+            else:
+                to_update.append(summary)
+            summary.lifetime_sales, summary.lifetime_paid, summary.outstanding, summary.last_order_at = expected
+
+        if fix:
+            CustomerSummary.objects.bulk_create(to_create, batch_size=SUMMARY_CHUNK_SIZE)
+            CustomerSummary.objects.bulk_update(
+                to_update, ['lifetime_sales', 'lifetime_paid', 'outstanding', 'last_order_at'],
+                batch_size=SUMMARY_CHUNK_SIZE
+            )
+        return mismatches
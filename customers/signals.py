@@ -0,0 +1,89 @@
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db.models import Sum
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from billing.models import Invoice
+from billing.signals import invoices_created, payments_recorded
+from orders.models import SalesOrder
+from .models import Customer, CustomerSummary
+from .services import CustomerSummaryService
+
+ZERO = Decimal('0')
+
+
+def _customer_of(invoice):
+    return SalesOrder.objects.filter(pk=invoice.order_id).values_list('customer_id', flat=True).first()
+
+
+@receiver(post_save, sender=Customer)
+def create_customer_summary(sender, instance, created, **kwargs):
+    if created:
+        CustomerSummary.objects.get_or_create(customer=instance)
+
+
+@receiver(pre_save, sender=SalesOrder)
+def remember_order_customer(sender, instance, **kwargs):
+    previous = None
+    if instance.pk:
+        previous = SalesOrder.objects.filter(pk=instance.pk).values_list('customer_id', flat=True).first()
+    instance._previous_customer_id = previous
+
+
+@receiver(post_save, sender=SalesOrder)
+def record_last_order(sender, instance, **kwargs):
+    previous = getattr(instance, '_previous_customer_id', None)
+    if previous is not None and previous != instance.customer_id:
+        CustomerSummaryService.move_order(instance.pk, previous, instance.customer_id, instance.created_at)
+    else:
+        CustomerSummaryService.touch_last_order(instance.customer_id, instance.created_at)
+
+
+@receiver(post_delete, sender=SalesOrder)
+def recompute_last_order(sender, instance, **kwargs):
+    CustomerSummaryService.refresh_last_order(instance.customer_id)
+
+
+@receiver(pre_save, sender=Invoice)
+def remember_invoice_amounts(sender, instance, **kwargs):
+    previous = None
+    if instance.pk:
+        previous = Invoice.objects.filter(pk=instance.pk).values_list('total', 'amount_paid').first()
+    instance._previous_amounts = previous or (ZERO, ZERO)
+
+
+@receiver(post_save, sender=Invoice)
+def apply_invoice_change(sender, instance, **kwargs):
+    old_total, old_paid = getattr(instance, '_previous_amounts', (ZERO, ZERO))
+    deltas = (Decimal(str(instance.total)) - old_total, Decimal(str(instance.amount_paid)) - old_paid)
+    if any(deltas):
+        CustomerSummaryService.apply({_customer_of(instance): deltas})
+
+
+@receiver(post_delete, sender=Invoice)
+def apply_invoice_removal(sender, instance, **kwargs):
+    customer_id = _customer_of(instance)
+    if customer_id is not None:
+        CustomerSummaryService.apply({customer_id: (-instance.total, -instance.amount_paid)})
+
+
+@receiver(invoices_created)
+def apply_bulk_invoices(sender, order_ids, **kwargs):
+    rows = Invoice.objects.filter(order_id__in=order_ids).values('order__customer_id').annotate(
+        sales=Sum('total'), paid=Sum('amount_paid')
+    ).order_by()
+    CustomerSummaryService.apply({row['order__customer_id']: (row['sales'], row['paid']) for row in rows})
+
+
+@receiver(payments_recorded)
+def apply_payments(sender, invoice_ids, amounts, **kwargs):
+    customers = dict(
+        Invoice.objects.filter(pk__in=invoice_ids).values_list('pk', 'order__customer_id')
+    )
+    deltas = defaultdict(lambda: (ZERO, ZERO))
+    for invoice_id, amount in amounts.items():
+        customer_id = customers[invoice_id]
+        deltas[customer_id] = (ZERO, deltas[customer_id][1] + amount)
+    CustomerSummaryService.apply(deltas)
@@ -1,3 +1,80 @@
+import io
+
+from django.core.management import call_command
 from django.test import TestCase
+from django.urls import reverse
+
+from billing.models import Invoice
+from billing.services import BillingService, PaymentService
+from core.testing import QueryBudgetMixin
+from orders.models import SalesOrder
+from .models import Customer, CustomerSummary, CustomerType
+from .services import CustomerSummaryService
+
+
+class CustomerListQueryBudgetTests(QueryBudgetMixin, TestCase):
+
+    def test_customer_list(self):
+        def seed(count):
+            for _ in range(count):
+                customer_type = CustomerType.objects.create(name=f'Type {CustomerType.objects.count()}')
+                Customer.objects.create(name='Customer', phone='1', customer_type=customer_type)
+
+        self.assertConstantQueries(seed, lambda: self.client.get(reverse('customers:list')))
+
+
+class CustomerSummaryTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        customer_type = CustomerType.objects.create(name='Retail')
+        cls.customer = Customer.objects.create(name='Customer', phone='1', customer_type=customer_type)
+        cls.other = Customer.objects.create(name='Other', phone='2', customer_type=customer_type)
+
+    def _summary(self, customer=None):
+        return CustomerSummary.objects.get(customer=customer or self.customer)
+
+    def test_invoices_and_payments_keep_the_summary_current(self):
+        first = SalesOrder.objects.create(customer=self.customer, total_amount=100, status='delivered')
+        invoice = BillingService.generate_invoice(first.pk)
+        PaymentService.record_payment(invoice, 30, 'Cash')
+        for _ in range(2):
+            SalesOrder.objects.create(customer=self.customer, total_amount=50, status='delivered')
+        SalesOrder.objects.create(customer=self.other, total_amount=70, status='delivered')
+        BillingService.generate_pending_invoices()
+
+        summary = self._summary()
+        self.assertEqual((summary.lifetime_sales, summary.lifetime_paid, summary.outstanding), (200, 30, 170))
+        self.assertEqual(summary.last_order_at, SalesOrder.objects.filter(customer=self.customer).latest('created_at').created_at)
+        self.assertEqual(self._summary(self.other).outstanding, 70)
+
+        invoice.delete()
+        summary = self._summary()
+        self.assertEqual((summary.lifetime_sales, summary.lifetime_paid, summary.outstanding), (100, 0, 100))
+        self.assertEqual(CustomerSummaryService.check(), [])
+
+    def test_saving_an_order_for_another_customer_moves_its_invoice(self):
+        order = SalesOrder.objects.create(customer=self.customer, total_amount=100, status='delivered')
+        invoice = BillingService.generate_invoice(order.pk)
+        PaymentService.record_payment(invoice, 30, 'Cash')
+
+        order.customer = self.other
+        order.save()
+        summary = self._summary()
+        self.assertEqual((summary.lifetime_sales, summary.lifetime_paid, summary.outstanding), (0, 0, 0))
+        self.assertIsNone(summary.last_order_at)
+        summary = self._summary(self.other)
+        self.assertEqual((summary.lifetime_sales, summary.lifetime_paid, summary.outstanding), (100, 30, 70))
+        self.assertEqual(summary.last_order_at, order.created_at)
+        self.assertEqual(CustomerSummaryService.check(), [])
+
+    def test_check_command_repairs_drift(self):
+        order = SalesOrder.objects.create(customer=self.customer, total_amount=100)
+        Invoice.objects.create(order=order, invoice_number='INV-S-1', total=100)
+        CustomerSummary.objects.filter(customer=self.customer).update(outstanding=5)
 
-# Create your tests here.
+        with self.assertRaises(SystemExit):
+            call_command('check_customer_summaries', stdout=io.StringIO(), stderr=io.StringIO())
+        call_command('check_customer_summaries', fix=True, stdout=io.StringIO(), stderr=io.StringIO())
+        self.assertEqual(self._summary().outstanding, 100)
+        self.assertEqual(CustomerSummaryService.check(), [])
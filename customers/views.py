@@ -10,6 +10,10 @@ class CustomerListView(ListView):
     template_name = 'customers/customer_list.html'
     context_object_name = 'customers'
 
+    def get_queryset(self):
+        # Balances come from the maintained summary row rather than from orders and invoices
+        return super().get_queryset().select_related('customer_type', 'summary')
+
 def customer_add(request):
     customer_types = CustomerType.objects.all()
     # Provide two blank address forms by default
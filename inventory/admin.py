@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import StockLocation, Inventory, StockMovement
+from .models import StockLocation, Inventory, StockMovement, StockReservation
 
 @admin.register(StockLocation)
 class StockLocationAdmin(admin.ModelAdmin):
@@ -15,3 +15,9 @@ class StockMovementAdmin(admin.ModelAdmin):
     list_display = ('product', 'location', 'movement_type', 'quantity', 'timestamp', 'reference')
     list_filter = ('movement_type', 'location')
     search_fields = ('product__name', 'reference')
+
+@admin.register(StockReservation)
+class StockReservationAdmin(admin.ModelAdmin):
+    list_display = ('order', 'product', 'location', 'quantity', 'status', 'created_at', 'released_at')
+    list_filter = ('status', 'location')
+    search_fields = ('product__name', 'order__id')
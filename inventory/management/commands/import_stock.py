@@ -0,0 +1,36 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from inventory.services import InventoryService
+
+
+class Command(BaseCommand):
+    help = (
+        "Imports goods-received stock from a CSV with the header "
+        "product,location,quantity,reference[,notes]. Use '-' to read from stdin."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="CSV file to import, or '-' for stdin.")
+        parser.add_argument('--chunk-size', type=int, default=1000, help="Rows written per transaction (default: 1000).")
+
+    def handle(self, *args, **options):
+        if options['chunk_size'] <= 0:
+            raise CommandError("--chunk-size must be positive.")
+
+        if options['path'] == '-':
+            result = InventoryService.ingest_stock_csv(sys.stdin, chunk_size=options['chunk_size'])
+        else:
+            try:
+                with open(options['path'], newline='', encoding='utf-8-sig') as csv_file:
+                    result = InventoryService.ingest_stock_csv(csv_file, chunk_size=options['chunk_size'])
+            except OSError as exc:
+                raise CommandError(str(exc))
+
+        for row_number, message in result['errors']:
+            self.stderr.write(f"Row {row_number}: {message}")
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {result['rows']} rows in {result['seconds']:.2f}s "
+            f"({result['rows_per_second']:.0f} rows/s), {len(result['errors'])} skipped."
+        ))
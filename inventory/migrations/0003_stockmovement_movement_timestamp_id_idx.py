@@ -0,0 +1,18 @@
+# Generated by Django 5.2.5 on 2026-10-18 08:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0002_stockreservation'),
+        ('products', '0002_product_ptr'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='stockmovement',
+            index=models.Index(fields=['timestamp', 'id'], name='movement_timestamp_id_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.5 on 2026-10-18 09:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0003_stockmovement_movement_timestamp_id_idx'),
+        ('products', '0002_product_ptr'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='stockmovement',
+            index=models.Index(fields=['product', 'location', 'timestamp'], name='movement_prod_loc_ts_idx'),
+        ),
+    ]
@@ -46,5 +46,34 @@ class StockMovement(models.Model):
     reference = models.CharField(max_length=100, blank=True)  # e.g., Order ID, Supplier invoice
     notes = models.TextField(blank=True)
 
+    class Meta:
+        indexes = [
+            # Keyset pagination cursor for StockMovementListView
+            models.Index(fields=['timestamp', 'id'], name='movement_timestamp_id_idx'),
+            # Per product / location audit trail, newest first
+            models.Index(fields=['product', 'location', 'timestamp'], name='movement_prod_loc_ts_idx'),
+        ]
+
     def __str__(self):
         return f"{self.get_movement_type_display()} {self.quantity} of {self.product.name} at {self.location.name}"
+
+class StockReservation(models.Model):
+    """
+    Stock held against a sales order. Reserving takes the quantity out of Inventory;
+    releasing (e.g. when the order is cancelled) puts it back.
+    """
+    STATUS_CHOICES = [
+        ('active', _('Active')),
+        ('released', _('Released')),
+    ]
+
+    order = models.ForeignKey('orders.SalesOrder', on_delete=models.CASCADE, related_name='stock_reservations')
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='stock_reservations')
+    location = models.ForeignKey(StockLocation, on_delete=models.CASCADE, related_name='stock_reservations')
+    quantity = models.PositiveIntegerField()
+    status = models.CharField(max_length=16, choices=STATUS_CHOICES, default='active')
+    created_at = models.DateTimeField(auto_now_add=True)
+    released_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.quantity} of {self.product.name} at {self.location.name} for order {self.order_id} ({self.status})"
@@ -1,5 +1,68 @@
-from .models import Inventory, StockMovement
+import csv
+import time
+from collections import defaultdict
+from itertools import islice
+
 from django.db import transaction
+from django.db.models import Case, F, Q, When
+from django.utils import timezone
+
+from products.models import Product
+from .models import Inventory, StockLocation, StockMovement, StockReservation
+
+
+class InsufficientStock(ValueError):
+    """
+    Raised when removing or reserving stock would take a product below zero.
+    `product_ids` lists the products that could not be covered.
+    """
+    def __init__(self, product_ids, message='Insufficient stock to remove'):
+        self.product_ids = list(product_ids)
+        super().__init__(f"{message} (product ids: {self.product_ids})")
+
+
+def _apply_deltas(deltas, require_available=False):
+    """
+    Applies {inventory_pk: delta} with one UPDATE statement.
+    With require_available, a row is only decremented while it still holds enough stock;
+    returns the number of rows changed.
+    """
+    if require_available:
+        condition = Q()
+        for pk, delta in deltas.items():
+            condition |= Q(pk=pk, quantity__gte=-delta)
+    else:
+        condition = Q(pk__in=deltas.keys())
+    whens = [When(pk=pk, then=F('quantity') + delta) for pk, delta in deltas.items()]
+    return Inventory.objects.filter(condition).update(
+        quantity=Case(*whens, default=F('quantity')),
+        updated_at=timezone.now()
+    )
+
+
+def _parse_movement_rows(rows, line_offset, locations):
+    """
+    Validates raw ingestion rows. Returns (valid, errors) where valid holds
+    (line_number, product_id, location_id, quantity, reference, notes) tuples.
+    """
+    valid, errors = [], []
+    for line_number, row in enumerate(rows, start=line_offset):
+        try:
+            product_id = int(row['product'])
+            quantity = int(row['quantity'])
+        except (KeyError, TypeError, ValueError):
+            errors.append((line_number, 'Invalid product or quantity'))
+            continue
+        location_id = locations.get(str(row.get('location', '')).strip().lower())
+        if location_id is None:
+            errors.append((line_number, f"Unknown location {row.get('location')!r}"))
+            continue
+        if quantity <= 0:
+            errors.append((line_number, 'Quantity must be greater than zero'))
+            continue
+        valid.append((line_number, product_id, location_id, quantity, row.get('reference') or '', row.get('notes') or ''))
+    return valid, errors
+
 
 class InventoryService:
 
@@ -7,9 +70,11 @@ class InventoryService:
     @transaction.atomic
     def add_stock(product, location, quantity, reference='', notes=''):
         inventory, created = Inventory.objects.get_or_create(product=product, location=location)
-        # Update current stock
-        inventory.quantity += quantity
-        inventory.save()
+        # Update current stock in the database so concurrent writers don't lose updates
+        Inventory.objects.filter(pk=inventory.pk).update(
+            quantity=F('quantity') + quantity,
+            updated_at=timezone.now()
+        )
         # Record stock movement
         StockMovement.objects.create(
             product=product,
@@ -19,16 +84,21 @@ class InventoryService:
             reference=reference,
             notes=notes
         )
+        inventory.refresh_from_db()
         return inventory
 
     @staticmethod
     @transaction.atomic
     def remove_stock(product, location, quantity, reference='', notes=''):
-        inventory = Inventory.objects.get(product=product, location=location)
-        if inventory.quantity < quantity:
-            raise ValueError('Insufficient stock to remove')
-        inventory.quantity -= quantity
-        inventory.save()
+        # Conditional decrement: only succeeds while enough stock is left
+        updated = Inventory.objects.filter(
+            product=product, location=location, quantity__gte=quantity
+        ).update(
+            quantity=F('quantity') - quantity,
+            updated_at=timezone.now()
+        )
+        if not updated:
+            raise InsufficientStock([product.pk])
         StockMovement.objects.create(
             product=product,
             location=location,
@@ -37,9 +107,213 @@ class InventoryService:
             reference=reference,
             notes=notes
         )
-        return inventory
+        return Inventory.objects.get(product=product, location=location)
 
     @staticmethod
     def get_stock_level(product, location):
         inventory = Inventory.objects.filter(product=product, location=location).first()
         return inventory.quantity if inventory else 0
+
+    @staticmethod
+    @transaction.atomic
+    def reserve_stock(order, location, lines, notes=''):
+        """
+        Reserves stock for every line of an order, all or nothing.
+
+        Inventory rows are locked in primary-key order, so concurrent reservations
+        touching the same products can't deadlock, and all lines are decremented
+        with a single conditional UPDATE.
+
+        :param order: SalesOrder the stock is held for
+        :param location: StockLocation to take the stock from
+        :param lines: iterable of (product_id, quantity) pairs
+        :return: list of created StockReservation instances
+        :raises InsufficientStock: if any line can't be covered; nothing is changed
+        """
+        quantities = defaultdict(int)
+        for product_id, quantity in lines:
+            if quantity > 0:
+                quantities[int(product_id)] += quantity
+        if not quantities:
+            return []
+
+        locked = {
+            product_id: (pk, available)
+            for pk, product_id, available in Inventory.objects.select_for_update().filter(
+                location=location, product_id__in=quantities.keys()
+            ).order_by('pk').values_list('pk', 'product_id', 'quantity')
+        }
+        shortages = [
+            product_id for product_id, quantity in quantities.items()
+            if product_id not in locked or locked[product_id][1] < quantity
+        ]
+        if shortages:
+            raise InsufficientStock(sorted(shortages), message='Insufficient stock to reserve')
+
+        deltas = {locked[product_id][0]: -quantity for product_id, quantity in quantities.items()}
+        # Backends without row locks (SQLite) still can't oversell: rows that no longer
+        # hold enough stock are skipped by the UPDATE, and the whole reservation rolls back.
+        if _apply_deltas(deltas, require_available=True) != len(deltas):
+            raise InsufficientStock(sorted(quantities), message='Insufficient stock to reserve')
+
+        reference = f"Order {order.pk}"
+        reservations = StockReservation.objects.bulk_create([
+            StockReservation(order=order, product_id=product_id, location=location, quantity=quantity)
+            for product_id, quantity in quantities.items()
+        ])
+        StockMovement.objects.bulk_create([
+            StockMovement(
+                product_id=product_id,
+                location=location,
+                movement_type='out',
+                quantity=quantity,
+                reference=reference,
+                notes=notes or 'Reserved'
+            )
+            for product_id, quantity in quantities.items()
+        ])
+        return reservations
+
+    @staticmethod
+    @transaction.atomic
+    def release_reservations(order, notes=''):
+        """
+        Returns all active reservations of an order to stock.
+
+        :return: number of reservations released
+        """
+        reservations = list(
+            StockReservation.objects.select_for_update().filter(order=order, status='active').order_by('pk')
+        )
+        if not reservations:
+            return 0
+
+        released = StockReservation.objects.filter(
+            pk__in=[r.pk for r in reservations], status='active'
+        ).update(status='released', released_at=timezone.now())
+        if released != len(reservations):
+            raise ValueError('Reservations were released concurrently')
+
+        returned = defaultdict(int)
+        for reservation in reservations:
+            returned[(reservation.product_id, reservation.location_id)] += reservation.quantity
+
+        location_filter = Q()
+        for product_id, location_id in returned:
+            location_filter |= Q(product_id=product_id, location_id=location_id)
+        inventory_rows = Inventory.objects.select_for_update().filter(location_filter).order_by('pk').values_list(
+            'pk', 'product_id', 'location_id'
+        )
+        _apply_deltas({pk: returned[(product_id, location_id)] for pk, product_id, location_id in inventory_rows})
+
+        reference = f"Order {order.pk}"
+        StockMovement.objects.bulk_create([
+            StockMovement(
+                product_id=product_id,
+                location_id=location_id,
+                movement_type='in',
+                quantity=quantity,
+                reference=reference,
+                notes=notes or 'Reservation released'
+            )
+            for (product_id, location_id), quantity in returned.items()
+        ])
+        return len(reservations)
+
+    @staticmethod
+    @transaction.atomic
+    def _ingest_chunk(lines):
+        """
+        Writes one chunk of validated stock-in lines with a fixed number of queries:
+        missing Inventory rows are bulk inserted, all quantities are bumped with one
+        UPDATE and the audit trail is written with one bulk INSERT.
+        """
+        deltas = defaultdict(int)
+        for product_id, location_id, quantity, _reference, _notes in lines:
+            deltas[(product_id, location_id)] += quantity
+
+        Inventory.objects.bulk_create(
+            [Inventory(product_id=product_id, location_id=location_id) for product_id, location_id in deltas],
+            ignore_conflicts=True
+        )
+        inventory_rows = Inventory.objects.select_for_update().filter(
+            product_id__in={product_id for product_id, _location_id in deltas},
+            location_id__in={location_id for _product_id, location_id in deltas}
+        ).order_by('pk').values_list('pk', 'product_id', 'location_id')
+        _apply_deltas({
+            pk: deltas[(product_id, location_id)]
+            for pk, product_id, location_id in inventory_rows
+            if (product_id, location_id) in deltas
+        })
+
+        StockMovement.objects.bulk_create([
+            StockMovement(
+                product_id=product_id,
+                location_id=location_id,
+                movement_type='in',
+                quantity=quantity,
+                reference=reference,
+                notes=notes
+            )
+            for product_id, location_id, quantity, reference, notes in lines
+        ])
+
+    @staticmethod
+    def ingest_stock(rows, chunk_size=1000):
+        """
+        Bulk stock-in for goods-received notes.
+
+        Rows are consumed lazily and written in chunks of `chunk_size`, each in its own
+        transaction, so memory stays bounded however long the input is.
+
+        :param rows: iterable of dicts with 'product' (id), 'location' (id or name),
+                     'quantity', and optional 'reference' and 'notes'
+        :param chunk_size: number of rows written per transaction
+        :return: dict with rows, errors (list of (row number, message)), seconds and rows_per_second
+        """
+        locations = {}
+        for pk, name in StockLocation.objects.values_list('pk', 'name'):
+            locations[str(pk)] = pk
+            locations[name.strip().lower()] = pk
+
+        started = time.perf_counter()
+        rows = iter(rows)
+        imported = 0
+        errors = []
+        line_offset = 1
+        while True:
+            chunk = list(islice(rows, chunk_size))
+            if not chunk:
+                break
+            lines, chunk_errors = _parse_movement_rows(chunk, line_offset, locations)
+            line_offset += len(chunk)
+
+            # One query per chunk to drop lines pointing at unknown products
+            known_products = set(
+                Product.objects.filter(pk__in={line[1] for line in lines}).values_list('pk', flat=True)
+            )
+            for line in lines:
+                if line[1] not in known_products:
+                    chunk_errors.append((line[0], f"Unknown product {line[1]}"))
+            lines = [line[1:] for line in lines if line[1] in known_products]
+
+            if lines:
+                InventoryService._ingest_chunk(lines)
+            imported += len(lines)
+            errors.extend(sorted(chunk_errors))
+
+        seconds = time.perf_counter() - started
+        return {
+            'rows': imported,
+            'errors': errors,
+            'seconds': seconds,
+            'rows_per_second': imported / seconds if seconds else 0,
+        }
+
+    @staticmethod
+    def ingest_stock_csv(file_obj, chunk_size=1000):
+        """
+        Streams a CSV with the header product,location,quantity,reference[,notes]
+        into ingest_stock().
+        """
+        return InventoryService.ingest_stock(csv.DictReader(file_obj), chunk_size=chunk_size)
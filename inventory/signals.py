@@ -0,0 +1,22 @@
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+
+from orders.models import SalesOrder
+from orders.signals import orders_bulk_updated
+from .services import InventoryService
+
+
+@receiver(post_save, sender=SalesOrder)
+def release_stock_on_cancel(sender, instance, **kwargs):
+    if instance.status == 'cancelled':
+        InventoryService.release_reservations(instance, notes='Order cancelled')
+
+
+@receiver(orders_bulk_updated)
+def release_stock_on_bulk_cancel(sender, order_ids, **kwargs):
+    # update_order() and bulk status changes write with queryset.update(), which skips post_save
+    cancelled = SalesOrder.objects.filter(
+        pk__in=order_ids, status='cancelled', stock_reservations__status='active'
+    ).distinct()
+    for order in cancelled:
+        InventoryService.release_reservations(order, notes='Order cancelled')
@@ -1,3 +1,164 @@
-from django.test import TestCase
+import threading
 
-# Create your tests here.
+from django.db import connection
+from django.test import TestCase, TransactionTestCase, skipUnlessDBFeature
+from django.urls import reverse
+
+from brands.models import Brand
+from core.testing import QueryBudgetMixin
+from customers.models import Customer, CustomerType
+from orders.models import SalesOrder
+from orders.services import OrderService
+from products.models import Product
+from .models import Inventory, StockLocation, StockMovement, StockReservation
+from .services import InsufficientStock, InventoryService
+
+
+def _make_catalogue(product_count=2, stock=10):
+    brand = Brand.objects.create(name='Brand')
+    products = [
+        Product.objects.create(brand=brand, name=f'SKU {i}', mrp=10, ptr=8, margin=2, weight_gms=100)
+        for i in range(product_count)
+    ]
+    location = StockLocation.objects.create(name='Warehouse')
+    for product in products:
+        Inventory.objects.create(product=product, location=location, quantity=stock)
+    customer_type = CustomerType.objects.create(name='Retail')
+    customer = Customer.objects.create(name='Customer', phone='1', customer_type=customer_type)
+    return products, location, customer
+
+
+class StockReservationTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.products, cls.location, cls.customer = _make_catalogue()
+
+    def _stock(self, product):
+        return InventoryService.get_stock_level(product, self.location)
+
+    def test_reserve_and_release_on_cancel(self):
+        order = SalesOrder.objects.create(customer=self.customer)
+        first, second = self.products
+        InventoryService.reserve_stock(order, self.location, [(first.pk, 3), (second.pk, 4)])
+        self.assertEqual((self._stock(first), self._stock(second)), (7, 6))
+
+        order.status = 'cancelled'
+        order.save()
+        self.assertEqual((self._stock(first), self._stock(second)), (10, 10))
+        self.assertFalse(order.stock_reservations.filter(status='active').exists())
+
+    def test_release_on_cancel_through_update_order(self):
+        first, second = self.products
+        order = OrderService.create_order({'customer': self.customer}, [{'product_id': first.pk, 'quantity': 3}])
+        InventoryService.reserve_stock(order, self.location, [(first.pk, 3)])
+        self.assertEqual(self._stock(first), 7)
+
+        OrderService.update_order(
+            order, {'status': 'cancelled'}, [{'product_id': first.pk, 'quantity': 3}], expected_version=0
+        )
+        self.assertEqual(self._stock(first), 10)
+        self.assertEqual(set(order.stock_reservations.values_list('status', flat=True)), {'released'})
+
+    def test_shortage_on_any_line_changes_nothing(self):
+        order = SalesOrder.objects.create(customer=self.customer)
+        first, second = self.products
+        with self.assertRaises(InsufficientStock) as raised:
+            InventoryService.reserve_stock(order, self.location, [(first.pk, 3), (second.pk, 11)])
+        self.assertEqual(raised.exception.product_ids, [second.pk])
+        self.assertEqual((self._stock(first), self._stock(second)), (10, 10))
+        self.assertFalse(StockReservation.objects.exists())
+        self.assertFalse(StockMovement.objects.exists())
+
+    def test_remove_stock_refuses_to_go_negative(self):
+        product = self.products[0]
+        InventoryService.remove_stock(product, self.location, 10)
+        with self.assertRaises(ValueError):
+            InventoryService.remove_stock(product, self.location, 1)
+        self.assertEqual(self._stock(product), 0)
+
+
+class StockIngestionTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.products, cls.location, _customer = _make_catalogue(stock=0)
+
+    def test_bulk_ingestion_upserts_inventory_and_audits_every_row(self):
+        first, second = self.products
+        other_location = StockLocation.objects.create(name='Store')
+        rows = [
+            {'product': first.pk, 'location': 'warehouse', 'quantity': '5', 'reference': 'GRN-1'},
+            {'product': first.pk, 'location': 'Warehouse', 'quantity': '2', 'reference': 'GRN-1'},
+            {'product': second.pk, 'location': str(other_location.pk), 'quantity': '7', 'reference': 'GRN-1'},
+            {'product': 0, 'location': 'Warehouse', 'quantity': '1'},
+            {'product': first.pk, 'location': 'Warehouse', 'quantity': '-1'},
+        ]
+        result = InventoryService.ingest_stock(rows, chunk_size=2)
+
+        self.assertEqual(result['rows'], 3)
+        self.assertEqual([row for row, _message in result['errors']], [4, 5])
+        self.assertEqual(InventoryService.get_stock_level(first, self.location), 7)
+        self.assertEqual(InventoryService.get_stock_level(second, other_location), 7)
+        self.assertEqual(StockMovement.objects.filter(reference='GRN-1').count(), 3)
+
+
+class InventoryQueryBudgetTests(QueryBudgetMixin, TestCase):
+
+    def seed(self, count):
+        for _ in range(count):
+            index = Brand.objects.count()
+            brand = Brand.objects.create(name=f'Brand {index}')
+            product = Product.objects.create(brand=brand, name=f'SKU {index}', mrp=10, ptr=8, margin=2, weight_gms=100)
+            location = StockLocation.objects.create(name=f'Location {index}')
+            Inventory.objects.create(product=product, location=location, quantity=5)
+            StockMovement.objects.create(product=product, location=location, movement_type='in', quantity=5)
+
+    def test_inventory_list(self):
+        self.assertConstantQueries(self.seed, lambda: self.client.get(reverse('inventory:inventory_list')))
+
+    def test_stock_movement_list(self):
+        self.assertConstantQueries(self.seed, lambda: self.client.get(reverse('inventory:stockmovement_list')))
+
+
+@skipUnlessDBFeature('test_db_allows_multiple_connections')
+class StockReservationStressTests(TransactionTestCase):
+    """
+    Many threads reserve the same products at once, half of them listing the lines
+    in reverse order. Exactly `stock` reservations may succeed and none may deadlock.
+    """
+    threads = 24
+    stock = 10
+
+    def test_concurrent_reservations_never_oversell(self):
+        products, location, customer = _make_catalogue(stock=self.stock)
+        orders = [SalesOrder.objects.create(customer=customer) for _ in range(self.threads)]
+        barrier = threading.Barrier(self.threads)
+        outcomes = []
+
+        def reserve(index):
+            lines = [(product.pk, 1) for product in products]
+            if index % 2:
+                lines.reverse()
+            try:
+                barrier.wait()
+                InventoryService.reserve_stock(orders[index], location, lines)
+                outcomes.append('reserved')
+            except InsufficientStock:
+                outcomes.append('short')
+            except Exception as exc:
+                outcomes.append(exc)
+            finally:
+                connection.close()
+
+        workers = [threading.Thread(target=reserve, args=(i,)) for i in range(self.threads)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+
+        self.assertEqual([o for o in outcomes if o not in ('reserved', 'short')], [])
+        self.assertEqual(outcomes.count('reserved'), self.stock)
+        for product in products:
+            self.assertEqual(InventoryService.get_stock_level(product, location), 0)
+        self.assertEqual(StockReservation.objects.count(), self.stock * len(products))
@@ -1,7 +1,7 @@
 from django.urls import path
 from .views import (
     StockLocationListView, InventoryListView,
-    StockMovementListView, StockMovementCreateView
+    StockMovementListView, StockMovementCreateView, export_stock_movements
 )
 
 app_name = 'inventory'
@@ -11,4 +11,5 @@ urlpatterns = [
     path('inventories/', InventoryListView.as_view(), name='inventory_list'),
     path('movements/', StockMovementListView.as_view(), name='stockmovement_list'),
     path('movements/create/', StockMovementCreateView.as_view(), name='stockmovement_create'),
+    path('movements/export/', export_stock_movements, name='stockmovement_export'),
 ]
@@ -1,6 +1,8 @@
 from django.http import HttpResponseRedirect
 from django.views.generic import ListView, DetailView, CreateView
 from django.urls import reverse_lazy
+from core.pagination import KeysetPaginationMixin
+from core.utils import EXPORT_CHUNK_SIZE, stream_export
 from .models import StockLocation, Inventory, StockMovement
 from .forms import StockMovementForm
 
@@ -16,27 +18,45 @@ class InventoryListView(ListView):
 
     def get_queryset(self):
         # Optionally filter by location from URL query params
+        queryset = super().get_queryset().select_related('product__brand', 'location')
         location_id = self.request.GET.get('location')
         if location_id:
-            return Inventory.objects.filter(location_id=location_id)
-        return super().get_queryset()
+            return queryset.filter(location_id=location_id)
+        return queryset
 
-class StockMovementListView(ListView):
+class StockMovementListView(KeysetPaginationMixin, ListView):
     model = StockMovement
     template_name = 'inventory/stockmovement_list.html'
     context_object_name = 'movements'
     paginate_by = 50
+    keyset_field = 'timestamp'
 
     def get_queryset(self):
-        # Optionally filter by product or location
-        qs = super().get_queryset().order_by('-timestamp')
-        product_id = self.request.GET.get('product')
-        location_id = self.request.GET.get('location')
-        if product_id:
-            qs = qs.filter(product_id=product_id)
-        if location_id:
-            qs = qs.filter(location_id=location_id)
-        return qs
+        qs = super().get_queryset().select_related('product', 'location').order_by('-timestamp')
+        return _filter_movements(qs, self.request.GET)
+
+
+def _filter_movements(queryset, params):
+    """Optionally filter stock movements by ?product= and ?location=."""
+    product_id = params.get('product')
+    location_id = params.get('location')
+    if product_id:
+        queryset = queryset.filter(product_id=product_id)
+    if location_id:
+        queryset = queryset.filter(location_id=location_id)
+    return queryset
+
+
+def export_stock_movements(request):
+    """
+    Streams the stock movements matching the list view's filters as CSV or XLSX (?format=xlsx).
+    """
+    queryset = _filter_movements(StockMovement.objects.order_by('-timestamp', '-pk'), request.GET)
+    rows = queryset.values_list(
+        'pk', 'timestamp', 'product__name', 'location__name', 'movement_type', 'quantity', 'reference', 'notes'
+    ).iterator(chunk_size=EXPORT_CHUNK_SIZE)
+    header = ['Movement ID', 'Timestamp', 'Product', 'Location', 'Type', 'Quantity', 'Reference', 'Notes']
+    return stream_export(request.GET.get('format'), 'stock_movements', header, rows)
 
 class StockMovementCreateView(CreateView):
     model = StockMovement
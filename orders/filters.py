@@ -2,12 +2,12 @@ import django_filters
 from django import forms
 from .models import SalesOrder
 from customers.models import Customer
+from search.backends import get_backend
 
 class OrderFilter(django_filters.FilterSet):
-    # Filter by customer name
+    # Filter by customer name or phone, through the search backend's index
     customer = django_filters.CharFilter(
-        field_name='customer__name', 
-        lookup_expr='icontains',
+        method='filter_customer',
         label='Customer Name',
         widget=forms.TextInput(attrs={'class': 'form-control', 'placeholder': 'Customer Name'})
     )
@@ -34,6 +34,9 @@ class OrderFilter(django_filters.FilterSet):
         widget=forms.TextInput(attrs={'class': 'form-control datepicker', 'placeholder': 'YYYY-MM-DD'})
     )
 
+    def filter_customer(self, queryset, name, value):
+        return queryset.filter(customer_id__in=get_backend().customer_ids(value))
+
     class Meta:
         model = SalesOrder
         # We define all fields explicitly above, so this can be empty
@@ -7,10 +7,11 @@ from products.models import Product
 class SalesOrderForm(forms.ModelForm):
     class Meta:
         model = SalesOrder
-        fields = ['customer', 'status', 'remarks']
+        fields = ['customer', 'status', 'remarks', 'version']
         widgets = {
             'status': forms.Select(),
             'remarks': forms.Textarea(attrs={'rows': 3}),
+            'version': forms.HiddenInput(),
         }
 
 
@@ -0,0 +1,56 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+
+from brands.models import Brand
+from customers.models import Customer, CustomerType
+from orders.services import OrderService
+from products.models import Product
+
+
+class _Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        "Measures queries and wall time of OrderService.create_order for increasing line counts. "
+        "All benchmark data is created inside a transaction that is rolled back."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--lines', default='1,10,50,150,500',
+            help="Comma separated line counts to benchmark (default: 1,10,50,150,500)."
+        )
+
+    def handle(self, *args, **options):
+        line_counts = [int(value) for value in options['lines'].split(',') if value.strip()]
+        results = []
+
+        try:
+            with transaction.atomic():
+                brand = Brand.objects.create(name='__benchmark_brand__')
+                products = Product.objects.bulk_create([
+                    Product(brand=brand, name=f'Benchmark SKU {i}', mrp=100, ptr=80, margin=20, weight_gms=250)
+                    for i in range(max(line_counts))
+                ])
+                customer_type = CustomerType.objects.create(name='__benchmark_type__')
+                customer = Customer.objects.create(name='Benchmark Customer', phone='0', customer_type=customer_type)
+
+                for line_count in line_counts:
+                    items_data = [{'product_id': p.pk, 'quantity': 3} for p in products[:line_count]]
+                    with CaptureQueriesContext(connection) as queries:
+                        started = time.perf_counter()
+                        OrderService.create_order({'customer': customer, 'status': 'pending'}, items_data)
+                        elapsed_ms = (time.perf_counter() - started) * 1000
+                    results.append((line_count, len(queries), elapsed_ms))
+                raise _Rollback
+        except _Rollback:
+            pass
+
+        self.stdout.write(f"{'lines':>8} {'queries':>8} {'ms':>10}")
+        for line_count, query_count, elapsed_ms in results:
+            self.stdout.write(f"{line_count:>8} {query_count:>8} {elapsed_ms:>10.1f}")
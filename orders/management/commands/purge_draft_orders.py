@@ -0,0 +1,19 @@
+import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from orders.services import DraftOrderService
+
+
+class Command(BaseCommand):
+    help = "Deletes draft orders (order wizard carts) that nobody has touched for --days days."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=14, help="Age of the drafts to delete (default: 14).")
+
+    def handle(self, *args, **options):
+        if options['days'] < 0:
+            raise CommandError("--days cannot be negative.")
+        deleted = DraftOrderService.purge(timezone.now() - datetime.timedelta(days=options['days']))
+        self.stdout.write(self.style.SUCCESS(f"Deleted {deleted} draft orders."))
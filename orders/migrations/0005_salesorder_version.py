@@ -0,0 +1,18 @@
+# Generated by Django 5.2.5 on 2026-10-18 09:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0004_salesorder_order_status_created_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='salesorder',
+            name='version',
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
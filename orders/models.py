@@ -1,3 +1,4 @@
+from django.contrib.auth.models import User
 from django.db import models
 from products.models import Product
 from customers.models import Customer
@@ -15,6 +16,15 @@ class SalesOrder(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     total_amount = models.DecimalField(max_digits=10, decimal_places=2, default=0)
     remarks = models.TextField(blank=True)
+    version = models.PositiveIntegerField(default=0)  # bumped by every edit, for optimistic locking
+
+    class Meta:
+        indexes = [
+            # Keyset pagination cursor for OrderListView
+            models.Index(fields=['created_at', 'id'], name='order_created_id_idx'),
+            # Status + date filters: OrderFilter, sales and customer reports
+            models.Index(fields=['status', 'created_at'], name='order_status_created_idx'),
+        ]
 
     def __str__(self):
         return f"Order {self.pk} - {self.customer.name}"
@@ -27,3 +37,40 @@ class OrderItem(models.Model):
 
     def __str__(self):
         return f"{self.product.name} x {self.quantity}"
+
+    @property
+    def line_total(self):
+        return self.price * self.quantity
+
+
+
+class DraftOrder(models.Model):
+    """
+    The cart of the select_customer -> select_products -> confirm_order wizard, kept
+    across requests until it is confirmed. The totals are running sums maintained by
+    DraftOrderService as lines change, not recomputed from the lines.
+    """
+    customer = models.ForeignKey(Customer, on_delete=models.CASCADE, related_name='draft_orders')
+    created_by = models.ForeignKey(User, on_delete=models.CASCADE, null=True, blank=True, related_name='draft_orders')
+    total_amount = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    total_weight = models.PositiveBigIntegerField(default=0)  # grams
+    total_quantity = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Draft {self.pk} - {self.customer_id}"
+
+
+class DraftOrderLine(models.Model):
+    draft = models.ForeignKey(DraftOrder, on_delete=models.CASCADE, related_name='lines')
+    product = models.ForeignKey(Product, on_delete=models.CASCADE)
+    quantity = models.PositiveIntegerField()
+    price = models.DecimalField(max_digits=8, decimal_places=2)  # unit price when the line was added
+    weight_gms = models.PositiveIntegerField()  # unit weight when the line was added
+
+    class Meta:
+        unique_together = ('draft', 'product')
+
+    def __str__(self):
+        return f"{self.product_id} x {self.quantity}"
@@ -1,35 +1,270 @@
-from .models import SalesOrder, OrderItem
+import hashlib
+from decimal import Decimal
+from functools import partial
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+from django.db.models import DecimalField, F, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+from customers.models import Customer
+from customers.services import CustomerSummaryService
+from inventory.models import StockLocation
+from inventory.services import InventoryService
+from pricing.services import PriceService
+from .models import DraftOrder, DraftOrderLine, SalesOrder, OrderItem
 from products.models import Product
 
+ORDER_TOTALS_CACHE_TIMEOUT = 60 * 60
+ORDER_LIST_VERSION_KEY = 'orders:list:version'
+ORDER_LIST_TOTAL_CACHE_TIMEOUT = 10 * 60
+
+
+def _totals_cache_key(order_id):
+    return f"orders:totals:{order_id}"
+
+
+class StaleOrderError(Exception):
+    """
+    Raised when an order was changed by someone else after the editor loaded it.
+    `current_version` is the version the order is at now.
+    """
+    def __init__(self, order_id, current_version):
+        self.order_id = order_id
+        self.current_version = current_version
+        super().__init__(f"Order {order_id} is at version {current_version}; reload it and edit again")
+
+
+class EmptyDraftOrder(Exception):
+    """Raised when confirming a draft order that has no lines."""
+
+
+def _merge_lines(items_data):
+    """
+    Merges repeated products and drops empty lines.
+
+    :return: {product_id: {'quantity': total quantity, 'price': price override or None}}
+    """
+    lines = {}
+    for item in items_data:
+        quantity = int(item['quantity'])
+        if quantity <= 0:
+            continue
+        line = lines.setdefault(int(item['product_id']), {'quantity': 0, 'price': None})
+        line['quantity'] += quantity
+        if item.get('price') is not None:
+            line['price'] = item['price']
+    return lines
+
+
+def _order_customer(order_data, customer_id=None):
+    """The customer to price an order for: the instance in order_data, else loaded by id."""
+    customer = order_data.get('customer')
+    if customer is None:
+        customer = Customer.objects.only('customer_type').get(pk=order_data.get('customer_id', customer_id))
+    return customer
+
 
 class OrderService:
 
     @staticmethod
+    @transaction.atomic
     def create_order(order_data, items_data):
         """
-        Creates a SalesOrder with associated OrderItems.
+        Creates a SalesOrder with associated OrderItems in a single transaction.
+        Runs a fixed number of queries however many lines there are: one product
+        lookup, one INSERT for the order and one bulk INSERT for the items.
+
         :param order_data: dict with SalesOrder fields
-        :param items_data: list of dicts {'product_id': id, 'quantity': qty}
+        :param items_data: list of dicts {'product_id': id, 'quantity': qty},
+                           optionally with 'price' to override the customer's price list
         :return: created SalesOrder instance
+        :raises Product.DoesNotExist: if any product_id is unknown
         """
-        order = SalesOrder.objects.create(**order_data)
+        lines = _merge_lines(items_data)
+        products = Product.objects.in_bulk(lines.keys())
+        missing = set(lines) - set(products)
+        if missing:
+            raise Product.DoesNotExist(f"Unknown product id(s): {sorted(missing)}")
+        unpriced = [product_id for product_id, line in lines.items() if line['price'] is None]
+        prices = PriceService.prices_for(_order_customer(order_data), unpriced) if unpriced else {}
+
+        order_items = []
         total_amount = 0
-        for item in items_data:
-            product = Product.objects.get(pk=item['product_id'])
-            quantity = item['quantity']
-            price = product.mrp  # Or other pricing logic
-            OrderItem.objects.create(
-                order=order,
+        for product_id, line in lines.items():
+            product = products[product_id]
+            price = line['price'] if line['price'] is not None else prices[product_id]
+            order_items.append(OrderItem(
                 product=product,
-                quantity=quantity,
-                price=price * quantity
+                quantity=line['quantity'],
+                price=price  # price per unit at order time
+            ))
+            total_amount += price * line['quantity']
+
+        order = SalesOrder.objects.create(**{**order_data, 'total_amount': total_amount})
+        for order_item in order_items:
+            order_item.order = order
+        OrderItem.objects.bulk_create(order_items)
+        return order
+
+    @staticmethod
+    @transaction.atomic
+    def update_order(order, order_data, items_data, expected_version):
+        """
+        Applies an edit of an order's header and lines in one transaction with a fixed
+        number of queries however many lines change. Submitted lines are diffed against
+        the stored ones: new products are bulk inserted at the customer's list price,
+        changed quantities are bulk updated (keeping the price they were ordered at),
+        and lines that are left out or have quantity 0 are deleted in one statement.
+        The total is then recomputed by the database.
+
+        :param order: SalesOrder being edited
+        :param order_data: dict of header fields to set (customer, status, remarks)
+        :param items_data: the complete list of lines, as for create_order()
+        :param expected_version: SalesOrder.version the edit was based on
+        :return: the refreshed order
+        :raises StaleOrderError: if the order changed since expected_version; resubmitting
+                                 an edit that has already been applied is accepted as a no-op
+        :raises Product.DoesNotExist: if a new line names an unknown product
+        """
+        # Imported here: orders.signals imports this module
+        from .signals import orders_bulk_updated
+
+        fields = {
+            ('customer_id' if name == 'customer' else name): getattr(value, 'pk', value)
+            for name, value in order_data.items()
+        }
+        current = SalesOrder.objects.select_for_update().filter(pk=order.pk).values(
+            'version', 'customer_id', 'created_at', *fields
+        ).first()
+        if current is None:
+            raise SalesOrder.DoesNotExist(f"Order {order.pk} no longer exists")
+
+        lines = _merge_lines(items_data)
+        existing = {item.product_id: item for item in OrderItem.objects.filter(order_id=order.pk)}
+        to_delete = [item.pk for product_id, item in existing.items() if product_id not in lines]
+        to_update = []
+        for product_id, line in lines.items():
+            item = existing.get(product_id)
+            if item is None:
+                continue
+            price = line['price'] if line['price'] is not None else item.price
+            if (item.quantity, item.price) != (line['quantity'], price):
+                item.quantity, item.price = line['quantity'], price
+                to_update.append(item)
+        new_lines = {product_id: line for product_id, line in lines.items() if product_id not in existing}
+        header_changed = any(current[name] != value for name, value in fields.items())
+
+        if current['version'] != expected_version:
+            if header_changed or to_delete or to_update or new_lines:
+                raise StaleOrderError(order.pk, current['version'])
+            # A double submit of an edit that already went through
+            order.refresh_from_db()
+            return order
+
+        products = Product.objects.in_bulk(new_lines.keys())
+        missing = set(new_lines) - set(products)
+        if missing:
+            raise Product.DoesNotExist(f"Unknown product id(s): {sorted(missing)}")
+        unpriced = [product_id for product_id, line in new_lines.items() if line['price'] is None]
+        prices = {}
+        if unpriced:
+            customer = _order_customer(order_data, current['customer_id'])
+            prices = PriceService.prices_for(customer, unpriced)
+        to_create = [
+            OrderItem(
+                order_id=order.pk,
+                product_id=product_id,
+                quantity=line['quantity'],
+                price=line['price'] if line['price'] is not None else prices[product_id],
             )
-            total_amount += price * quantity
+            for product_id, line in new_lines.items()
+        ]
+
+        # Bulk writes skip the OrderItem signals; orders_bulk_updated below stands in for them
+        if to_delete:
+            # _raw_delete issues one DELETE; queryset.delete() would fetch the rows to send post_delete
+            OrderItem.objects.filter(pk__in=to_delete)._raw_delete(OrderItem.objects.db)
+        if to_update:
+            OrderItem.objects.bulk_update(to_update, ['quantity', 'price'])
+        if to_create:
+            OrderItem.objects.bulk_create(to_create)
+
+        if to_delete or to_update or to_create:
+            line_total = OrderItem.objects.filter(order_id=OuterRef('pk')).values('order_id').annotate(
+                total=Sum(F('quantity') * F('price'))
+            ).values('total')
+            zero = Value(Decimal('0'), output_field=DecimalField())
+            fields['total_amount'] = Coalesce(Subquery(line_total), zero, output_field=DecimalField())
+        SalesOrder.objects.filter(pk=order.pk).update(version=F('version') + 1, **fields)
 
-        order.total_amount = total_amount
-        order.save()
+        previous_customer = current['customer_id']
+        new_customer = fields.get('customer_id', previous_customer)
+        if new_customer != previous_customer:
+            CustomerSummaryService.move_order(order.pk, previous_customer, new_customer, current['created_at'])
+
+        transaction.on_commit(partial(OrderService.invalidate_totals, order.pk))
+        orders_bulk_updated.send(sender=SalesOrder, order_ids=[order.pk])
+        order.refresh_from_db()
         return order
 
+    @staticmethod
+    def get_totals(order, use_cache=True):
+        """
+        Returns {'total_quantity', 'total_weight', 'total_value'} for an order,
+        computed with a single aggregate query over its items.
+
+        With use_cache, the result is kept in the default cache until the order's
+        items change (see orders.signals) and memoized on the order instance.
+        """
+        if use_cache and hasattr(order, '_totals'):
+            return order._totals
+
+        key = _totals_cache_key(order.pk)
+        totals = cache.get(key) if use_cache else None
+        if totals is None:
+            totals = OrderItem.objects.filter(order_id=order.pk).aggregate(
+                total_quantity=Sum('quantity', default=0),
+                total_weight=Sum(F('quantity') * F('product__weight_gms'), default=0),
+                total_value=Sum(F('quantity') * F('price'), default=0),
+            )
+            if use_cache:
+                cache.set(key, totals, ORDER_TOTALS_CACHE_TIMEOUT)
+
+        order._totals = totals
+        return totals
+
+    @staticmethod
+    def invalidate_totals(order_id):
+        """Drops cached totals; call after changing items without model signals (bulk writes)."""
+        cache.delete(_totals_cache_key(order_id))
+
+    @staticmethod
+    def get_filtered_total(queryset, filter_key):
+        """
+        Sum of total_amount over a filtered order queryset, cached per filter.
+
+        :param queryset: the filtered SalesOrder queryset
+        :param filter_key: string identifying the filter, e.g. its normalized query string
+        """
+        version = cache.get_or_set(ORDER_LIST_VERSION_KEY, 0, None)
+        digest = hashlib.md5(filter_key.encode()).hexdigest()
+        key = f"orders:list:total:{version}:{digest}"
+        total = cache.get(key)
+        if total is None:
+            total = queryset.aggregate(total=Sum('total_amount'))['total'] or 0
+            cache.set(key, total, ORDER_LIST_TOTAL_CACHE_TIMEOUT)
+        return total
+
+    @staticmethod
+    def invalidate_filtered_totals():
+        """Makes every cached filtered total stale; called whenever an order is written."""
+        try:
+            cache.incr(ORDER_LIST_VERSION_KEY)
+        except ValueError:
+            cache.set(ORDER_LIST_VERSION_KEY, 1, None)
+
     @staticmethod
     def list_orders():
         return SalesOrder.objects.all()
@@ -37,3 +272,148 @@ class OrderService:
     @staticmethod
     def get_order(order_id):
         return SalesOrder.objects.get(pk=order_id)
+
+
+class DraftOrderService:
+    """
+    Keeps a DraftOrder's running totals in step with its lines. Each change adds the
+    difference it makes to the amount, weight and quantity, using the unit price and
+    weight stored on the line, so no change reads the rest of the cart. Lines are priced
+    from the customer's price list (PriceService) when they are added.
+    """
+
+    @staticmethod
+    @transaction.atomic
+    def start(customer, user=None, draft=None):
+        """
+        Starts a draft for `customer`, or moves an existing `draft` and its lines to that
+        customer, repricing the lines from the new customer's price list.
+        """
+        if draft is None:
+            return DraftOrder.objects.create(
+                customer=customer, created_by=user if user is not None and user.is_authenticated else None
+            )
+        changes = {'customer': customer, 'updated_at': timezone.now()}
+        if DraftOrder.objects.select_for_update().filter(pk=draft.pk).exclude(customer=customer).exists():
+            lines = list(DraftOrderLine.objects.filter(draft_id=draft.pk).only('product_id', 'quantity', 'price'))
+            prices = PriceService.prices_for(customer, [line.product_id for line in lines])
+            for line in lines:
+                line.price = prices.get(line.product_id, line.price)
+            DraftOrderLine.objects.bulk_update(lines, ['price'])
+            changes['total_amount'] = sum((line.price * line.quantity for line in lines), Decimal('0'))
+        DraftOrder.objects.filter(pk=draft.pk).update(**changes)
+        for field, value in changes.items():
+            setattr(draft, field, value)
+        return draft
+
+    @staticmethod
+    @transaction.atomic
+    def set_lines(draft, quantities):
+        """
+        Sets the quantity of each product in `quantities`; 0 removes the product's line and
+        products left out keep theirs. Runs a fixed number of queries however many lines change.
+
+        :param quantities: {product_id: quantity}
+        :return: {product_id: DraftOrderLine} of the lines given; removed lines have quantity 0.
+                 `draft` is updated in place with the new totals.
+        :raises ValueError: for a negative quantity
+        :raises Product.DoesNotExist: if a new line names an unknown or inactive product;
+                                      nothing is written then
+        :raises DraftOrder.DoesNotExist: if the draft has been confirmed or deleted
+        """
+        quantities = {int(product_id): int(quantity) for product_id, quantity in quantities.items()}
+        if any(quantity < 0 for quantity in quantities.values()):
+            raise ValueError("Quantities cannot be negative")
+
+        # Locking the draft serialises concurrent changes to the same cart
+        totals = DraftOrder.objects.select_for_update().filter(pk=draft.pk).values(
+            'total_amount', 'total_weight', 'total_quantity'
+        ).first()
+        if totals is None:
+            raise DraftOrder.DoesNotExist(f"Draft order {draft.pk} no longer exists")
+
+        lines = {
+            line.product_id: line
+            for line in DraftOrderLine.objects.filter(draft_id=draft.pk, product_id__in=quantities)
+        }
+        new_ids = [product_id for product_id, quantity in quantities.items() if quantity and product_id not in lines]
+        products = Product.objects.filter(is_active=True).in_bulk(new_ids) if new_ids else {}
+        missing = set(new_ids) - set(products)
+        if missing:
+            raise Product.DoesNotExist(f"Unknown product id(s): {sorted(missing)}")
+        prices = PriceService.prices_for(draft.customer, new_ids) if new_ids else {}
+
+        to_create, to_update, to_delete = [], [], []
+        for product_id, quantity in quantities.items():
+            line = lines.get(product_id)
+            if line is None:
+                if not quantity:
+                    continue
+                product = products[product_id]
+                line = DraftOrderLine(
+                    draft_id=draft.pk, product_id=product_id, quantity=0,
+                    price=prices[product_id], weight_gms=product.weight_gms,
+                )
+                lines[product_id] = line
+                to_create.append(line)
+            elif not quantity:
+                to_delete.append(line.pk)
+            elif quantity != line.quantity:
+                to_update.append(line)
+            change = quantity - line.quantity
+            totals['total_amount'] += change * line.price
+            totals['total_weight'] += change * line.weight_gms
+            totals['total_quantity'] += change
+            line.quantity = quantity
+
+        DraftOrderLine.objects.bulk_create(to_create)
+        DraftOrderLine.objects.bulk_update(to_update, ['quantity'])
+        if to_delete:
+            DraftOrderLine.objects.filter(pk__in=to_delete).delete()
+        DraftOrder.objects.filter(pk=draft.pk).update(updated_at=timezone.now(), **totals)
+        for field, value in totals.items():
+            setattr(draft, field, value)
+        return {product_id: lines[product_id] for product_id in quantities if product_id in lines}
+
+    @staticmethod
+    @transaction.atomic
+    def confirm(draft, remarks=''):
+        """
+        Turns the draft into a pending SalesOrder at the prices its lines were added at,
+        with one read of the lines and create_order()'s bulk insert, and deletes the draft.
+        With settings.ORDER_STOCK_LOCATION set, the order's stock is reserved there in the
+        same transaction.
+
+        :return: the new SalesOrder
+        :raises DraftOrder.DoesNotExist: if the draft was already confirmed (a double submit)
+        :raises EmptyDraftOrder: if the draft has no lines
+        :raises InsufficientStock: if the stock can't cover the order; nothing is written then
+        """
+        customer_id = DraftOrder.objects.select_for_update().filter(pk=draft.pk).values_list(
+            'customer_id', flat=True
+        ).first()
+        if customer_id is None:
+            raise DraftOrder.DoesNotExist(f"Draft order {draft.pk} no longer exists")
+        lines = list(DraftOrderLine.objects.filter(draft_id=draft.pk).values('product_id', 'quantity', 'price'))
+        if not lines:
+            raise EmptyDraftOrder(f"Draft order {draft.pk} has no lines")
+
+        order = OrderService.create_order(
+            {'customer_id': customer_id, 'status': 'pending', 'remarks': remarks}, lines
+        )
+        if settings.ORDER_STOCK_LOCATION:
+            location = StockLocation.objects.get(name=settings.ORDER_STOCK_LOCATION)
+            InventoryService.reserve_stock(order, location, [(line['product_id'], line['quantity']) for line in lines])
+        DraftOrder.objects.filter(pk=draft.pk).delete()
+        return order
+
+    @staticmethod
+    def purge(before):
+        """
+        Deletes abandoned drafts.
+
+        :param before: drafts last changed before this datetime are deleted
+        :return: number of drafts deleted
+        """
+        _total, per_model = DraftOrder.objects.filter(updated_at__lt=before).delete()
+        return per_model.get(DraftOrder._meta.label, 0)
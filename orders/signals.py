@@ -0,0 +1,27 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import Signal, receiver
+
+from .models import OrderItem, SalesOrder
+from .services import OrderService
+
+# Sent by code that changes orders with queryset.update() / bulk_create(), which skip the
+# model signals. Receivers get `order_ids`.
+orders_bulk_updated = Signal()
+
+
+@receiver(post_save, sender=OrderItem)
+@receiver(post_delete, sender=OrderItem)
+def invalidate_order_totals(sender, instance, **kwargs):
+    OrderService.invalidate_totals(instance.order_id)
+
+
+@receiver(post_save, sender=SalesOrder)
+@receiver(post_delete, sender=SalesOrder)
+def invalidate_order_list_totals(sender, **kwargs):
+    transaction.on_commit(OrderService.invalidate_filtered_totals)
+
+
+@receiver(orders_bulk_updated)
+def invalidate_bulk_order_list_totals(sender, order_ids, **kwargs):
+    transaction.on_commit(OrderService.invalidate_filtered_totals)
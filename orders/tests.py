@@ -1,3 +1,357 @@
-from django.test import TestCase
+from decimal import Decimal
 
-# Create your tests here.
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from billing.models import Invoice
+from brands.models import Brand
+from core.testing import QueryBudgetMixin
+from customers.models import Customer, CustomerSummary, CustomerType
+from inventory.models import Inventory, StockLocation
+from inventory.services import InsufficientStock
+from pricing.services import PriceService
+from products.models import Product
+from .models import DraftOrder, DraftOrderLine, OrderItem, SalesOrder
+from .services import DraftOrderService, EmptyDraftOrder, OrderService, StaleOrderError
+from .views import DRAFT_SESSION_KEY
+
+
+class CreateOrderTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        brand = Brand.objects.create(name='Brand')
+        cls.products = Product.objects.bulk_create([
+            Product(brand=brand, name=f'SKU {i}', mrp=100, ptr=80, margin=20, weight_gms=250)
+            for i in range(150)
+        ])
+        customer_type = CustomerType.objects.create(name='Retail')
+        cls.customer = Customer.objects.create(name='Customer', phone='1', customer_type=customer_type)
+
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+
+    def _create(self, line_count):
+        items_data = [{'product_id': p.pk, 'quantity': 2} for p in self.products[:line_count]]
+        with CaptureQueriesContext(connection) as queries:
+            order = OrderService.create_order({'customer': self.customer}, items_data)
+        return order, len(queries)
+
+    def test_totals_and_unit_prices(self):
+        order, _ = self._create(3)
+        self.assertEqual(order.total_amount, 3 * 2 * 80)
+        self.assertEqual(set(order.items.values_list('price', flat=True)), {80})
+
+    def test_query_count_does_not_grow_with_lines(self):
+        PriceService.prices_for(self.customer)
+        _, small = self._create(1)
+        _, large = self._create(150)
+        self.assertEqual(small, large)
+        self.assertEqual(OrderItem.objects.count(), 151)
+
+    def test_unknown_product_writes_nothing(self):
+        with self.assertRaises(Product.DoesNotExist):
+            OrderService.create_order({'customer': self.customer}, [{'product_id': 0, 'quantity': 1}])
+        self.assertFalse(self.customer.salesorder_set.exists())
+
+
+class UpdateOrderTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        brand = Brand.objects.create(name='Brand')
+        cls.products = Product.objects.bulk_create([
+            Product(brand=brand, name=f'SKU {i}', mrp=100, ptr=80, margin=20, weight_gms=250)
+            for i in range(120)
+        ])
+        customer_type = CustomerType.objects.create(name='Retail')
+        cls.customer = Customer.objects.create(name='Customer', phone='1', customer_type=customer_type)
+        cls.other_customer = Customer.objects.create(name='Other', phone='2', customer_type=customer_type)
+
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+
+    def _order(self, products):
+        return OrderService.create_order(
+            {'customer': self.customer}, [{'product_id': p.pk, 'quantity': 1} for p in products]
+        )
+
+    def _lines(self, products, quantity):
+        return [{'product_id': p.pk, 'quantity': quantity} for p in products]
+
+    def test_diff_keeps_prices_and_recomputes_total(self):
+        order = self._order(self.products[:3])
+        OrderItem.objects.filter(order=order, product=self.products[0]).update(price=50)
+        product = self.products[3]
+        product.ptr = 90
+        with self.captureOnCommitCallbacks(execute=True):
+            product.save()
+
+        lines = self._lines(self.products[:1], 4) + self._lines(self.products[2:4], 2)
+        order = OrderService.update_order(order, {'status': 'confirmed'}, lines, expected_version=0)
+
+        self.assertEqual(
+            dict(order.items.values_list('product_id', 'price')),
+            {self.products[0].pk: 50, self.products[2].pk: 80, self.products[3].pk: 90},
+        )
+        self.assertEqual(order.total_amount, 4 * 50 + 2 * 80 + 2 * 90)
+        self.assertEqual((order.status, order.version), ('confirmed', 1))
+
+    def test_query_count_does_not_grow_with_changed_lines(self):
+        def edit(count):
+            order = self._order(self.products[:count])
+            lines = self._lines(self.products[:count // 2], 3) + self._lines(self.products[count:2 * count], 1)
+            with CaptureQueriesContext(connection) as queries:
+                OrderService.update_order(order, {}, lines, expected_version=0)
+            self.assertEqual(order.items.count(), count // 2 + count)
+            return len(queries)
+
+        self.assertEqual(edit(4), edit(60))
+
+    def test_stale_edit_is_rejected_but_a_repeat_is_accepted(self):
+        order = self._order(self.products[:2])
+        lines = self._lines(self.products[:1], 5)
+        OrderService.update_order(order, {}, lines, expected_version=0)
+
+        # Resubmitting the same edit succeeds without writing anything
+        with CaptureQueriesContext(connection) as queries:
+            order = OrderService.update_order(order, {}, lines, expected_version=0)
+        self.assertEqual(order.version, 1)
+        self.assertFalse([q for q in queries if q['sql'].startswith(('UPDATE', 'INSERT', 'DELETE'))])
+        with self.assertRaises(StaleOrderError) as raised:
+            OrderService.update_order(order, {}, self._lines(self.products[:1], 6), expected_version=0)
+        self.assertEqual(raised.exception.current_version, 1)
+        self.assertEqual(list(order.items.values_list('quantity', flat=True)), [5])
+
+    def test_changing_customer_moves_the_invoiced_amounts(self):
+        order = self._order(self.products[:2])
+        Invoice.objects.create(order=order, invoice_number='INV-1', total=160, amount_paid=60)
+        OrderService.update_order(order, {'customer': self.other_customer}, self._lines(self.products[:2], 1), 0)
+
+        previous, moved = CustomerSummary.objects.get(pk=self.customer.pk), CustomerSummary.objects.get(pk=self.other_customer.pk)
+        self.assertEqual((previous.lifetime_sales, previous.outstanding, previous.last_order_at), (0, 0, None))
+        self.assertEqual((moved.lifetime_sales, moved.outstanding, moved.last_order_at), (160, 100, order.created_at))
+
+    def test_update_view_reports_stale_edits(self):
+        order = self._order(self.products[:1])
+        data = {
+            'customer': self.customer.pk, 'status': 'pending', 'remarks': '', 'version': 0,
+            'items-TOTAL_FORMS': 1, 'items-INITIAL_FORMS': 1, 'items-MIN_NUM_FORMS': 0, 'items-MAX_NUM_FORMS': 1000,
+            'items-0-id': order.items.get().pk, 'items-0-order': order.pk,
+            'items-0-product': self.products[0].pk, 'items-0-quantity': 7,
+        }
+        url = reverse('orders:order-edit', args=[order.pk])
+        self.assertRedirects(self.client.post(url, data), reverse('orders:list'))
+        self.assertEqual(order.items.get().quantity, 7)
+
+        data['items-0-quantity'] = 9
+        response = self.client.post(url, data)
+        self.assertContains(response, 'changed by someone else')
+        self.assertEqual(order.items.get().quantity, 7)
+
+    def test_create_view_ignores_a_posted_version(self):
+        data = {
+            'customer': self.customer.pk, 'status': 'pending', 'remarks': '', 'version': 41,
+            'items-TOTAL_FORMS': 1, 'items-INITIAL_FORMS': 0, 'items-MIN_NUM_FORMS': 0, 'items-MAX_NUM_FORMS': 1000,
+            'items-0-product': self.products[0].pk, 'items-0-quantity': 2,
+        }
+        self.assertRedirects(self.client.post(reverse('orders:create'), data), reverse('orders:list'))
+        self.assertEqual(SalesOrder.objects.get().version, 0)
+
+    def test_edit_order_requires_a_version(self):
+        order = self._order(self.products[:1])
+        data = {
+            'status': 'confirmed',
+            'form-TOTAL_FORMS': 1, 'form-INITIAL_FORMS': 1, 'form-MIN_NUM_FORMS': 0, 'form-MAX_NUM_FORMS': 1000,
+            'form-0-id': order.items.get().pk, 'form-0-product': self.products[0].pk, 'form-0-quantity': 5,
+        }
+        url = reverse('orders:order_edit', args=[order.pk])
+        for version in (None, '', 'abc'):
+            response = self.client.post(url, data if version is None else {**data, 'version': version})
+            self.assertEqual(response.status_code, 400)
+        order.refresh_from_db()
+        self.assertEqual((order.status, order.version, order.items.get().quantity), ('pending', 0, 1))
+
+        self.assertRedirects(
+            self.client.post(url, {**data, 'version': 0}), reverse('orders:detail', args=[order.pk])
+        )
+        self.assertEqual(order.items.get().quantity, 5)
+
+
+class OrderListQueryBudgetTests(QueryBudgetMixin, TestCase):
+
+    def test_order_list(self):
+        customer_type = CustomerType.objects.create(name='Retail')
+
+        def seed(count):
+            for i in range(count):
+                customer = Customer.objects.create(name=f'Customer {i}', phone='1', customer_type=customer_type)
+                SalesOrder.objects.create(customer=customer, total_amount=10)
+
+        self.assertConstantQueries(seed, lambda: self.client.get(reverse('orders:list')))
+
+
+class OrderTotalsTests(QueryBudgetMixin, TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+
+    @classmethod
+    def setUpTestData(cls):
+        brand = Brand.objects.create(name='Brand')
+        cls.product = Product.objects.create(brand=brand, name='SKU', mrp=10, ptr=8, margin=2, weight_gms=250)
+        customer_type = CustomerType.objects.create(name='Retail')
+        cls.customer = Customer.objects.create(name='Customer', phone='1', customer_type=customer_type)
+
+    def test_totals_are_invalidated_when_items_change(self):
+        order = OrderService.create_order({'customer': self.customer}, [{'product_id': self.product.pk, 'quantity': 2}])
+        totals = OrderService.get_totals(SalesOrder.objects.get(pk=order.pk))
+        self.assertEqual((totals['total_quantity'], totals['total_weight'], totals['total_value']), (2, 500, 16))
+
+        OrderItem.objects.create(order=order, product=self.product, quantity=1, price=8)
+        totals = OrderService.get_totals(SalesOrder.objects.get(pk=order.pk))
+        self.assertEqual((totals['total_quantity'], totals['total_weight'], totals['total_value']), (3, 750, 24))
+
+    def test_detail_pages(self):
+        order = SalesOrder.objects.create(customer=self.customer)
+
+        def seed(count):
+            OrderItem.objects.bulk_create([
+                OrderItem(
+                    order=order,
+                    product=Product.objects.create(brand=self.product.brand, name='SKU', mrp=10, ptr=8, margin=2, weight_gms=100),
+                    quantity=1,
+                    price=8,
+                )
+                for _ in range(count)
+            ])
+            OrderService.invalidate_totals(order.pk)
+
+        self.assertConstantQueries(seed, lambda: self.client.get(reverse('orders:detail', args=[order.pk])))
+        self.assertConstantQueries(seed, lambda: self.client.get(reverse('orders:order_success', args=[order.pk])))
+
+
+class DraftOrderTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        brand = Brand.objects.create(name='Brand')
+        cls.products = Product.objects.bulk_create([
+            Product(brand=brand, name=f'SKU {i}', mrp=100, ptr=80, margin=20, weight_gms=250)
+            for i in range(60)
+        ])
+        customer_type = CustomerType.objects.create(name='Retail')
+        cls.customer = Customer.objects.create(name='Customer', phone='1', customer_type=customer_type)
+
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+
+    def _totals(self, draft):
+        draft.refresh_from_db()
+        return draft.total_amount, draft.total_weight, draft.total_quantity
+
+    def test_running_totals(self):
+        first, second, third = self.products[:3]
+        draft = DraftOrderService.start(self.customer)
+
+        DraftOrderService.set_lines(draft, {first.pk: 2, second.pk: 1})
+        Product.objects.filter(pk=first.pk).update(ptr=90)
+        lines = DraftOrderService.set_lines(draft, {first.pk: 5, second.pk: 0, third.pk: 1})
+
+        self.assertEqual(self._totals(draft), (Decimal('480'), 1500, 6))
+        self.assertEqual(lines[first.pk].price, 80)  # kept from when the line was added
+        self.assertEqual(lines[second.pk].quantity, 0)
+        self.assertEqual(
+            sorted(draft.lines.values_list('product_id', 'quantity')), [(first.pk, 5), (third.pk, 1)]
+        )
+
+        with self.assertRaises(Product.DoesNotExist):
+            DraftOrderService.set_lines(draft, {first.pk: 1, 0: 1})
+        self.assertEqual(self._totals(draft), (Decimal('480'), 1500, 6))
+
+    def test_query_count_does_not_grow_with_lines(self):
+        def set_lines(count):
+            draft = DraftOrderService.start(self.customer)
+            DraftOrderService.set_lines(draft, {product.pk: 1 for product in self.products[count:]})
+            with CaptureQueriesContext(connection) as queries:
+                DraftOrderService.set_lines(draft, {
+                    **{product.pk: 2 for product in self.products[:count]},
+                    **{product.pk: 0 for product in self.products[count:2 * count]},
+                })
+            return len(queries)
+
+        self.assertEqual(set_lines(1), set_lines(20))
+
+    def test_confirm_writes_the_order_and_deletes_the_draft(self):
+        draft = DraftOrderService.start(self.customer)
+        DraftOrderService.set_lines(draft, {product.pk: 3 for product in self.products[:10]})
+        Product.objects.update(ptr=95)
+
+        order = DraftOrderService.confirm(draft, remarks='Deliver before 10')
+
+        self.assertEqual((order.customer_id, order.status, order.total_amount), (self.customer.pk, 'pending', 2400))
+        self.assertEqual(set(order.items.values_list('price', flat=True)), {80})
+        self.assertFalse(DraftOrder.objects.exists())
+        self.assertFalse(DraftOrderLine.objects.exists())
+        with self.assertRaises(DraftOrder.DoesNotExist):
+            DraftOrderService.confirm(draft)
+        with self.assertRaises(EmptyDraftOrder):
+            DraftOrderService.confirm(DraftOrderService.start(self.customer))
+
+    @override_settings(ORDER_STOCK_LOCATION='Warehouse')
+    def test_confirm_reserves_stock(self):
+        first, second = self.products[:2]
+        location = StockLocation.objects.create(name='Warehouse')
+        Inventory.objects.create(product=first, location=location, quantity=10)
+        Inventory.objects.create(product=second, location=location, quantity=1)
+
+        draft = DraftOrderService.start(self.customer)
+        DraftOrderService.set_lines(draft, {first.pk: 4, second.pk: 2})
+        with self.assertRaises(InsufficientStock) as raised:
+            DraftOrderService.confirm(draft)
+        self.assertEqual(raised.exception.product_ids, [second.pk])
+        self.assertFalse(SalesOrder.objects.exists())
+        self.assertTrue(DraftOrder.objects.filter(pk=draft.pk).exists())
+
+        DraftOrderService.set_lines(draft, {second.pk: 1})
+        order = DraftOrderService.confirm(draft)
+        self.assertEqual(
+            sorted(order.stock_reservations.values_list('product_id', 'quantity')), [(first.pk, 4), (second.pk, 1)]
+        )
+        self.assertEqual(
+            dict(Inventory.objects.values_list('product_id', 'quantity')), {first.pk: 6, second.pk: 0}
+        )
+
+    def test_wizard(self):
+        first, second = self.products[:2]
+        self.client.post(reverse('orders:select_customer'), {'customer': self.customer.pk})
+        draft_id = self.client.session[DRAFT_SESSION_KEY]
+
+        response = self.client.post(reverse('orders:update_draft_line'), {'product': first.pk, 'quantity': 4})
+        self.assertEqual(response.json(), {
+            'product': first.pk, 'quantity': 4, 'line_amount': '320.00',
+            'totals': {'amount': '320.00', 'weight': 1000, 'quantity': 4},
+        })
+        response = self.client.post(reverse('orders:update_draft_line'), {'product': second.pk, 'quantity': -1})
+        self.assertEqual(response.status_code, 400)
+
+        response = self.client.get(reverse('orders:select_products'))
+        self.assertContains(response, f'name="product_{first.pk}"')
+        self.assertEqual(response.context['quantities'], {str(first.pk): 4})
+
+        response = self.client.get(reverse('orders:confirm_order'))
+        self.assertEqual(response.context['grand_total_amount'], 320)
+
+        response = self.client.post(reverse('orders:confirm_order'))
+        order = SalesOrder.objects.get(customer=self.customer)
+        self.assertRedirects(response, reverse('orders:order_success', args=[order.pk]))
+        self.assertEqual(order.total_amount, 320)
+        self.assertNotIn(DRAFT_SESSION_KEY, self.client.session)
+        self.assertFalse(DraftOrder.objects.filter(pk=draft_id).exists())
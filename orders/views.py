@@ -1,25 +1,37 @@
+from decimal import Decimal
+
+from django.contrib import messages
+from django.http import HttpResponseBadRequest, JsonResponse
 from django.shortcuts import get_object_or_404, redirect, render
 from django.views import View
+from django.views.decorators.http import require_POST
 from django.views.generic import ListView, DetailView
 from django.urls import reverse_lazy
-from django.db.models import Sum 
+from django.db.models import Prefetch
 from customers.forms import SelectCustomerForm
 from customers.models import Customer
+from core.pagination import KeysetPaginationMixin
+from core.utils import EXPORT_CHUNK_SIZE, stream_export
+from inventory.services import InsufficientStock
 from orders.filters import OrderFilter
 from products.forms import SelectProductsForm
 from products.models import Product
-from .models import OrderItem, SalesOrder
+from pricing.services import PriceService
+from products.services import CatalogueService
+from .models import DraftOrder, OrderItem, SalesOrder
 from .forms import ConfirmOrderForm, SalesOrderForm, OrderItemFormSet
+from .services import DraftOrderService, EmptyDraftOrder, OrderService, StaleOrderError
 
 
-class OrderListView(ListView):
+class OrderListView(KeysetPaginationMixin, ListView):
     model = SalesOrder
     template_name = 'orders/order_list.html'
     context_object_name = 'orders'
     paginate_by = 20
+    keyset_field = 'created_at'
 
     def get_queryset(self):
-        queryset = super().get_queryset().order_by('-created_at')
+        queryset = super().get_queryset().select_related('customer').order_by('-created_at')
         self.filterset = OrderFilter(self.request.GET, queryset=queryset)
         return self.filterset.qs
 
@@ -27,14 +39,30 @@ class OrderListView(ListView):
         context = super().get_context_data(**kwargs)
         context['filter'] = self.filterset
         
-        # --- Add this line to calculate the sum of the filtered queryset ---
-        context['total_amount_sum'] = self.filterset.qs.aggregate(
-            total=Sum('total_amount')
-        )['total'] or 0
+        # Sum of the filtered queryset, computed once per filter and cached
+        context['total_amount_sum'] = OrderService.get_filtered_total(
+            self.filterset.qs, context['cursor_query']
+        )
 
         return context
 
 
+def export_orders(request):
+    """
+    Streams the orders matching the list view's filters as CSV or XLSX (?format=xlsx).
+    """
+    filterset = OrderFilter(request.GET, queryset=SalesOrder.objects.order_by('-created_at', '-pk'))
+    rows = filterset.qs.values_list(
+        'pk', 'created_at', 'customer__name', 'customer__phone', 'status', 'total_amount'
+    ).iterator(chunk_size=EXPORT_CHUNK_SIZE)
+    header = ['Order ID', 'Created At', 'Customer', 'Phone', 'Status', 'Total Amount']
+    return stream_export(request.GET.get('format'), 'orders', header, rows)
+
+
+# The order header fields a form may set; version is only ever compared, never written
+ORDER_HEADER_FIELDS = ('customer', 'status', 'remarks')
+
+
 class OrderCreateView(View):
     template_name = 'orders/order_form.html'
 
@@ -50,20 +78,13 @@ class OrderCreateView(View):
         order_form = SalesOrderForm(request.POST)
         formset = OrderItemFormSet(request.POST)
         if order_form.is_valid() and formset.is_valid():
-            order = order_form.save(commit=False)
-            order.total_amount = 0  # will calculate shortly
-            order.save()
-
-            total = 0
-            instances = formset.save(commit=False)
-            for item in instances:
-                item.order = order
-                item.price = item.product.ptr * item.quantity
-                item.save()
-                total += item.price
-
-            order.total_amount = total
-            order.save()
+            items_data = [
+                {'product_id': item.product_id, 'quantity': item.quantity}
+                for item in formset.save(commit=False)
+            ]
+            OrderService.create_order(
+                {field: order_form.cleaned_data[field] for field in ORDER_HEADER_FIELDS}, items_data
+            )
 
             return redirect('orders:list')
 
@@ -78,27 +99,35 @@ class OrderDetailView(DetailView):
     template_name = 'orders/order_detail.html'
     context_object_name = 'order'
 
+    def get_queryset(self):
+        return super().get_queryset().select_related('customer').prefetch_related(
+            Prefetch('items', queryset=OrderItem.objects.select_related('product'))
+        )
+
     def get_context_data(self, **kwargs):
         # Call the base implementation first to get a context
         context = super().get_context_data(**kwargs)
 
-        # Get the order object from the context
-        order = context['order']
-
-        # Calculate totals for the table footer
-        total_weight = 0
-        total_quantity = 0
-        for item in order.items.all():
-            total_weight += (item.product.weight_gms * item.quantity)
-            total_quantity += item.quantity
+        # Totals for the table footer come from one aggregate query
+        totals = OrderService.get_totals(context['order'])
+        context['total_weight'] = totals['total_weight']
+        context['total_quantity'] = totals['total_quantity']
 
-        # Add the calculated totals to the context
-        context['total_weight'] = total_weight
-        context['total_quantity'] = total_quantity
-        
         return context
 
 
+STALE_ORDER_MESSAGE = "This order was changed by someone else while you were editing it. Reload it and make your changes again."
+
+
+def _submitted_lines(formset):
+    """The lines an item formset describes: every filled-in form not marked for deletion."""
+    return [
+        {'product_id': form.cleaned_data['product'].pk, 'quantity': form.cleaned_data['quantity']}
+        for form in formset.forms
+        if form.cleaned_data.get('product') and not form.cleaned_data.get('DELETE')
+    ]
+
+
 class OrderUpdateView(View):
     template_name = 'orders/order_form.html'
     success_url = reverse_lazy('orders:list')
@@ -118,29 +147,18 @@ class OrderUpdateView(View):
         formset = OrderItemFormSet(request.POST, instance=order)
 
         if order_form.is_valid() and formset.is_valid():
-            saved_order = order_form.save(commit=False)
-            formset.instance = saved_order
-
-            # Save formset but do not commit DB write inside formset.save()
-            order_items = formset.save(commit=False)
-
-            # Delete items marked for deletion
-            for obj in formset.deleted_objects:
-                obj.delete()
-
-            # Save/update each formset item and calculate total
-            total_amount = 0
-            for item in order_items:
-                item.order = saved_order
-                item.price = item.product.ptr * item.quantity
-                item.save()
-                total_amount += item.price
-
-            # Save order with updated total
-            saved_order.total_amount = total_amount
-            saved_order.save()
-
-            return redirect(self.success_url)
+            try:
+                # Diffs the submitted lines against the stored ones and writes them in bulk
+                OrderService.update_order(
+                    order,
+                    {field: order_form.cleaned_data[field] for field in ORDER_HEADER_FIELDS},
+                    _submitted_lines(formset),
+                    order_form.cleaned_data['version'],
+                )
+            except StaleOrderError:
+                order_form.add_error(None, STALE_ORDER_MESSAGE)
+            else:
+                return redirect(self.success_url)
 
         # If form is invalid, re-render with errors for correction
         return render(request, self.template_name, {
@@ -150,121 +168,150 @@ class OrderUpdateView(View):
 
 from django.shortcuts import render, redirect
 
+DRAFT_SESSION_KEY = 'draft_order_id'
+NO_LINES_MESSAGE = "Please select at least one product with quantity."
+
+
+def _session_draft(request):
+    """The wizard's DraftOrder, or None if there is none (or it was confirmed meanwhile)."""
+    draft_id = request.session.get(DRAFT_SESSION_KEY)
+    if draft_id is None:
+        return None
+    return DraftOrder.objects.select_related('customer').filter(pk=draft_id).first()
+
+
 # Step 1: Select Customer
 def select_customer(request):
     if request.method == 'POST':
         customer_id = request.POST.get('customer')
-        if customer_id:
-            request.session['customer_id'] = customer_id
+        customer = Customer.objects.filter(pk=customer_id).first() if customer_id and customer_id.isdigit() else None
+        if customer:
+            # Changing the customer keeps the products already in the cart
+            draft = DraftOrderService.start(customer, request.user, _session_draft(request))
+            request.session[DRAFT_SESSION_KEY] = draft.pk
             return redirect('orders:select_products')
-    customers = Customer.objects.all()
-    return render(request, 'orders/select_customer.html', {'customers': customers})
+    # Customers are looked up as you type (search:customers) instead of listing them all
+    return render(request, 'orders/select_customer.html')
 
 # Step 2: Select Products by Brand with quantities
 def select_products(request):
-    if 'customer_id' not in request.session:
+    draft = _session_draft(request)
+    if draft is None:
         return redirect('orders:select_customer')
 
+    error = None
     if request.method == 'POST':
-        selected_products = {}
+        # Without JavaScript the whole grid is posted; with it, lines are already saved one by one
+        quantities = {}
         for key, val in request.POST.items():
             if key.startswith('product_') and val.isdigit():
-                qty = int(val)
-                if qty > 0:
-                    prod_id = key.split('_')[1]
-                    selected_products[prod_id] = qty
-        if not selected_products:
-            error = "Please select at least one product with quantity."
-            # Reload product data for rendering with error
-            products_by_brand = {}
-            for p in Product.objects.filter(is_active=True).order_by('brand', 'name'):
-                products_by_brand.setdefault(p.brand, []).append(p)
-            return render(request, 'orders/select_products.html', {'products_by_brand': products_by_brand, 'error': error})
-
-        request.session['selected_products'] = selected_products
-        return redirect('orders:confirm_order')
-
-    products_by_brand = {}
-    for product in Product.objects.filter(is_active=True).order_by('brand', 'name'):
-        products_by_brand.setdefault(product.brand, []).append(product)
-    return render(request, 'orders/select_products.html', {'products_by_brand': products_by_brand})
+                quantities[key.split('_')[1]] = int(val)
+        try:
+            DraftOrderService.set_lines(draft, quantities)
+        except Product.DoesNotExist:
+            error = "Some products are no longer available; please review the quantities."
+        else:
+            if draft.total_quantity:
+                return redirect('orders:confirm_order')
+            error = NO_LINES_MESSAGE
+
+    context = {
+        # Brand-grouped snapshot served from the catalogue cache
+        'products_by_brand': CatalogueService.products_by_brand(),
+        'draft': draft,
+        # The customer's price for every product: one cached matrix lookup
+        'prices': {str(product_id): price for product_id, price in PriceService.prices_for(draft.customer).items()},
+        'quantities': {str(product_id): quantity for product_id, quantity in draft.lines.values_list('product_id', 'quantity')},
+        'error': error,
+    }
+    return render(request, 'orders/select_products.html', context)
+
+
+@require_POST
+def update_draft_line(request):
+    """
+    Sets one product's quantity in the wizard's cart (POST product, quantity) and returns
+    the line and cart totals as JSON, so the product grid saves as it is typed into.
+    """
+    draft = _session_draft(request)
+    if draft is None:
+        return JsonResponse({'error': "The order has expired; start again."}, status=404)
+    try:
+        product_id = int(request.POST.get('product', ''))
+        quantity = int(request.POST.get('quantity', ''))
+        lines = DraftOrderService.set_lines(draft, {product_id: quantity})
+    except (ValueError, Product.DoesNotExist, DraftOrder.DoesNotExist):
+        return JsonResponse({'error': "Invalid product or quantity."}, status=400)
+
+    line = lines.get(product_id)
+    return JsonResponse({
+        'product': product_id,
+        'quantity': quantity,
+        'line_amount': line.price * quantity if line else Decimal('0.00'),
+        'totals': {
+            'amount': draft.total_amount,
+            'weight': draft.total_weight,
+            'quantity': draft.total_quantity,
+        },
+    })
 
 # Step 3: Confirm Order
 def confirm_order(request):
-    if 'customer_id' not in request.session or 'selected_products' not in request.session:
+    draft = _session_draft(request)
+    if draft is None:
         return redirect('orders:select_customer')
 
-    customer = get_object_or_404(Customer, pk=request.session['customer_id'])
-    selected_products_data = request.session['selected_products']
-    products = Product.objects.filter(id__in=selected_products_data.keys())
-
-    # --- Prepare data for the template ---
-    order_items = []
-    grand_total_amount = 0
-    grand_total_weight = 0
-    grand_total_quantity = 0
-
-    for product in products:
-        quantity = int(selected_products_data.get(str(product.id), 0))
-        if quantity > 0:
-            total_price = product.ptr * quantity
-            total_weight = product.weight_gms * quantity
-
-            order_items.append({
-                'product': product,
-                'quantity': quantity,
-                'total_price': total_price,
-                'total_weight': total_weight,
-            })
-            grand_total_amount += total_price
-            grand_total_weight += total_weight
-            grand_total_quantity += quantity
-
     if request.method == 'POST':
-        # Create the SalesOrder first
-        order = SalesOrder.objects.create(
-            customer=customer, 
-            status='pending', 
-            total_amount=grand_total_amount,
-            remarks=''
-        )
-        
-        # Create OrderItem for each item in the prepared list
-        for item_data in order_items:
-            OrderItem.objects.create(
-                order=order, 
-                product=item_data['product'], 
-                quantity=item_data['quantity'], 
-                price=item_data['product'].ptr # Save price per unit
-            )
-
-        # Clear session data
-        request.session.pop('customer_id', None)
-        request.session.pop('selected_products', None)
-
+        try:
+            order = DraftOrderService.confirm(draft)
+        except DraftOrder.DoesNotExist:
+            return redirect('orders:select_customer')
+        except EmptyDraftOrder:
+            messages.error(request, NO_LINES_MESSAGE)
+            return redirect('orders:select_products')
+        except InsufficientStock as error:
+            names = Product.objects.filter(pk__in=error.product_ids).values_list('name', flat=True)
+            messages.error(request, f"Not enough stock for: {', '.join(names)}. Please reduce the quantities.")
+            return redirect('orders:select_products')
+        request.session.pop(DRAFT_SESSION_KEY, None)
         return redirect('orders:order_success', pk=order.pk)
 
+    # Totals are the draft's running sums; only the lines themselves are read
+    order_items = [
+        {
+            'product': line.product,
+            'quantity': line.quantity,
+            'price': line.price,
+            'total_price': line.price * line.quantity,
+            'total_weight': line.weight_gms * line.quantity,
+        }
+        for line in draft.lines.select_related('product').order_by('pk')
+    ]
+    if not order_items:
+        messages.error(request, NO_LINES_MESSAGE)
+        return redirect('orders:select_products')
+
     context = {
-        'customer': customer,
+        'customer': draft.customer,
         'order_items': order_items,
-        'grand_total_amount': grand_total_amount,
-        'grand_total_weight': grand_total_weight,
-        'grand_total_quantity': grand_total_quantity,
+        'grand_total_amount': draft.total_amount,
+        'grand_total_weight': draft.total_weight,
+        'grand_total_quantity': draft.total_quantity,
     }
     return render(request, 'orders/confirm_order.html', context)
 
 # Order creation success page
 def order_success(request, pk):
-    order = get_object_or_404(SalesOrder, pk=pk)
-
-    # Calculate total weight for the summary
-    total_weight = 0
-    for item in order.items.all():
-        total_weight += (item.product.weight_gms * item.quantity)
+    order = get_object_or_404(
+        SalesOrder.objects.select_related('customer').prefetch_related(
+            Prefetch('items', queryset=OrderItem.objects.select_related('product'))
+        ),
+        pk=pk
+    )
 
     context = {
         'order': order,
-        'total_weight': total_weight,
+        'total_weight': OrderService.get_totals(order)['total_weight'],
     }
     return render(request, 'orders/order_success.html', context)
 
@@ -288,24 +335,20 @@ def edit_order(request, pk):
     if request.method == 'POST':
         formset = OrderItemFormSet(request.POST, queryset=order.items.all())
         
+        version = request.POST.get('version', '')
+        if not version.isdigit():
+            return HttpResponseBadRequest("The order version is missing; reload the order and edit it again.")
         if formset.is_valid():
-            instances = formset.save(commit=False)
-            
-            for instance in instances:
-                # This ensures newly added items are linked to the current order
-                if not instance.order_id:
-                    instance.order = order
-                # Set the price per unit at the time of saving
-                instance.price = instance.product.ptr
-                instance.save()
-            
-            for obj in formset.deleted_objects:
-                obj.delete()
-
-            order.total_amount = sum(item.price * item.quantity for item in order.items.all())
-            order.status = request.POST.get('status', order.status)
-            order.save()
-            
+            try:
+                OrderService.update_order(
+                    order,
+                    {'status': request.POST.get('status', order.status)},
+                    _submitted_lines(formset),
+                    int(version),
+                )
+            except StaleOrderError:
+                messages.error(request, STALE_ORDER_MESSAGE)
+                return redirect('orders:order_edit', pk=order.pk)
             return redirect('orders:detail', pk=order.pk)
     else:
         # GET request logic
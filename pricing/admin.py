@@ -0,0 +1,19 @@
+from django.contrib import admin
+
+from .models import PriceList, PriceListItem
+
+
+class PriceListItemInline(admin.TabularInline):
+    model = PriceListItem
+    extra = 0
+    autocomplete_fields = ('product',)
+
+
+@admin.register(PriceList)
+class PriceListAdmin(admin.ModelAdmin):
+    list_display = ('name', 'customer_type', 'customer', 'valid_from', 'valid_until', 'is_active')
+    list_filter = ('is_active', 'customer_type')
+    search_fields = ('name', 'customer__name')
+    ordering = ('-valid_from', 'name')
+    raw_id_fields = ('customer',)
+    inlines = [PriceListItemInline]
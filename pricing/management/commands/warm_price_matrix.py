@@ -0,0 +1,22 @@
+import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+
+from pricing.services import PriceService
+
+
+class Command(BaseCommand):
+    help = "Precomputes every customer type's price row for a day (default: today), e.g. from a nightly job."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--date', help="Day to warm, as YYYY-MM-DD.")
+
+    def handle(self, *args, **options):
+        on_date = None
+        if options['date']:
+            try:
+                on_date = datetime.datetime.strptime(options['date'], '%Y-%m-%d').date()
+            except ValueError:
+                raise CommandError("--date must look like YYYY-MM-DD.")
+        rows = PriceService.warm(on_date)
+        self.stdout.write(self.style.SUCCESS(f"Cached prices for {rows} customer types."))
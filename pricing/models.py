@@ -0,0 +1,46 @@
+from django.db import models
+from django.db.models import Q
+
+from customers.models import Customer, CustomerType
+from products.models import Product
+
+
+class PriceList(models.Model):
+    """
+    Prices for one customer type (e.g. Wholesale, Distributor) or one customer, in force
+    from `valid_from` to `valid_until` inclusive (open-ended when empty). A customer's own
+    list beats its type's, and among lists of the same kind the latest `valid_from` wins.
+    Products a list leaves out keep the base price (PTR, else MRP).
+    """
+    name = models.CharField(max_length=100)
+    customer_type = models.ForeignKey(
+        CustomerType, on_delete=models.CASCADE, null=True, blank=True, related_name='price_lists'
+    )
+    customer = models.ForeignKey(Customer, on_delete=models.CASCADE, null=True, blank=True, related_name='price_lists')
+    valid_from = models.DateField()
+    valid_until = models.DateField(null=True, blank=True)
+    is_active = models.BooleanField(default=True)
+
+    class Meta:
+        constraints = [
+            models.CheckConstraint(
+                condition=Q(customer_type__isnull=False, customer__isnull=True)
+                | Q(customer_type__isnull=True, customer__isnull=False),
+                name='pricelist_one_audience',
+            ),
+        ]
+
+    def __str__(self):
+        return self.name
+
+
+class PriceListItem(models.Model):
+    price_list = models.ForeignKey(PriceList, on_delete=models.CASCADE, related_name='items')
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='list_prices')
+    price = models.DecimalField(max_digits=8, decimal_places=2)
+
+    class Meta:
+        unique_together = ('price_list', 'product')
+
+    def __str__(self):
+        return f"{self.product_id}: {self.price}"
@@ -0,0 +1,142 @@
+import uuid
+
+from django.core.cache import cache
+from django.db.models import Q
+from django.utils import timezone
+
+from customers.models import CustomerType
+from products.models import Product
+from .models import PriceList, PriceListItem
+
+PRICE_VERSION_KEY = 'pricing:version'
+PRICE_MATRIX_CACHE_TIMEOUT = 24 * 60 * 60
+
+
+class PriceService:
+    """
+    Resolves order prices from a precomputed matrix. Each customer type has a row
+    mapping every product to its price for the day, and each customer a sparse row
+    of its own overrides. Both are cached under a version that price list and product
+    writes bump (see pricing.signals), so pricing a whole cart costs one version read
+    and one get_many, and no queries once the rows are warm.
+    """
+
+    @staticmethod
+    def base_price(product):
+        """Price when no price list applies: PTR, falling back to MRP when no PTR is set."""
+        return product.ptr if product.ptr is not None else product.mrp
+
+    @staticmethod
+    def get_version():
+        version = cache.get(PRICE_VERSION_KEY)
+        if version is None:
+            cache.add(PRICE_VERSION_KEY, uuid.uuid4().hex, None)
+            version = cache.get(PRICE_VERSION_KEY)
+        return version
+
+    @staticmethod
+    def invalidate():
+        cache.set(PRICE_VERSION_KEY, uuid.uuid4().hex, None)
+
+    @staticmethod
+    def _key(version, on_date, kind, pk):
+        return f"pricing:{version}:{on_date.isoformat()}:{kind}:{pk}"
+
+    @staticmethod
+    def _effective_lists(on_date):
+        return PriceList.objects.filter(is_active=True, valid_from__lte=on_date).filter(
+            Q(valid_until__isnull=True) | Q(valid_until__gte=on_date)
+        )
+
+    @staticmethod
+    def _list_prices(lists):
+        """
+        {customer_type_id: {product_id: price}} from `lists` (None for customers' own lists),
+        the latest valid_from winning where lists overlap.
+        """
+        items = PriceListItem.objects.filter(price_list__in=lists).order_by(
+            'price_list__valid_from', 'price_list_id'
+        ).values_list('price_list__customer_type_id', 'product_id', 'price')
+        prices = {}
+        for customer_type_id, product_id, price in items:
+            prices.setdefault(customer_type_id, {})[product_id] = price
+        return prices
+
+    @staticmethod
+    def _base_row():
+        return {
+            pk: ptr if ptr is not None else mrp
+            for pk, ptr, mrp in Product.objects.values_list('pk', 'ptr', 'mrp')
+        }
+
+    @staticmethod
+    def build_type_row(customer_type_id, on_date):
+        """{product_id: price} for every product, for customers of one type."""
+        row = PriceService._base_row()
+        lists = PriceService._effective_lists(on_date).filter(customer_type_id=customer_type_id)
+        row.update(PriceService._list_prices(lists).get(customer_type_id, {}))
+        return row
+
+    @staticmethod
+    def build_customer_row(customer_id, on_date):
+        """{product_id: price} of the customer's own price lists only."""
+        lists = PriceService._effective_lists(on_date).filter(customer_id=customer_id)
+        return PriceService._list_prices(lists).get(None, {})
+
+    @staticmethod
+    def warm(on_date=None):
+        """
+        Precomputes the rows of every customer type for `on_date` (default: today) with
+        two queries, e.g. from a nightly job, so the day's first orders find them cached.
+
+        :return: number of rows cached
+        """
+        on_date = on_date or timezone.localdate()
+        version = PriceService.get_version()
+        base = PriceService._base_row()
+        list_prices = PriceService._list_prices(
+            PriceService._effective_lists(on_date).filter(customer_type__isnull=False)
+        )
+        rows = {
+            PriceService._key(version, on_date, 'type', customer_type_id): {**base, **list_prices.get(customer_type_id, {})}
+            for customer_type_id in CustomerType.objects.values_list('pk', flat=True)
+        }
+        cache.set_many(rows, PRICE_MATRIX_CACHE_TIMEOUT)
+        return len(rows)
+
+    @staticmethod
+    def prices_for(customer, product_ids=None, on_date=None):
+        """
+        Prices for a whole cart at once.
+
+        :param customer: Customer; only its pk and customer_type_id are read
+        :param product_ids: products to price (default: every product)
+        :param on_date: day whose price lists apply (default: today)
+        :return: {product_id: price}; product ids that do not exist are left out
+        """
+        on_date = on_date or timezone.localdate()
+        version = PriceService.get_version()
+        type_key = PriceService._key(version, on_date, 'type', customer.customer_type_id)
+        customer_key = PriceService._key(version, on_date, 'customer', customer.pk)
+        rows = cache.get_many([type_key, customer_key])
+
+        if product_ids is not None:
+            product_ids = [int(product_id) for product_id in product_ids]
+
+        type_row = rows.get(type_key)
+        # Products inserted without post_save (bulk_create) are missing from a cached row
+        if type_row is None or (product_ids is not None and not type_row.keys() >= set(product_ids)):
+            type_row = PriceService.build_type_row(customer.customer_type_id, on_date)
+            cache.set(type_key, type_row, PRICE_MATRIX_CACHE_TIMEOUT)
+        customer_row = rows.get(customer_key)
+        if customer_row is None:
+            customer_row = PriceService.build_customer_row(customer.pk, on_date)
+            cache.set(customer_key, customer_row, PRICE_MATRIX_CACHE_TIMEOUT)
+
+        if product_ids is None:
+            product_ids = type_row.keys()
+        return {
+            product_id: customer_row.get(product_id, type_row[product_id])
+            for product_id in product_ids
+            if product_id in type_row
+        }
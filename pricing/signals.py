@@ -0,0 +1,18 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from products.models import Product
+from .models import PriceList, PriceListItem
+from .services import PriceService
+
+
+@receiver(post_save, sender=PriceList)
+@receiver(post_delete, sender=PriceList)
+@receiver(post_save, sender=PriceListItem)
+@receiver(post_delete, sender=PriceListItem)
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+def invalidate_price_matrix(sender, **kwargs):
+    # As for the catalogue: bump the version once the write is visible to other requests
+    transaction.on_commit(PriceService.invalidate)
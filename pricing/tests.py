@@ -0,0 +1,139 @@
+import datetime
+import io
+from decimal import Decimal
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase
+
+from brands.models import Brand
+from customers.models import Customer, CustomerType
+from orders.services import DraftOrderService, OrderService
+from products.models import Product
+from .models import PriceList, PriceListItem
+from .services import PriceService
+
+
+class PriceServiceTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        brand = Brand.objects.create(name='Brand')
+        cls.first, cls.second, cls.third = Product.objects.bulk_create([
+            Product(brand=brand, name='SKU 1', mrp=100, ptr=80, margin=20, weight_gms=250),
+            Product(brand=brand, name='SKU 2', mrp=100, ptr=80, margin=20, weight_gms=250),
+            Product(brand=brand, name='SKU 3', mrp=60, ptr=None, margin=0, weight_gms=100),
+        ])
+        cls.retail = CustomerType.objects.create(name='Retail')
+        cls.wholesale = CustomerType.objects.create(name='Wholesale')
+        cls.shop = Customer.objects.create(name='Shop', phone='1', customer_type=cls.retail)
+        cls.trader = Customer.objects.create(name='Trader', phone='2', customer_type=cls.wholesale)
+        cls.big_trader = Customer.objects.create(name='Big Trader', phone='3', customer_type=cls.wholesale)
+
+        cls.today = datetime.date(2026, 10, 18)
+        wholesale = PriceList.objects.create(
+            name='Wholesale', customer_type=cls.wholesale, valid_from=datetime.date(2026, 1, 1)
+        )
+        PriceListItem.objects.create(price_list=wholesale, product=cls.first, price=70)
+        PriceListItem.objects.create(price_list=wholesale, product=cls.second, price=72)
+        festive = PriceList.objects.create(
+            name='Diwali', customer_type=cls.wholesale,
+            valid_from=datetime.date(2026, 10, 15), valid_until=datetime.date(2026, 10, 25),
+        )
+        PriceListItem.objects.create(price_list=festive, product=cls.first, price=65)
+        contract = PriceList.objects.create(
+            name='Big Trader contract', customer=cls.big_trader, valid_from=datetime.date(2026, 6, 1)
+        )
+        PriceListItem.objects.create(price_list=contract, product=cls.second, price=60)
+        expired = PriceList.objects.create(
+            name='Old contract', customer=cls.trader,
+            valid_from=datetime.date(2025, 1, 1), valid_until=datetime.date(2025, 12, 31),
+        )
+        PriceListItem.objects.create(price_list=expired, product=cls.first, price=10)
+
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+
+    def test_precedence_and_effective_dates(self):
+        products = [self.first.pk, self.second.pk, self.third.pk]
+        self.assertEqual(
+            PriceService.prices_for(self.shop, products, self.today),
+            {self.first.pk: 80, self.second.pk: 80, self.third.pk: 60},
+        )
+        self.assertEqual(
+            PriceService.prices_for(self.trader, products, self.today),
+            {self.first.pk: 65, self.second.pk: 72, self.third.pk: 60},
+        )
+        self.assertEqual(
+            PriceService.prices_for(self.big_trader, products, self.today),
+            {self.first.pk: 65, self.second.pk: 60, self.third.pk: 60},
+        )
+        after_festival = PriceService.prices_for(self.trader, products, datetime.date(2026, 11, 1))
+        self.assertEqual(after_festival[self.first.pk], 70)
+        self.assertEqual(PriceService.prices_for(self.trader, [0], self.today), {})
+
+    def test_cart_costs_no_queries_once_warm(self):
+        PriceService.prices_for(self.trader, on_date=self.today)
+        with self.assertNumQueries(0):
+            prices = PriceService.prices_for(self.trader, [self.first.pk, self.second.pk], self.today)
+        self.assertEqual(prices, {self.first.pk: 65, self.second.pk: 72})
+
+    def test_warm_caches_every_type(self):
+        self.assertEqual(PriceService.warm(self.today), 2)
+        with self.assertNumQueries(1):  # only the shop's own (empty) row is built
+            self.assertEqual(PriceService.prices_for(self.shop, [self.third.pk], self.today), {self.third.pk: 60})
+
+    def test_price_changes_invalidate_the_matrix(self):
+        PriceService.prices_for(self.trader, on_date=self.today)
+        with self.captureOnCommitCallbacks(execute=True):
+            PriceListItem.objects.filter(product=self.second, price=72).get().delete()
+            PriceListItem.objects.create(
+                price_list=PriceList.objects.get(name='Wholesale'), product=self.second, price=71
+            )
+        self.assertEqual(PriceService.prices_for(self.trader, [self.second.pk], self.today), {self.second.pk: 71})
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.third.ptr = 55
+            self.third.save()
+        self.assertEqual(PriceService.prices_for(self.shop, [self.third.pk], self.today), {self.third.pk: 55})
+
+    def test_products_bulk_created_after_the_row_was_cached(self):
+        PriceService.prices_for(self.shop, on_date=self.today)
+        new = Product.objects.bulk_create([
+            Product(brand=self.first.brand, name='SKU 4', mrp=50, ptr=40, margin=10, weight_gms=100)
+        ])[0]
+        self.assertEqual(
+            PriceService.prices_for(self.shop, [self.first.pk, new.pk], self.today), {self.first.pk: 80, new.pk: 40}
+        )
+        order = OrderService.create_order({'customer': self.shop}, [{'product_id': new.pk, 'quantity': 2}])
+        self.assertEqual(order.total_amount, 80)
+
+    def test_orders_and_drafts_use_the_customers_prices(self):
+        # Only open-ended lists here: orders are priced for the current day
+        order = OrderService.create_order(
+            {'customer': self.big_trader}, [{'product_id': self.second.pk, 'quantity': 2},
+                                            {'product_id': self.third.pk, 'quantity': 1}]
+        )
+        self.assertEqual(
+            dict(order.items.values_list('product_id', 'price')), {self.second.pk: 60, self.third.pk: 60}
+        )
+        self.assertEqual(order.total_amount, 180)
+
+        draft = DraftOrderService.start(self.shop)
+        DraftOrderService.set_lines(draft, {self.second.pk: 2, self.third.pk: 1})
+        self.assertEqual(draft.total_amount, 220)
+
+        # Moving the cart to another customer reprices its lines
+        DraftOrderService.start(self.big_trader, draft=draft)
+        draft.refresh_from_db()
+        self.assertEqual(draft.total_amount, Decimal('180'))
+        self.assertEqual(
+            dict(draft.lines.values_list('product_id', 'price')), {self.second.pk: 60, self.third.pk: 60}
+        )
+
+    def test_warm_price_matrix_command(self):
+        call_command('warm_price_matrix', '--date', '2026-10-18', stdout=io.StringIO())
+        with self.assertNumQueries(1):  # the customer's own row; the type row is cached
+            prices = PriceService.prices_for(self.trader, [self.first.pk], self.today)
+        self.assertEqual(prices, {self.first.pk: 65})
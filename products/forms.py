@@ -1,5 +1,6 @@
 from django import forms
 from .models import Product
+from .services import CatalogueService
 from brands.models import Brand
 
 class ProductForm(forms.ModelForm):
@@ -31,11 +32,10 @@ class ProductForm(forms.ModelForm):
 class SelectProductsForm(forms.Form):
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
-        # Group products by brand
-        for brand in Product.objects.values_list('brand', flat=True).distinct():
-            products = Product.objects.filter(brand=brand, is_active=True)
+        # Group products by brand, from the cached catalogue snapshot
+        for brand, products in CatalogueService.products_by_brand().items():
             for product in products:
-                field_name = f"product_{product.pk}"
+                field_name = f"product_{product['id']}"
                 self.fields[field_name] = forms.IntegerField(
-                    label=f"{brand} - {product.name}", min_value=0, initial=0, required=False
+                    label=f"{brand} - {product['name']}", min_value=0, initial=0, required=False
                 )
\ No newline at end of file
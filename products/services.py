@@ -1,5 +1,13 @@
+import uuid
+
+from django.core.cache import cache
+
 from .models import Product
 
+CATALOGUE_VERSION_KEY = 'products:catalogue:version'
+CATALOGUE_CACHE_TIMEOUT = 24 * 60 * 60
+
+
 class ProductService:
 
     @staticmethod
@@ -17,3 +25,59 @@ class ProductService:
     @staticmethod
     def get_product(product_id):
         return Product.objects.get(pk=product_id)
+
+
+class CatalogueService:
+    """
+    Versioned, brand-grouped snapshot of active products for the order-entry picker.
+    The snapshot is cached under its version; product and brand writes bump the
+    version (see products.signals), which also serves as the catalogue ETag.
+    """
+
+    @staticmethod
+    def get_version():
+        version = cache.get(CATALOGUE_VERSION_KEY)
+        if version is None:
+            cache.add(CATALOGUE_VERSION_KEY, uuid.uuid4().hex, None)
+            version = cache.get(CATALOGUE_VERSION_KEY)
+        return version
+
+    @staticmethod
+    def invalidate():
+        cache.set(CATALOGUE_VERSION_KEY, uuid.uuid4().hex, None)
+
+    @staticmethod
+    def get_catalogue():
+        """
+        Returns {'version': str, 'brands': [{'id', 'name', 'products': [{'id', 'name', 'mrp', 'ptr', 'weight_gms'}]}]}.
+        """
+        version = CatalogueService.get_version()
+        key = f"products:catalogue:{version}"
+        catalogue = cache.get(key)
+        if catalogue is None:
+            catalogue = CatalogueService.build_catalogue(version)
+            cache.set(key, catalogue, CATALOGUE_CACHE_TIMEOUT)
+        return catalogue
+
+    @staticmethod
+    def build_catalogue(version):
+        brands = []
+        products = Product.objects.filter(is_active=True).order_by('brand__name', 'name').values(
+            'id', 'name', 'mrp', 'ptr', 'weight_gms', 'brand_id', 'brand__name'
+        )
+        for product in products:
+            if not brands or brands[-1]['id'] != product['brand_id']:
+                brands.append({'id': product['brand_id'], 'name': product['brand__name'], 'products': []})
+            brands[-1]['products'].append({
+                'id': product['id'],
+                'name': product['name'],
+                'mrp': product['mrp'],
+                'ptr': product['ptr'],
+                'weight_gms': product['weight_gms'],
+            })
+        return {'version': version, 'brands': brands}
+
+    @staticmethod
+    def products_by_brand():
+        """Brand name -> list of product dicts, in catalogue order."""
+        return {brand['name']: brand['products'] for brand in CatalogueService.get_catalogue()['brands']}
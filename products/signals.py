@@ -0,0 +1,17 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from brands.models import Brand
+from .models import Product
+from .services import CatalogueService
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+@receiver(post_save, sender=Brand)
+@receiver(post_delete, sender=Brand)
+def invalidate_catalogue(sender, **kwargs):
+    # Bump the version only once the write is visible, so no request can
+    # rebuild the new version from uncommitted data
+    transaction.on_commit(CatalogueService.invalidate)
@@ -1,3 +1,58 @@
+from django.core.cache import cache
 from django.test import TestCase
+from django.urls import reverse
 
-# Create your tests here.
+from brands.models import Brand
+from core.testing import QueryBudgetMixin
+from .models import Product
+from .services import CatalogueService
+
+
+class ProductListQueryBudgetTests(QueryBudgetMixin, TestCase):
+
+    def test_product_list(self):
+        def seed(count):
+            for _ in range(count):
+                brand = Brand.objects.create(name=f'Brand {Brand.objects.count()}')
+                Product.objects.create(brand=brand, name='SKU', mrp=10, ptr=8, margin=2, weight_gms=100)
+
+        self.assertConstantQueries(seed, lambda: self.client.get(reverse('products:list')))
+
+
+class CatalogueCacheTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.brand = Brand.objects.create(name='Brand')
+        cls.product = Product.objects.create(brand=cls.brand, name='SKU', mrp=10, ptr=8, margin=2, weight_gms=100)
+        Product.objects.create(brand=cls.brand, name='Retired', mrp=10, margin=2, weight_gms=100, is_active=False)
+
+    def test_snapshot_is_cached_until_a_product_changes(self):
+        catalogue = CatalogueService.get_catalogue()
+        self.assertEqual([p['name'] for p in catalogue['brands'][0]['products']], ['SKU'])
+        with self.assertNumQueries(0):
+            CatalogueService.get_catalogue()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.product.name = 'Renamed'
+            self.product.save()
+        updated = CatalogueService.get_catalogue()
+        self.assertNotEqual(updated['version'], catalogue['version'])
+        self.assertEqual(updated['brands'][0]['products'][0]['name'], 'Renamed')
+
+    def test_catalogue_json_honours_etag(self):
+        response = self.client.get(reverse('products:catalogue'))
+        self.assertEqual(response.status_code, 200)
+        etag = response['ETag']
+
+        response = self.client.get(reverse('products:catalogue'), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.brand.save()
+        response = self.client.get(reverse('products:catalogue'), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
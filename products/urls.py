@@ -1,5 +1,5 @@
 from django.urls import path
-from .views import ProductDeleteView, ProductListView, ProductCreateView, ProductDetailView, ProductUpdateView
+from .views import ProductDeleteView, ProductListView, ProductCreateView, ProductDetailView, ProductUpdateView, catalogue_json
 
 app_name = 'products'
 
@@ -9,5 +9,6 @@ urlpatterns = [
     path('<int:pk>/', ProductDetailView.as_view(), name='detail'),
     path('<int:pk>/edit/', ProductUpdateView.as_view(), name='edit'),
     path('<int:pk>/delete/', ProductDeleteView.as_view(), name='delete'),
+    path('catalogue.json', catalogue_json, name='catalogue'),
     
 ]
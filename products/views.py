@@ -1,15 +1,20 @@
-from django.http import HttpResponseRedirect
+from django.http import HttpResponseRedirect, JsonResponse
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import condition
 from django.views.generic import ListView, CreateView, DetailView, UpdateView, DeleteView
 from django.urls import reverse_lazy
 from .models import Product
 from .forms import ProductForm
-from .services import ProductService
+from .services import CatalogueService, ProductService
 
 class ProductListView(ListView):
     model = Product
     template_name = 'products/product_list.html'
     context_object_name = 'products'
 
+    def get_queryset(self):
+        return super().get_queryset().select_related('brand')
+
 class ProductCreateView(CreateView):
     model = Product
     form_class = ProductForm
@@ -37,4 +42,14 @@ class ProductUpdateView(UpdateView):
 class ProductDeleteView(DeleteView):
     model = Product
     template_name = 'products/product_confirm_delete.html'
-    success_url = reverse_lazy('products:list')
\ No newline at end of file
+    success_url = reverse_lazy('products:list')
+
+
+@cache_control(private=True, no_cache=True)
+@condition(etag_func=lambda request: CatalogueService.get_version())
+def catalogue_json(request):
+    """
+    Active products grouped by brand. Browsers revalidate with If-None-Match
+    and get a 304 while the catalogue version is unchanged.
+    """
+    return JsonResponse(CatalogueService.get_catalogue())
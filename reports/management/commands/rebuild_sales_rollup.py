@@ -0,0 +1,61 @@
+import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Min
+from django.utils import timezone
+
+from billing.models import Expense, Invoice
+from orders.models import SalesOrder
+from reports.services import SalesRollupService
+
+
+class Command(BaseCommand):
+    help = "Rebuilds the daily sales rollup tables from orders, invoices and expenses."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--start', help="First day to rebuild (YYYY-MM-DD). Defaults to the earliest record.")
+        parser.add_argument('--end', help="Last day to rebuild (YYYY-MM-DD). Defaults to today.")
+
+    def handle(self, *args, **options):
+        try:
+            start_date = self._parse(options['start']) or self._earliest_day()
+            end_date = self._parse(options['end']) or timezone.localdate()
+        except ValueError:
+            raise CommandError("Dates must be in YYYY-MM-DD format.")
+
+        if start_date is None:
+            self.stdout.write("Nothing to rebuild.")
+            return
+        if start_date > end_date:
+            raise CommandError("--start must not be after --end.")
+
+        # Rebuild one month at a time so each transaction stays small
+        chunk_start = start_date
+        while chunk_start <= end_date:
+            next_month = chunk_start.replace(day=28) + datetime.timedelta(days=4)
+            chunk_end = min(next_month - datetime.timedelta(days=next_month.day), end_date)
+            SalesRollupService.rebuild(chunk_start, chunk_end)
+            self.stdout.write(f"Rebuilt {chunk_start} to {chunk_end}")
+            chunk_start = chunk_end + datetime.timedelta(days=1)
+
+        self.stdout.write(self.style.SUCCESS("Sales rollup rebuilt."))
+
+    @staticmethod
+    def _parse(value):
+        if not value:
+            return None
+        return datetime.datetime.strptime(value, '%Y-%m-%d').date()
+
+    @staticmethod
+    def _earliest_day():
+        candidates = []
+        first_order = SalesOrder.objects.aggregate(first=Min('created_at'))['first']
+        if first_order:
+            candidates.append(timezone.localdate(first_order))
+        first_invoice = Invoice.objects.aggregate(first=Min('created_at'))['first']
+        if first_invoice:
+            candidates.append(timezone.localdate(first_invoice))
+        first_expense = Expense.objects.aggregate(first=Min('date_incurred'))['first']
+        if first_expense:
+            candidates.append(first_expense)
+        return min(candidates) if candidates else None
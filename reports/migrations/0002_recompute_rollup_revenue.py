@@ -0,0 +1,45 @@
+# Generated by Django 5.2.5 on 2026-10-18 16:20
+
+from django.db import migrations
+from django.db.models import F, Sum
+from django.db.models.functions import TruncDate
+
+
+def recompute_revenue(apps, schema_editor):
+    # Revenue used to be summed from the unit prices alone; it is the sum of price * quantity
+    OrderItem = apps.get_model('orders', 'OrderItem')
+    DailyProductSales = apps.get_model('reports', 'DailyProductSales')
+    DailyBrandSales = apps.get_model('reports', 'DailyBrandSales')
+
+    items = OrderItem.objects.annotate(day=TruncDate('order__created_at'))
+    line_value = Sum(F('price') * F('quantity'))
+
+    product_revenue = {
+        (row['day'], row['product_id']): row['revenue']
+        for row in items.values('day', 'product_id').annotate(revenue=line_value).order_by()
+    }
+    rows = list(DailyProductSales.objects.all())
+    for row in rows:
+        row.revenue = product_revenue.get((row.day, row.product_id), 0)
+    DailyProductSales.objects.bulk_update(rows, ['revenue'], batch_size=500)
+
+    brand_revenue = {
+        (row['day'], row['order__status'], row['product__brand_id']): row['revenue']
+        for row in items.values('day', 'order__status', 'product__brand_id').annotate(revenue=line_value).order_by()
+    }
+    rows = list(DailyBrandSales.objects.all())
+    for row in rows:
+        row.revenue = brand_revenue.get((row.day, row.status, row.brand_id), 0)
+    DailyBrandSales.objects.bulk_update(rows, ['revenue'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reports', '0001_initial'),
+        ('orders', '0006_draftorder'),
+    ]
+
+    operations = [
+        migrations.RunPython(recompute_revenue, migrations.RunPython.noop),
+    ]
@@ -1,3 +1,69 @@
 from django.db import models
+from brands.models import Brand
+from products.models import Product
+from orders.models import SalesOrder
 
-# Create your models here.
+
+class DailySales(models.Model):
+    """
+    Materialized per-day, per-status order totals.
+    Maintained by reports.signals and rebuilt with `manage.py rebuild_sales_rollup`.
+    """
+    day = models.DateField()
+    status = models.CharField(max_length=16, choices=SalesOrder.STATUS_CHOICES)
+    order_count = models.PositiveIntegerField(default=0)
+    total_amount = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        unique_together = ('day', 'status')
+
+    def __str__(self):
+        return f"{self.day} [{self.status}]: {self.total_amount}"
+
+
+class DailyBrandSales(models.Model):
+    """
+    Per-day, per-status sales for each brand.
+    `total_amount` is the value of the orders containing the brand; `revenue` is the brand's own line value.
+    """
+    day = models.DateField()
+    brand = models.ForeignKey(Brand, on_delete=models.CASCADE, related_name='daily_sales')
+    status = models.CharField(max_length=16, choices=SalesOrder.STATUS_CHOICES)
+    order_count = models.PositiveIntegerField(default=0)
+    total_amount = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    quantity = models.PositiveIntegerField(default=0)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        unique_together = ('day', 'brand', 'status')
+
+    def __str__(self):
+        return f"{self.day} {self.brand_id} [{self.status}]: {self.total_amount}"
+
+
+class DailyProductSales(models.Model):
+    """
+    Per-day quantity and revenue for each product, across all order statuses.
+    """
+    day = models.DateField()
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='daily_sales')
+    quantity = models.PositiveIntegerField(default=0)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        unique_together = ('day', 'product')
+
+    def __str__(self):
+        return f"{self.day} {self.product_id}: {self.quantity}"
+
+
+class DailyCashFlow(models.Model):
+    """
+    Per-day cash in (payments on invoices raised that day) and cash out (expenses incurred that day).
+    """
+    day = models.DateField(unique=True)
+    cash_in = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    cash_out = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    def __str__(self):
+        return f"{self.day}: +{self.cash_in} / -{self.cash_out}"
@@ -1,10 +1,19 @@
 from orders.models import SalesOrder, OrderItem
 from products.models import Product
 from brands.models import Brand
-from django.db.models import Sum, Count
-from django.utils.timezone import now
+from billing.models import Invoice, Expense
+from core.utils import day_bounds
+from .models import DailySales, DailyBrandSales, DailyProductSales, DailyCashFlow
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Sum, Count, F, Q, DecimalField, ExpressionWrapper
+from django.db.models.functions import TruncDate
+from django.utils.timezone import now, localdate
 from datetime import timedelta
 
+# Upper bound (in days overdue) of each A/R aging bucket; anything older falls in the last bucket.
+DEFAULT_AR_AGING_BOUNDARIES = [0, 30, 60, 90]
+
 class SalesReportService:
 
     @staticmethod
@@ -19,9 +28,9 @@ class SalesReportService:
         """
         orders = SalesOrder.objects.filter(status='delivered')
         if start_date:
-            orders = orders.filter(created_at__date__gte=start_date)
+            orders = orders.filter(created_at__gte=day_bounds(start_date)[0])
         if end_date:
-            orders = orders.filter(created_at__date__lte=end_date)
+            orders = orders.filter(created_at__lt=day_bounds(end_date)[1])
 
         if brand_id:
             orders = orders.filter(items__product__brand_id=brand_id).distinct()
@@ -33,7 +42,7 @@ class SalesReportService:
             order__in=orders
         ).values('product__id', 'product__name').annotate(
             total_quantity=Sum('quantity'),
-            total_revenue=Sum('price')
+            total_revenue=Sum(F('price') * F('quantity'))
         ).order_by('-total_revenue')
 
         return {
@@ -53,24 +62,24 @@ class SalesReportService:
         :return: list of dicts with 'month' and 'total_sales'
         """
         from django.db.models.functions import TruncMonth
-        from django.db.models import DateTimeField
 
         end_date = now()
         start_date = end_date - timedelta(days=30 * months)
 
-        orders = SalesOrder.objects.filter(
-            status='delivered',
-            created_at__range=(start_date, end_date)
-        )
-
+        # Read from the daily rollup instead of scanning SalesOrder/OrderItem
         if brand_id:
-            orders = orders.filter(items__product__brand_id=brand_id).distinct()
+            rollup = DailyBrandSales.objects.filter(brand_id=brand_id)
+        else:
+            rollup = DailySales.objects.all()
 
-        monthly_data = orders.annotate(
-            month=TruncMonth('created_at', output_field=DateTimeField())
+        monthly_data = rollup.filter(
+            status='delivered',
+            day__range=(start_date.date(), end_date.date())
+        ).annotate(
+            month=TruncMonth('day')
         ).values('month').annotate(
             total_sales=Sum('total_amount'),
-            total_orders=Count('id')
+            total_orders=Sum('order_count')
         ).order_by('month')
 
         # Format output
@@ -84,3 +93,200 @@ class SalesReportService:
         ]
 
         return result
+
+
+class SalesRollupService:
+    """
+    Maintains the reports.models daily rollup tables from orders, invoices and expenses.
+    """
+
+    @staticmethod
+    @transaction.atomic
+    def rebuild(start_date, end_date):
+        """
+        Recomputes every rollup row for the days between start_date and end_date (inclusive).
+
+        :param start_date: first day to rebuild
+        :param end_date: last day to rebuild
+        """
+        day_range = (start_date, end_date)
+        DailySales.objects.filter(day__range=day_range).delete()
+        DailyBrandSales.objects.filter(day__range=day_range).delete()
+        DailyProductSales.objects.filter(day__range=day_range).delete()
+        DailyCashFlow.objects.filter(day__range=day_range).delete()
+
+        # Datetime bounds rather than __date lookups so the created_at indexes can be used
+        start, end = day_bounds(start_date, end_date)
+
+        # --- Order totals per day and status ---
+        orders = SalesOrder.objects.filter(created_at__gte=start, created_at__lt=end)
+        order_rows = orders.annotate(day=TruncDate('created_at')).values('day', 'status').annotate(
+            order_count=Count('id'),
+            total_amount=Sum('total_amount')
+        ).order_by()
+        DailySales.objects.bulk_create([
+            DailySales(
+                day=row['day'],
+                status=row['status'],
+                order_count=row['order_count'],
+                total_amount=row['total_amount'] or 0
+            )
+            for row in order_rows
+        ])
+
+        # --- Product and brand breakdowns ---
+        items = OrderItem.objects.filter(
+            order__created_at__gte=start, order__created_at__lt=end
+        ).annotate(day=TruncDate('order__created_at'))
+
+        product_rows = items.values('day', 'product_id').annotate(
+            units=Sum('quantity'),
+            revenue=Sum(F('price') * F('quantity'))
+        ).order_by()
+        DailyProductSales.objects.bulk_create([
+            DailyProductSales(
+                day=row['day'],
+                product_id=row['product_id'],
+                quantity=row['units'] or 0,
+                revenue=row['revenue'] or 0
+            )
+            for row in product_rows
+        ])
+
+        # An order counts once per brand it contains, however many lines of that brand it has
+        brand_orders = {}
+        order_brands = items.values_list(
+            'day', 'order__status', 'product__brand_id', 'order_id', 'order__total_amount'
+        ).distinct().order_by()
+        for day, status, brand_id, _order_id, order_total in order_brands.iterator():
+            entry = brand_orders.setdefault((day, status, brand_id), [0, 0])
+            entry[0] += 1
+            entry[1] += order_total
+
+        brand_rows = items.values('day', 'order__status', 'product__brand_id').annotate(
+            units=Sum('quantity'),
+            revenue=Sum(F('price') * F('quantity'))
+        ).order_by()
+        brand_sales = []
+        for row in brand_rows:
+            key = (row['day'], row['order__status'], row['product__brand_id'])
+            order_count, total_amount = brand_orders.get(key, (0, 0))
+            brand_sales.append(DailyBrandSales(
+                day=row['day'],
+                status=row['order__status'],
+                brand_id=row['product__brand_id'],
+                order_count=order_count,
+                total_amount=total_amount,
+                quantity=row['units'] or 0,
+                revenue=row['revenue'] or 0
+            ))
+        DailyBrandSales.objects.bulk_create(brand_sales)
+
+        # --- Cash in / cash out ---
+        cash_flow = {}
+        cash_in_rows = Invoice.objects.filter(
+            created_at__gte=start, created_at__lt=end
+        ).annotate(day=TruncDate('created_at')).values('day').annotate(
+            total=Sum('amount_paid')
+        ).order_by()
+        for row in cash_in_rows:
+            cash_flow.setdefault(row['day'], DailyCashFlow(day=row['day'])).cash_in = row['total'] or 0
+
+        cash_out_rows = Expense.objects.filter(
+            date_incurred__range=day_range
+        ).values('date_incurred').annotate(
+            total=Sum('amount')
+        ).order_by()
+        for row in cash_out_rows:
+            day = row['date_incurred']
+            cash_flow.setdefault(day, DailyCashFlow(day=day)).cash_out = row['total'] or 0
+
+        DailyCashFlow.objects.bulk_create(cash_flow.values())
+
+    @staticmethod
+    def refresh_day(day):
+        """Recomputes the rollup for a single day."""
+        SalesRollupService.rebuild(day, day)
+
+    @staticmethod
+    def refresh_days(days):
+        """Recomputes the rollup for each distinct day in `days`."""
+        for day in sorted(set(days)):
+            SalesRollupService.rebuild(day, day)
+
+
+class ARAgingService:
+    """
+    Accounts receivable aging computed in the database with one grouped query.
+    """
+
+    @staticmethod
+    def parse_boundaries(value):
+        """
+        Parses a comma separated list of day boundaries such as "30,60,90".
+        Returns None when the value is missing or invalid.
+        """
+        if not value:
+            return None
+        try:
+            boundaries = [int(part) for part in value.split(',') if part.strip()]
+        except ValueError:
+            return None
+        if not boundaries or any(day < 0 for day in boundaries):
+            return None
+        return boundaries
+
+    @staticmethod
+    def build_buckets(boundaries=None):
+        """
+        Turns day boundaries like [0, 30, 60, 90] into (label, min_days, max_days) tuples:
+        Current, 1-30 Days, 31-60 Days, 61-90 Days and 91+ Days. When the first boundary
+        is above 0 the first bucket is labelled by its range, e.g. 0-15 Days.
+        Defaults to settings.AR_AGING_BOUNDARIES, falling back to DEFAULT_AR_AGING_BOUNDARIES.
+        """
+        if boundaries is None:
+            boundaries = getattr(settings, 'AR_AGING_BOUNDARIES', DEFAULT_AR_AGING_BOUNDARIES)
+        boundaries = sorted(set(boundaries))
+
+        first_label = 'Current' if boundaries[0] == 0 else f'0-{boundaries[0]} Days'
+        buckets = [(first_label, None, boundaries[0])]
+        for lower, upper in zip(boundaries, boundaries[1:]):
+            buckets.append((f'{lower + 1}-{upper} Days', lower + 1, upper))
+        buckets.append((f'{boundaries[-1] + 1}+ Days', boundaries[-1] + 1, None))
+        return buckets
+
+    @staticmethod
+    def customer_balances(buckets, as_of=None):
+        """
+        Returns a values() queryset with one row per customer holding open invoices:
+        customer_id, customer_name, bucket_0 .. bucket_N (one per bucket) and total_due.
+
+        :param buckets: output of build_buckets()
+        :param as_of: date the invoices are aged against (defaults to today)
+        """
+        as_of = as_of or localdate()
+        balance = ExpressionWrapper(
+            F('total') - F('amount_paid'),
+            output_field=DecimalField(max_digits=12, decimal_places=2)
+        )
+
+        # days overdue within [min_days, max_days]  <=>  invoice date within [as_of - max_days, as_of - min_days],
+        # as datetime bounds so (payment_status, created_at) can be range-scanned
+        bucket_totals = {}
+        for index, (_label, min_days, max_days) in enumerate(buckets):
+            condition = Q()
+            if min_days is not None:
+                condition &= Q(created_at__lt=day_bounds(as_of - timedelta(days=min_days))[1])
+            if max_days is not None:
+                condition &= Q(created_at__gte=day_bounds(as_of - timedelta(days=max_days))[0])
+            bucket_totals[f'bucket_{index}'] = Sum(balance, filter=condition or None, default=0)
+
+        return Invoice.objects.filter(
+            payment_status__in=['unpaid', 'partial']
+        ).values(
+            customer_id=F('order__customer_id'),
+            customer_name=F('order__customer__name')
+        ).annotate(
+            total_due=Sum(balance, default=0),
+            **bucket_totals
+        ).order_by('customer_name', 'customer_id')
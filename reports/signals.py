@@ -0,0 +1,104 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+from django.utils.dateparse import parse_date
+
+from billing.models import Expense, Invoice
+from billing.signals import expenses_created, payments_recorded
+from core.utils import local_day
+from orders.models import OrderItem, SalesOrder
+from orders.signals import orders_bulk_updated
+from .services import SalesRollupService
+
+
+def _as_date(value):
+    # Expense.date_incurred may still hold the raw form string right after create()
+    if isinstance(value, str):
+        return parse_date(value)
+    return value
+
+
+class _PendingRefresh:
+    """The days (and orders, whose day is looked up then) one transaction touched."""
+
+    def __init__(self, hooks):
+        self.hooks = hooks
+        self.days = set()
+        self.order_ids = set()
+
+    def __call__(self):
+        days, order_ids = set(self.days), set(self.order_ids)
+        self.days.clear()
+        self.order_ids.clear()
+        if order_ids:
+            created = SalesOrder.objects.filter(pk__in=order_ids).values_list('created_at', flat=True)
+            days.update(local_day(created_at) for created_at in created)
+        if days:
+            SalesRollupService.refresh_days(days)
+
+
+def _schedule_refresh(days=(), order_ids=()):
+    """
+    Refreshes the rollup for `days` and the days of `order_ids` once the surrounding
+    transaction commits. A transaction's marks are collected in one set that the first
+    of its on_commit callbacks drains, so each day it touched is rebuilt once however
+    many rows it wrote; the callbacks after that find the set empty.
+    """
+    connection = transaction.get_connection()
+    pending = getattr(connection, '_sales_rollup_pending', None)
+    # Django swaps in a new run_on_commit list when a transaction or savepoint ends,
+    # so marks left by a rolled back transaction are not carried into the next one
+    if pending is None or pending.hooks is not connection.run_on_commit or not connection.in_atomic_block:
+        pending = connection._sales_rollup_pending = _PendingRefresh(connection.run_on_commit)
+    pending.days.update(day for day in days if day is not None)
+    pending.order_ids.update(order_ids)
+    transaction.on_commit(pending)
+
+
+@receiver(post_save, sender=SalesOrder)
+@receiver(post_delete, sender=SalesOrder)
+def refresh_order_day(sender, instance, **kwargs):
+    _schedule_refresh(days=[local_day(instance.created_at)])
+
+
+@receiver(post_save, sender=OrderItem)
+@receiver(post_delete, sender=OrderItem)
+def refresh_order_item_day(sender, instance, **kwargs):
+    # The order's day is looked up once per transaction, when the refresh runs
+    _schedule_refresh(order_ids=[instance.order_id])
+
+
+@receiver(orders_bulk_updated)
+def refresh_bulk_order_days(sender, order_ids, **kwargs):
+    _schedule_refresh(order_ids=order_ids)
+
+
+@receiver(post_save, sender=Invoice)
+@receiver(post_delete, sender=Invoice)
+def refresh_invoice_day(sender, instance, **kwargs):
+    _schedule_refresh(days=[local_day(instance.created_at)])
+
+
+@receiver(payments_recorded)
+def refresh_paid_invoice_days(sender, invoice_ids, **kwargs):
+    created = Invoice.objects.filter(pk__in=invoice_ids).values_list('created_at', flat=True)
+    _schedule_refresh(days=[local_day(created_at) for created_at in created])
+
+
+@receiver(pre_save, sender=Expense)
+def remember_expense_day(sender, instance, **kwargs):
+    if instance.pk:
+        instance._previous_date_incurred = Expense.objects.filter(
+            pk=instance.pk
+        ).values_list('date_incurred', flat=True).first()
+
+
+@receiver(post_save, sender=Expense)
+@receiver(post_delete, sender=Expense)
+def refresh_expense_day(sender, instance, **kwargs):
+    _schedule_refresh(days=[_as_date(instance.date_incurred), getattr(instance, '_previous_date_incurred', None)])
+
+
+@receiver(expenses_created)
+def refresh_created_expense_days(sender, expense_ids, **kwargs):
+    _schedule_refresh(days=Expense.objects.filter(pk__in=expense_ids).values_list('date_incurred', flat=True))
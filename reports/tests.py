@@ -1,3 +1,354 @@
-from django.test import TestCase
+import csv
+import datetime
+import io
+import os
+import random
+from decimal import Decimal
 
-# Create your tests here.
+from django.core.management import call_command
+from django.db import connection
+from django.db.models import Count, F, Sum
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from billing.models import Expense, Invoice
+from billing.services import PaymentService
+from brands.models import Brand
+from core.utils import day_bounds
+from customers.models import Customer, CustomerType
+from django.contrib.auth.models import User
+from inventory.models import StockLocation, StockMovement
+from orders.models import OrderItem, SalesOrder
+from orders.services import OrderService
+from products.models import Product
+from .models import DailyBrandSales, DailyCashFlow, DailyProductSales, DailySales
+from .services import ARAgingService
+
+
+class IndexUsageTests(TestCase):
+    """
+    Runs EXPLAIN on the hot report / list queries and asserts each one is answered
+    from its composite index rather than a full table scan.
+
+    The seed size defaults to a few thousand orders so the suite stays fast; set
+    EXPLAIN_SEED_ORDERS=1000000 against a MySQL or Postgres database to check the
+    plans at production scale, where the planner weighs real table statistics.
+    """
+    seed_orders = int(os.environ.get('EXPLAIN_SEED_ORDERS', 2000))
+    batch_size = 5000
+
+    @classmethod
+    def setUpTestData(cls):
+        rng = random.Random(42)
+        customer_type = CustomerType.objects.create(name='Retail')
+        customer = Customer.objects.create(name='Customer', phone='1', customer_type=customer_type)
+        brand = Brand.objects.create(name='Brand')
+        cls.product = Product.objects.create(brand=brand, name='SKU', mrp=10, ptr=8, margin=2, weight_gms=100)
+        cls.location = StockLocation.objects.create(name='Warehouse')
+        user = User.objects.create_user('explain')
+        statuses = [status for status, _label in SalesOrder.STATUS_CHOICES]
+        # Most invoices in a live ledger are settled; open ones are the selective minority
+        payment_statuses = ['unpaid', 'partial'] + ['paid'] * 18
+
+        for offset in range(0, cls.seed_orders, cls.batch_size):
+            count = min(cls.batch_size, cls.seed_orders - offset)
+            orders = SalesOrder.objects.bulk_create(
+                SalesOrder(customer=customer, status=rng.choice(statuses), total_amount=100)
+                for _ in range(count)
+            )
+            Invoice.objects.bulk_create(
+                Invoice(
+                    order=order,
+                    invoice_number=f'EXP-{order.pk}',
+                    total=100,
+                    payment_status=rng.choice(payment_statuses),
+                )
+                for order in orders
+            )
+            StockMovement.objects.bulk_create(
+                StockMovement(product=cls.product, location=cls.location, movement_type='in', quantity=1)
+                for _ in range(count)
+            )
+            Expense.objects.bulk_create(
+                Expense(
+                    description='Seed',
+                    amount=1,
+                    date_incurred=datetime.date(2024, 1, 1) + datetime.timedelta(days=rng.randrange(365)),
+                    paid_by=user,
+                )
+                for _ in range(count)
+            )
+
+        # Fresh statistics, otherwise the planner judges the tables by their empty state.
+        # SQLite is left alone: without histograms ANALYZE would assume an even status split.
+        with connection.cursor() as cursor:
+            if connection.vendor == 'mysql':
+                for model in (SalesOrder, Invoice, StockMovement, Expense):
+                    cursor.execute(f'ANALYZE TABLE {model._meta.db_table}')
+            elif connection.vendor == 'postgresql':
+                cursor.execute('ANALYZE')
+
+    def assertUsesIndex(self, queryset, index_name):
+        plan = queryset.explain()
+        self.assertIn(index_name, plan, f'{index_name} not used:\n{plan}')
+
+    def test_orders_by_status_and_date(self):
+        start, end = day_bounds(timezone.localdate() - datetime.timedelta(days=30), timezone.localdate())
+        queryset = SalesOrder.objects.filter(status='delivered', created_at__gte=start, created_at__lt=end)
+        self.assertUsesIndex(queryset, 'order_status_created_idx')
+
+    def test_open_invoices(self):
+        queryset = Invoice.objects.filter(payment_status__in=['unpaid', 'partial'])
+        self.assertUsesIndex(queryset, 'invoice_status_created_idx')
+
+    def test_ar_aging_balances(self):
+        queryset = ARAgingService.customer_balances(ARAgingService.build_buckets([0, 30, 60, 90]))
+        self.assertUsesIndex(queryset, 'invoice_status_created_idx')
+
+    def test_stock_movements_for_product_and_location(self):
+        queryset = StockMovement.objects.filter(
+            product=self.product, location=self.location
+        ).order_by('-timestamp')[:50]
+        self.assertUsesIndex(queryset, 'movement_prod_loc_ts_idx')
+
+    def test_expenses_by_month(self):
+        queryset = Expense.objects.filter(
+            date_incurred__range=(datetime.date(2024, 3, 1), datetime.date(2024, 3, 31))
+        )
+        self.assertUsesIndex(queryset, 'expense_date_idx')
+
+
+class SalesRollupTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.brand = Brand.objects.create(name='Brand')
+        other_brand = Brand.objects.create(name='Other brand')
+        cls.product = Product.objects.create(brand=cls.brand, name='SKU', mrp=10, ptr=8, margin=2, weight_gms=100)
+        cls.other_product = Product.objects.create(
+            brand=other_brand, name='Other SKU', mrp=20, ptr=15, margin=5, weight_gms=200
+        )
+        customer_type = CustomerType.objects.create(name='Retail')
+        cls.customer = Customer.objects.create(name='Customer', phone='1', customer_type=customer_type)
+        cls.user = User.objects.create_user('rollup')
+
+    def _raw(self, day):
+        """The rollup rows for `day`, aggregated straight from the source tables."""
+        start, end = day_bounds(day)
+        orders = SalesOrder.objects.filter(created_at__gte=start, created_at__lt=end)
+        items = OrderItem.objects.filter(order__in=orders)
+        line_value = Sum(F('price') * F('quantity'))
+        brand_orders = {}
+        for _order_id, status, brand_id, total in items.values_list(
+            'order_id', 'order__status', 'product__brand_id', 'order__total_amount'
+        ).distinct().order_by():
+            count, amount = brand_orders.get((status, brand_id), (0, 0))
+            brand_orders[(status, brand_id)] = (count + 1, amount + total)
+        cash_in = Invoice.objects.filter(created_at__gte=start, created_at__lt=end).aggregate(
+            total=Sum('amount_paid', default=0)
+        )['total']
+        cash_out = Expense.objects.filter(date_incurred=day).aggregate(total=Sum('amount', default=0))['total']
+        return {
+            'sales': {
+                row['status']: (row['count'], row['total'])
+                for row in orders.values('status').annotate(count=Count('pk'), total=Sum('total_amount')).order_by()
+            },
+            'products': {
+                row['product_id']: (row['units'], row['value'])
+                for row in items.values('product_id').annotate(units=Sum('quantity'), value=line_value).order_by()
+            },
+            'brands': {
+                (row['order__status'], row['product__brand_id']): (
+                    *brand_orders[(row['order__status'], row['product__brand_id'])], row['units'], row['value']
+                )
+                for row in items.values('order__status', 'product__brand_id').annotate(
+                    units=Sum('quantity'), value=line_value
+                ).order_by()
+            },
+            'cash': (cash_in, cash_out) if cash_in or cash_out else None,
+        }
+
+    def _rollup(self, day):
+        cash = DailyCashFlow.objects.filter(day=day).values_list('cash_in', 'cash_out').first()
+        return {
+            'sales': {
+                row.status: (row.order_count, row.total_amount) for row in DailySales.objects.filter(day=day)
+            },
+            'products': {
+                row.product_id: (row.quantity, row.revenue) for row in DailyProductSales.objects.filter(day=day)
+            },
+            'brands': {
+                (row.status, row.brand_id): (row.order_count, row.total_amount, row.quantity, row.revenue)
+                for row in DailyBrandSales.objects.filter(day=day)
+            },
+            'cash': cash,
+        }
+
+    def assertRollupMatches(self, *days):
+        for day in days:
+            self.assertEqual(self._rollup(day), self._raw(day), day)
+
+    def test_revenue_is_the_line_value(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            order = OrderService.create_order(
+                {'customer': self.customer, 'status': 'delivered'},
+                [{'product_id': self.product.pk, 'quantity': 10, 'price': 8}],
+            )
+        day = timezone.localdate(order.created_at)
+        self.assertEqual(order.total_amount, 80)
+        self.assertEqual(DailyProductSales.objects.get(day=day, product=self.product).revenue, 80)
+        self.assertEqual(DailyBrandSales.objects.get(day=day, brand=self.brand, status='delivered').revenue, 80)
+
+    def test_rollup_follows_orders_invoices_and_expenses(self):
+        today = timezone.localdate()
+        yesterday = today - datetime.timedelta(days=1)
+        lines = [
+            {'product_id': self.product.pk, 'quantity': 10, 'price': 8},
+            {'product_id': self.other_product.pk, 'quantity': 3, 'price': 15},
+        ]
+        with self.captureOnCommitCallbacks(execute=True):
+            order = OrderService.create_order({'customer': self.customer, 'status': 'delivered'}, lines)
+            other = OrderService.create_order({'customer': self.customer, 'status': 'pending'}, lines[:1])
+        self.assertRollupMatches(today)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            OrderService.update_order(
+                order, {'status': 'billed'}, [{'product_id': self.product.pk, 'quantity': 4}], expected_version=0
+            )
+        self.assertRollupMatches(today)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            item = other.items.get()
+            item.quantity = 7
+            item.save()
+            OrderItem.objects.create(order=other, product=self.other_product, quantity=2, price=14)
+        self.assertRollupMatches(today)
+        with self.captureOnCommitCallbacks(execute=True):
+            item.delete()
+        self.assertRollupMatches(today)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            invoice = Invoice.objects.create(order=order, invoice_number='INV-1', total=order.total_amount)
+            PaymentService.record_payment(invoice, Decimal('10'), 'cash')
+            expense = Expense.objects.create(description='Fuel', amount=250, date_incurred=today, paid_by=self.user)
+        self.assertRollupMatches(today)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            expense.date_incurred = yesterday
+            expense.save()
+        self.assertRollupMatches(today, yesterday)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            expense.delete()
+            invoice.delete()
+            other.delete()
+        self.assertRollupMatches(today, yesterday)
+
+    def test_rebuild_command_restores_the_rollup(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            order = OrderService.create_order(
+                {'customer': self.customer, 'status': 'delivered'},
+                [{'product_id': self.product.pk, 'quantity': 5, 'price': 8}],
+            )
+            Invoice.objects.create(order=order, invoice_number='INV-1', total=40, amount_paid=40)
+            Expense.objects.create(
+                description='Fuel', amount=100, date_incurred=timezone.localdate(), paid_by=self.user
+            )
+        today = timezone.localdate()
+        expected = self._rollup(today)
+        for model in (DailySales, DailyBrandSales, DailyProductSales, DailyCashFlow):
+            model.objects.all().delete()
+
+        call_command('rebuild_sales_rollup', stdout=io.StringIO())
+        self.assertEqual(self._rollup(today), expected)
+        self.assertRollupMatches(today)
+
+    def test_each_day_is_refreshed_once_per_transaction(self):
+        def refresh_queries(item_count):
+            with self.captureOnCommitCallbacks() as callbacks:
+                order = SalesOrder.objects.create(customer=self.customer, status='delivered')
+                for _ in range(item_count):
+                    OrderItem.objects.create(order=order, product=self.product, quantity=1, price=8)
+            with CaptureQueriesContext(connection) as queries:
+                for callback in callbacks:
+                    callback()
+            return len(queries)
+
+        self.assertEqual(refresh_queries(1), refresh_queries(20))
+        self.assertEqual(DailyProductSales.objects.get(product=self.product).quantity, 21)
+
+
+class ARAgingTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        customer_type = CustomerType.objects.create(name='Retail')
+        cls.acme = Customer.objects.create(name='Acme', phone='1', customer_type=customer_type)
+        cls.bolt = Customer.objects.create(name='Bolt', phone='2', customer_type=customer_type)
+        cls.as_of = datetime.date(2026, 10, 18)
+        # (customer, days old, total, paid)
+        for customer, age, total, paid in [
+            (cls.acme, 0, 100, 0),
+            (cls.acme, 1, 200, 50),
+            (cls.acme, 30, 300, 0),
+            (cls.acme, 31, 400, 0),
+            (cls.bolt, 90, 500, 100),
+            (cls.bolt, 91, 600, 0),
+            (cls.bolt, 200, 700, 700),  # settled: not receivable
+        ]:
+            cls._invoice(customer, cls.as_of - datetime.timedelta(days=age), total, paid)
+
+    @staticmethod
+    def _invoice(customer, day, total, paid):
+        order = SalesOrder.objects.create(customer=customer, total_amount=total)
+        invoice = Invoice.objects.create(
+            order=order, invoice_number=f'AR-{order.pk}', total=total, amount_paid=paid,
+            payment_status='paid' if paid == total else 'partial' if paid else 'unpaid',
+        )
+        created_at = timezone.make_aware(datetime.datetime.combine(day, datetime.time(12)))
+        Invoice.objects.filter(pk=invoice.pk).update(created_at=created_at)
+
+    def test_parse_boundaries(self):
+        self.assertEqual(ARAgingService.parse_boundaries('30,60, 90'), [30, 60, 90])
+        self.assertEqual(ARAgingService.parse_boundaries('15,'), [15])
+        for value in (None, '', ',', 'abc', '30,x', '-5,30'):
+            self.assertIsNone(ARAgingService.parse_boundaries(value), value)
+
+    def test_build_buckets(self):
+        self.assertEqual(ARAgingService.build_buckets([60, 0, 30, 30]), [
+            ('Current', None, 0), ('1-30 Days', 1, 30), ('31-60 Days', 31, 60), ('61+ Days', 61, None),
+        ])
+        with override_settings(AR_AGING_BOUNDARIES=[45]):
+            self.assertEqual(ARAgingService.build_buckets(), [('0-45 Days', None, 45), ('46+ Days', 46, None)])
+
+    def test_customer_balances_per_bucket(self):
+        buckets = ARAgingService.build_buckets([0, 30, 60, 90])
+        with self.assertNumQueries(1):
+            rows = list(ARAgingService.customer_balances(buckets, as_of=self.as_of))
+        self.assertEqual(
+            [
+                (row['customer_name'], [row[f'bucket_{i}'] for i in range(len(buckets))], row['total_due'])
+                for row in rows
+            ],
+            [
+                ('Acme', [100, 150 + 300, 400, 0, 0], 950),
+                ('Bolt', [0, 0, 0, 400, 600], 1000),
+            ],
+        )
+
+    def test_csv_export(self):
+        # Ages well inside their buckets, so the view's "today" may be off by a day
+        today = datetime.date.today()
+        SalesOrder.objects.all().delete()
+        self._invoice(self.acme, today - datetime.timedelta(days=15), 100, 40)
+        self._invoice(self.bolt, today - datetime.timedelta(days=120), 250, 0)
+
+        response = self.client.get(reverse('reports:ar_aging_csv'), {'boundaries': '30,60'})
+        header, *rows = csv.reader(io.StringIO(b''.join(response.streaming_content).decode()))
+        self.assertEqual(header, ['Customer Name', '0-30 Days', '31-60 Days', '61+ Days', 'Total Due'])
+        self.assertEqual(
+            [[name, *map(Decimal, amounts)] for name, *amounts in rows],
+            [['Acme', 60, 0, 0, 60], ['Bolt', 0, 0, 250, 250]],
+        )
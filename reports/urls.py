@@ -1,5 +1,5 @@
 from django.urls import path
-from .views import sales_report, customer_report, ar_aging_report
+from .views import sales_report, customer_report, ar_aging_report, ar_aging_csv
 
 app_name = 'reports'
 
@@ -7,4 +7,5 @@ urlpatterns = [
     path('', sales_report, name='sales_report'),
     path('customers/', customer_report, name='customer_report'),
     path('ar-aging/', ar_aging_report, name='ar_aging_report'),
+    path('ar-aging/csv/', ar_aging_csv, name='ar_aging_csv'),
 ]
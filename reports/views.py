@@ -1,12 +1,13 @@
 import datetime
 from django.shortcuts import render
-from django.db.models import Sum, Count, Q ,F
-from django.db.models.functions import TruncDay
+from django.db.models import Sum
 
-from orders.models import SalesOrder, OrderItem
-from billing.models import Invoice, Expense # Assuming you have these models from previous steps
-from products.models import Product
+from orders.models import SalesOrder
+from billing.models import Invoice
 from customers.models import Customer
+from core.utils import day_bounds, stream_csv
+from .models import DailySales, DailyProductSales, DailyCashFlow
+from .services import ARAgingService
 
 def sales_report(request):
     """
@@ -25,40 +26,40 @@ def sales_report(request):
     next_month = first_day.replace(day=28) + datetime.timedelta(days=4)
     last_day = next_month - datetime.timedelta(days=next_month.day)
 
+    # All figures come from the pre-aggregated daily rollup (see reports.services.SalesRollupService)
+    day_range = [first_day, last_day]
+
     # --- 1. Key Metrics Summary Cards ---
     # Total Sales (from created orders in the period)
-    total_sales = SalesOrder.objects.filter(
-        created_at__range=[first_day, last_day],
+    total_sales = DailySales.objects.filter(
+        day__range=day_range,
         status__in=['pending', 'confirmed', 'delivered', 'billed']
     ).aggregate(total=Sum('total_amount'))['total'] or 0
 
-    # Total Cash In (from payments recorded in the period)
-    total_cash_in = Invoice.objects.filter(
-        created_at__range=[first_day, last_day],
-        payment_status__in=['paid', 'partial']
-    ).aggregate(total=Sum('amount_paid'))['total'] or 0
-
-    # Total Cash Out (from expenses recorded in the period)
-    total_cash_out = Expense.objects.filter(
-        date_incurred__range=[first_day, last_day]
-    ).aggregate(total=Sum('amount'))['total'] or 0
+    # Total Cash In / Cash Out (payments on invoices raised and expenses incurred in the period)
+    cash_flow = DailyCashFlow.objects.filter(day__range=day_range).aggregate(
+        cash_in=Sum('cash_in'),
+        cash_out=Sum('cash_out')
+    )
+    total_cash_in = cash_flow['cash_in'] or 0
+    total_cash_out = cash_flow['cash_out'] or 0
 
     # Net Income calculation
     net_income = total_cash_in - total_cash_out
 
     # --- 2. Sales by Day (for a table view) ---
-    sales_by_day = SalesOrder.objects.filter(
-        created_at__range=[first_day, last_day]
-    ).annotate(day=TruncDay('created_at')).values('day').annotate(
+    sales_by_day = DailySales.objects.filter(
+        day__range=day_range
+    ).values('day').annotate(
         daily_total=Sum('total_amount')
     ).order_by('day')
 
     # --- 3. Top Selling Products by Quantity ---
-    top_products = OrderItem.objects.filter(
-        order__created_at__range=[first_day, last_day]
+    top_products = DailyProductSales.objects.filter(
+        day__range=day_range
     ).values('product__name').annotate(
         total_quantity=Sum('quantity'),
-        total_revenue=Sum('price')
+        total_revenue=Sum('revenue')
     ).order_by('-total_quantity')[:10] # Top 10
 
     context = {
@@ -90,24 +91,29 @@ def customer_report(request):
     next_month = first_day.replace(day=28) + datetime.timedelta(days=4)
     last_day = next_month - datetime.timedelta(days=next_month.day)
 
-    # --- Use annotations to get total sales and payments per customer ---
-    customers_data = Customer.objects.annotate(
-        # Total sales for the selected month
-        monthly_sales=Sum(
-            'salesorder__total_amount',
-            filter=Q(salesorder__created_at__range=[first_day, last_day])
-        ),
-        # Total amount paid for invoices related to orders in the selected month
-        monthly_paid=Sum(
-            'salesorder__invoice__amount_paid',
-            filter=Q(salesorder__created_at__range=[first_day, last_day])
-        ),
-        # Total outstanding balance from ALL invoices, regardless of date
-        total_outstanding=Sum('salesorder__invoice__total') - Sum('salesorder__invoice__amount_paid')
-    ).filter(
-        # Only show customers who had sales in the selected period
-        monthly_sales__gt=0
-    ).order_by('-monthly_sales')
+    start, end = day_bounds(first_day, last_day)
+
+    # --- Sales per customer for the month, grouped on the orders table alone ---
+    monthly_sales = dict(
+        SalesOrder.objects.filter(created_at__gte=start, created_at__lt=end).values('customer_id').annotate(
+            total=Sum('total_amount')
+        ).filter(total__gt=0).values_list('customer_id', 'total').order_by()
+    )
+    # Amount paid on the invoices of those orders
+    monthly_paid = dict(
+        Invoice.objects.filter(order__created_at__gte=start, order__created_at__lt=end).values(
+            'order__customer_id'
+        ).annotate(total=Sum('amount_paid')).values_list('order__customer_id', 'total').order_by()
+    )
+
+    # Outstanding balances come from the maintained CustomerSummary, not from the invoices
+    customers_data = list(Customer.objects.filter(pk__in=monthly_sales).select_related('summary'))
+    for customer in customers_data:
+        customer.monthly_sales = monthly_sales[customer.pk]
+        customer.monthly_paid = monthly_paid.get(customer.pk, 0)
+        summary = getattr(customer, 'summary', None)
+        customer.total_outstanding = summary.outstanding if summary else 0
+    customers_data.sort(key=lambda customer: customer.monthly_sales, reverse=True)
 
     context = {
         'customers_data': customers_data,
@@ -118,70 +124,53 @@ def customer_report(request):
 
 
 
-from collections import OrderedDict
-from billing.models import Invoice
+def _aging_rows(rows, bucket_count):
+    for row in rows:
+        yield row['customer_name'], [row[f'bucket_{i}'] for i in range(bucket_count)], row['total_due']
+
 
 def ar_aging_report(request):
     """
     Generates an Accounts Receivable (A/R) Aging Report.
+    Bucket boundaries can be overridden with ?boundaries=30,60,90.
     """
     today = datetime.date.today()
-    
-    # 1. Define the aging buckets
-    buckets = OrderedDict([
-        ('Current', {'start': -999, 'end': 0, 'total': 0, 'customers': {}}),
-        ('1-30 Days', {'start': 1, 'end': 30, 'total': 0, 'customers': {}}),
-        ('31-60 Days', {'start': 31, 'end': 60, 'total': 0, 'customers': {}}),
-        ('61-90 Days', {'start': 61, 'end': 90, 'total': 0, 'customers': {}}),
-        ('91+ Days', {'start': 91, 'end': 9999, 'total': 0, 'customers': {}}),
-    ])
-
-    # 2. Get all invoices that are not fully paid
-    unpaid_invoices = Invoice.objects.filter(payment_status__in=['unpaid', 'partial'])
-    
-    # 3. Process each invoice to categorize it
-    for invoice in unpaid_invoices:
-        days_overdue = (today - invoice.created_at.date()).days
-        balance = invoice.balance
-
-        customer_name = invoice.order.customer.name
-        
-        # Find the correct bucket for the invoice
-        for bucket_name, bucket_data in buckets.items():
-            if bucket_data['start'] <= days_overdue <= bucket_data['end']:
-                # Add customer's balance to the bucket's customer dictionary
-                customer_balances = bucket_data['customers']
-                customer_balances[customer_name] = customer_balances.get(customer_name, 0) + balance
-                
-                # Update the total for the bucket
-                bucket_data['total'] += balance
-                break
-    
-    # 4. Prepare data for the template in a more structured way
-    report_data = {}
-    all_customers = set()
-    
-    # Collect all unique customers across all buckets
-    for bucket_data in buckets.values():
-        all_customers.update(bucket_data['customers'].keys())
-
-    # Build the final data structure for the template
-    for customer in sorted(list(all_customers)):
-        report_data[customer] = {
-            'buckets': {bucket_name: 0 for bucket_name in buckets},
-            'total_due': 0,
-        }
-        for bucket_name, bucket_data in buckets.items():
-            amount = bucket_data['customers'].get(customer, 0)
-            if amount > 0:
-                report_data[customer]['buckets'][bucket_name] = amount
-                report_data[customer]['total_due'] += amount
+    boundaries = ARAgingService.parse_boundaries(request.GET.get('boundaries'))
+    buckets = ARAgingService.build_buckets(boundaries)
+
+    # One grouped query: per-customer bucket totals are summed by the database
+    report_rows = []
+    bucket_totals = [0] * len(buckets)
+    for customer_name, amounts, total_due in _aging_rows(
+        ARAgingService.customer_balances(buckets, as_of=today), len(buckets)
+    ):
+        report_rows.append({'customer': customer_name, 'amounts': amounts, 'total_due': total_due})
+        bucket_totals = [total + amount for total, amount in zip(bucket_totals, amounts)]
 
     context = {
-        'report_data': report_data,
-        'buckets': buckets, # Pass bucket totals for the footer
+        'report_rows': report_rows,
+        'bucket_labels': [label for label, _min_days, _max_days in buckets],
+        'bucket_totals': bucket_totals, # For the footer
+        'grand_total': sum(bucket_totals),
         'report_date': today,
+        'boundaries': request.GET.get('boundaries', ''),
     }
-    
+
     return render(request, 'reports/ar_aging_report.html', context)
 
+
+def ar_aging_csv(request):
+    """
+    Streams the A/R Aging Report as CSV, honouring the same ?boundaries= override.
+    """
+    today = datetime.date.today()
+    boundaries = ARAgingService.parse_boundaries(request.GET.get('boundaries'))
+    buckets = ARAgingService.build_buckets(boundaries)
+    balances = ARAgingService.customer_balances(buckets, as_of=today).iterator(chunk_size=2000)
+
+    header = ['Customer Name'] + [label for label, _min_days, _max_days in buckets] + ['Total Due']
+    rows = (
+        [customer_name] + amounts + [total_due]
+        for customer_name, amounts, total_due in _aging_rows(balances, len(buckets))
+    )
+    return stream_csv(f"ar_aging_{today:%Y%m%d}.csv", header, rows)
@@ -0,0 +1,256 @@
+"""
+Type-ahead search over customers, products and orders.
+
+Two interchangeable backends answer the same calls:
+
+* PostgresSearchBackend filters with ILIKE backed by pg_trgm GIN indexes (see the
+  search migrations) and ranks by trigram word similarity.
+* NgramSearchBackend keeps an in-process trigram index per document type for SQLite
+  and MySQL, whose LIKE '%term%' cannot use an index. Each worker rebuilds its index
+  when the document type's version in the shared cache changes (see search.signals).
+
+settings.SEARCH_BACKEND picks one: 'postgres', 'ngram', a dotted path to a backend
+class, or unset to choose by database vendor.
+"""
+import heapq
+import re
+import threading
+import uuid
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import Q
+from django.utils.module_loading import import_string
+
+from customers.models import Customer
+from orders.models import SalesOrder
+from products.models import Product
+
+DEFAULT_LIMIT = 10
+MAX_LIMIT = 50
+ORDER_CUSTOMER_CANDIDATES = 200
+_WORD = re.compile(r'\w+')
+
+
+def _normalize(text):
+    return ' '.join(_WORD.findall(text.casefold()))
+
+
+def _customer_row(pk, name, phone, customer_type):
+    return {'id': pk, 'name': name, 'phone': phone, 'type': customer_type}
+
+
+def _product_row(pk, name, brand, mrp, ptr):
+    return {'id': pk, 'name': name, 'brand': brand, 'mrp': mrp, 'ptr': ptr}
+
+
+CUSTOMER_FIELDS = ('pk', 'name', 'phone', 'customer_type__name')
+PRODUCT_FIELDS = ('pk', 'name', 'brand__name', 'mrp', 'ptr')
+
+
+class BaseSearchBackend:
+    name = None
+
+    def customers(self, query, limit=DEFAULT_LIMIT):
+        """Returns up to `limit` dicts with id, name, phone and type, best match first."""
+        raise NotImplementedError
+
+    def customer_ids(self, query):
+        """Returns the pks (a list or a pk subquery) of every customer matching `query`."""
+        raise NotImplementedError
+
+    def products(self, query, limit=DEFAULT_LIMIT):
+        """Returns up to `limit` active products as dicts with id, name, brand, mrp and ptr."""
+        raise NotImplementedError
+
+    def orders(self, query, limit=DEFAULT_LIMIT):
+        """
+        Orders whose number starts the query or whose customer matches it, newest first.
+        Goes through the customer search, so it needs no index of its own.
+        """
+        query = query.strip()
+        condition = Q(customer_id__in=self._order_customer_ids(query))
+        number = query.lstrip('#')
+        if number.isdigit():
+            condition |= Q(pk=int(number))
+        orders = SalesOrder.objects.filter(condition).order_by('-created_at', '-pk').values_list(
+            'pk', 'customer__name', 'status', 'total_amount', 'created_at'
+        )[:limit]
+        return [
+            {'id': pk, 'customer': customer, 'status': status, 'total_amount': total, 'created_at': created_at}
+            for pk, customer, status, total, created_at in orders
+        ]
+
+    def _order_customer_ids(self, query):
+        return [row['id'] for row in self.customers(query, limit=ORDER_CUSTOMER_CANDIDATES)]
+
+
+class PostgresSearchBackend(BaseSearchBackend):
+    name = 'postgres'
+
+    def _rank(self, queryset, query, field):
+        # Imported here: django.contrib.postgres needs a psycopg driver to import
+        from django.contrib.postgres.search import TrigramWordSimilarity
+        return queryset.annotate(rank=TrigramWordSimilarity(query, field)).order_by('-rank', field)
+
+    def _customer_filter(self, query):
+        return Q(name__icontains=query) | Q(phone__contains=query)
+
+    def customers(self, query, limit=DEFAULT_LIMIT):
+        queryset = self._rank(Customer.objects.filter(self._customer_filter(query)), query, 'name')
+        return [_customer_row(*row) for row in queryset.values_list(*CUSTOMER_FIELDS)[:limit]]
+
+    def customer_ids(self, query):
+        return Customer.objects.filter(self._customer_filter(query)).values('pk')
+
+    def products(self, query, limit=DEFAULT_LIMIT):
+        queryset = Product.objects.filter(
+            Q(name__icontains=query) | Q(brand__name__icontains=query), is_active=True
+        )
+        queryset = self._rank(queryset, query, 'name')
+        return [_product_row(*row) for row in queryset.values_list(*PRODUCT_FIELDS)[:limit]]
+
+
+class NgramIndex:
+    """
+    Inverted index from character trigrams to document ids. Every query term must
+    occur in the document as a substring, like icontains. Terms under three characters
+    have no trigram to look up, so they are checked against every text, or against the
+    matches of the query's longer terms when it has any.
+    """
+
+    def __init__(self, documents):
+        """:param documents: iterable of (pk, searchable text, result dict)"""
+        self.texts = {}
+        self.rows = {}
+        self.grams = defaultdict(set)
+        for pk, text, row in documents:
+            text = _normalize(text)
+            self.texts[pk] = text
+            self.rows[pk] = row
+            for gram in self._grams(text):
+                self.grams[gram].add(pk)
+
+    @staticmethod
+    def _grams(text):
+        return {text[i:i + 3] for i in range(len(text) - 2)}
+
+    def _candidates(self, term, matches):
+        if len(term) < 3:
+            return self.texts if matches is None else matches
+        sets = sorted((self.grams.get(term[i:i + 3], set()) for i in range(len(term) - 2)), key=len)
+        return set.intersection(*sets) if sets else set()
+
+    def search(self, query, limit=None):
+        terms = _normalize(query).split()
+        if not terms:
+            return []
+        matches = None
+        for term in sorted(terms, key=len, reverse=True):
+            found = {pk for pk in self._candidates(term, matches) if term in self.texts[pk]}
+            matches = found if matches is None else matches & found
+            if not matches:
+                return []
+
+        first = terms[0]
+
+        def rank(pk):
+            text = self.texts[pk]
+            if text.startswith(first):
+                return (0, len(text), pk)
+            if f' {first}' in text:
+                return (1, len(text), pk)
+            return (2, len(text), pk)
+
+        ranked = sorted(matches, key=rank) if limit is None else heapq.nsmallest(limit, matches, key=rank)
+        return [self.rows[pk] for pk in ranked]
+
+
+def _version_key(doc_type):
+    return f"search:version:{doc_type}"
+
+
+def invalidate(doc_type):
+    """Makes every worker rebuild its `doc_type` index on its next search."""
+    cache.set(_version_key(doc_type), uuid.uuid4().hex, None)
+
+
+def _current_version(doc_type):
+    version = cache.get(_version_key(doc_type))
+    if version is None:
+        cache.add(_version_key(doc_type), uuid.uuid4().hex, None)
+        version = cache.get(_version_key(doc_type))
+    return version
+
+
+class NgramSearchBackend(BaseSearchBackend):
+    name = 'ngram'
+
+    def __init__(self):
+        self._indexes = {}
+        self._lock = threading.Lock()
+
+    def _customer_documents(self):
+        for row in Customer.objects.values_list(*CUSTOMER_FIELDS).iterator(chunk_size=2000):
+            pk, name, phone, _customer_type = row
+            yield pk, f"{name} {phone}", _customer_row(*row)
+
+    def _product_documents(self):
+        products = Product.objects.filter(is_active=True).values_list(*PRODUCT_FIELDS)
+        for row in products.iterator(chunk_size=2000):
+            pk, name, brand, _mrp, _ptr = row
+            yield pk, f"{name} {brand}", _product_row(*row)
+
+    def index(self, doc_type):
+        version = _current_version(doc_type)
+        current = self._indexes.get(doc_type)
+        if current and current[0] == version:
+            return current[1]
+        with self._lock:
+            current = self._indexes.get(doc_type)
+            if current and current[0] == version:
+                return current[1]
+            documents = self._customer_documents() if doc_type == 'customers' else self._product_documents()
+            built = NgramIndex(documents)
+            self._indexes[doc_type] = (version, built)
+            return built
+
+    def customers(self, query, limit=DEFAULT_LIMIT):
+        return self.index('customers').search(query, limit)
+
+    def customer_ids(self, query):
+        # Past the type-ahead's candidate count, an IN list would grow with the customer
+        # table; filter in the database instead
+        rows = self.index('customers').search(query, ORDER_CUSTOMER_CANDIDATES + 1)
+        if len(rows) <= ORDER_CUSTOMER_CANDIDATES:
+            return [row['id'] for row in rows]
+        condition = Q()
+        for term in _normalize(query).split():
+            condition &= Q(name__icontains=term) | Q(phone__contains=term)
+        return Customer.objects.filter(condition).values('pk')
+
+    def products(self, query, limit=DEFAULT_LIMIT):
+        return self.index('products').search(query, limit)
+
+
+BACKENDS = {
+    'postgres': PostgresSearchBackend,
+    'ngram': NgramSearchBackend,
+}
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def get_backend():
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                choice = getattr(settings, 'SEARCH_BACKEND', None)
+                if not choice:
+                    choice = 'postgres' if connection.vendor == 'postgresql' else 'ngram'
+                backend_class = BACKENDS.get(choice) or import_string(choice)
+                _backend = backend_class()
+    return _backend
@@ -0,0 +1,43 @@
+# Generated by Django 5.2.5 on 2026-10-18 10:02
+
+from django.db import migrations
+
+# Only PostgreSQL gets database-side indexes; the other vendors use the in-process
+# n-gram index in search.backends. The expressions match what Django emits for
+# icontains (UPPER(col) LIKE UPPER(..)) and contains (col LIKE ..).
+TRIGRAM_INDEXES = [
+    ('search_customer_name_trgm', 'customers_customer', 'UPPER(name)'),
+    ('search_customer_phone_trgm', 'customers_customer', 'phone'),
+    ('search_product_name_trgm', 'products_product', 'UPPER(name)'),
+    ('search_brand_name_trgm', 'brands_brand', 'UPPER(name)'),
+]
+
+
+def create_trigram_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    for name, table, expression in TRIGRAM_INDEXES:
+        schema_editor.execute(
+            f'CREATE INDEX IF NOT EXISTS {name} ON {table} USING gin (({expression}) gin_trgm_ops)'
+        )
+
+
+def drop_trigram_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for name, _table, _expression in TRIGRAM_INDEXES:
+        schema_editor.execute(f'DROP INDEX IF EXISTS {name}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('customers', '0003_backfill_customer_summaries'),
+        ('products', '0001_initial'),
+        ('brands', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_trigram_indexes, drop_trigram_indexes),
+    ]
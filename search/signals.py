@@ -0,0 +1,26 @@
+from functools import partial
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from brands.models import Brand
+from customers.models import Customer, CustomerType
+from products.models import Product
+from .backends import invalidate
+
+
+@receiver(post_save, sender=Customer)
+@receiver(post_delete, sender=Customer)
+@receiver(post_save, sender=CustomerType)
+@receiver(post_delete, sender=CustomerType)
+def invalidate_customer_index(sender, **kwargs):
+    transaction.on_commit(partial(invalidate, 'customers'))
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+@receiver(post_save, sender=Brand)
+@receiver(post_delete, sender=Brand)
+def invalidate_product_index(sender, **kwargs):
+    transaction.on_commit(partial(invalidate, 'products'))
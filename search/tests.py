@@ -0,0 +1,98 @@
+from django.core.cache import cache
+from django.db.models import QuerySet
+from django.test import TestCase
+from django.urls import reverse
+
+from brands.models import Brand
+from customers.models import Customer, CustomerType
+from orders.models import SalesOrder
+from products.models import Product
+from .backends import ORDER_CUSTOMER_CANDIDATES, NgramIndex, NgramSearchBackend, invalidate
+
+
+class NgramIndexTests(TestCase):
+
+    def setUp(self):
+        self.index = NgramIndex([
+            (1, 'Shree Ganesh Stores 9822001122', 'ganesh'),
+            (2, 'Ganga Traders 9822003344', 'ganga'),
+            (3, 'New Ganesh Bakery 7700112233', 'bakery'),
+        ])
+
+    def test_every_term_must_match(self):
+        self.assertEqual(self.index.search('ganesh bak'), ['bakery'])
+        self.assertEqual(self.index.search('GANESH'), ['bakery', 'ganesh'])
+        self.assertEqual(self.index.search('ganesh traders'), [])
+
+    def test_prefix_matches_rank_first(self):
+        self.assertEqual(self.index.search('ga'), ['ganga', 'bakery', 'ganesh'])
+        self.assertEqual(self.index.search('g', limit=1), ['ganga'])
+
+    def test_matches_inside_words_and_digits(self):
+        self.assertEqual(self.index.search('anes'), ['bakery', 'ganesh'])
+        self.assertEqual(self.index.search('3344'), ['ganga'])
+        # Too short for a trigram, but still a substring match rather than a word prefix
+        self.assertEqual(self.index.search('ne'), ['bakery', 'ganesh'])
+        self.assertEqual(self.index.search('ganesh ry'), ['bakery'])
+
+
+class SearchViewTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        retail = CustomerType.objects.create(name='Retail')
+        cls.ganesh = Customer.objects.create(name='Shree Ganesh Stores', phone='9822001122', customer_type=retail)
+        cls.ganga = Customer.objects.create(name='Ganga Traders', phone='9822003344', customer_type=retail)
+        brand = Brand.objects.create(name='Susegad')
+        cls.chakli = Product.objects.create(brand=brand, name='Butter Chakli', mrp=40, ptr=32, margin=8, weight_gms=200)
+        Product.objects.create(brand=brand, name='Old Chakli', mrp=40, margin=8, weight_gms=200, is_active=False)
+        cls.order = SalesOrder.objects.create(customer=cls.ganga, total_amount=120)
+
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+
+    def _search(self, name, q, **params):
+        response = self.client.get(reverse(f'search:{name}'), {'q': q, **params})
+        self.assertEqual(response.status_code, 200)
+        return response.json()['results']
+
+    def test_customers_by_name_and_phone(self):
+        self.assertEqual([row['id'] for row in self._search('customers', 'ganesh')], [self.ganesh.pk])
+        self.assertEqual([row['id'] for row in self._search('customers', '3344')], [self.ganga.pk])
+        self.assertEqual(len(self._search('customers', 'stores', limit=0)), 1)
+        self.assertEqual(self._search('customers', ''), [])
+
+    def test_products_skip_inactive_and_match_brand(self):
+        self.assertEqual([row['id'] for row in self._search('products', 'chakli')], [self.chakli.pk])
+        self.assertEqual([row['name'] for row in self._search('products', 'susegad')], ['Butter Chakli'])
+
+    def test_orders_by_number_or_customer(self):
+        self.assertEqual([row['id'] for row in self._search('orders', f'#{self.order.pk}')], [self.order.pk])
+        self.assertEqual([row['id'] for row in self._search('orders', 'ganga')], [self.order.pk])
+        self.assertEqual(self._search('orders', 'ganesh'), [])
+
+    def test_writes_refresh_the_index_after_commit(self):
+        backend = NgramSearchBackend()
+        self.assertEqual(backend.customers('konkan'), [])
+        with self.captureOnCommitCallbacks(execute=True):
+            customer = Customer.objects.create(name='Konkan Mart', phone='1', customer_type=self.ganga.customer_type)
+        self.assertEqual([row['id'] for row in backend.customers('konkan')], [customer.pk])
+        with self.assertNumQueries(0):
+            backend.customers('konkan')
+
+    def test_order_filter_uses_the_index(self):
+        response = self.client.get(reverse('orders:list'), {'customer': 'traders'})
+        self.assertEqual([order.pk for order in response.context['orders']], [self.order.pk])
+
+    def test_broad_customer_matches_filter_in_the_database(self):
+        backend = NgramSearchBackend()
+        self.assertEqual(backend.customer_ids('traders'), [self.ganga.pk])
+        Customer.objects.bulk_create([
+            Customer(name=f'Traders {i}', phone=str(i), customer_type=self.ganga.customer_type)
+            for i in range(ORDER_CUSTOMER_CANDIDATES)
+        ])
+        invalidate('customers')
+        ids = backend.customer_ids('traders')
+        self.assertIsInstance(ids, QuerySet)
+        self.assertEqual(ids.count(), ORDER_CUSTOMER_CANDIDATES + 1)
@@ -0,0 +1,10 @@
+from django.urls import path
+from . import views
+
+app_name = 'search'
+
+urlpatterns = [
+    path('customers/', views.search_customers, name='customers'),
+    path('products/', views.search_products, name='products'),
+    path('orders/', views.search_orders, name='orders'),
+]
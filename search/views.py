@@ -0,0 +1,36 @@
+import time
+
+from django.http import JsonResponse
+
+from .backends import DEFAULT_LIMIT, MAX_LIMIT, get_backend
+
+
+def _search(request, method):
+    query = request.GET.get('q', '').strip()
+    try:
+        limit = min(max(int(request.GET.get('limit', DEFAULT_LIMIT)), 1), MAX_LIMIT)
+    except ValueError:
+        limit = DEFAULT_LIMIT
+
+    started = time.perf_counter()
+    results = getattr(get_backend(), method)(query, limit=limit) if query else []
+    return JsonResponse({
+        'query': query,
+        'results': results,
+        'took_ms': round((time.perf_counter() - started) * 1000, 2),
+    })
+
+
+def search_customers(request):
+    """Type-ahead customer lookup: ?q=<name or phone>&limit=<n>"""
+    return _search(request, 'customers')
+
+
+def search_products(request):
+    """Type-ahead lookup of active products by name or brand."""
+    return _search(request, 'products')
+
+
+def search_orders(request):
+    """Orders by number or customer name, newest first."""
+    return _search(request, 'orders')